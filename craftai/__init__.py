@@ -10,6 +10,7 @@ __copyright__ = "Copyright (c) 2016, craft ai"
 from . import errors
 from .client import CraftAIClient as Client
 from .interpreter import Interpreter
+from .decision_cache import DecisionCache
 from .time import Time
 from .formatters import format_property, format_decision_rules
 from .reducer import reduce_decision_rules
@@ -0,0 +1,367 @@
+"""craft ai API asyncio client, requires python 3.6+ and aiohttp"""
+
+import asyncio
+import json
+import sys
+
+import aiohttp
+import six
+
+from craftai.client import CraftAIClient, USER_AGENT, current_time_ms
+from craftai.constants import DEFAULT_DECISION_TREE_VERSION
+from craftai.errors import CraftAiBadRequestError, CraftAiLongRequestTimeOutError
+
+#pylint: disable=R0903
+class _Response(object):
+  """aiohttp response read at once, decoded by `CraftAIClient._decode_response`"""
+
+  def __init__(self, status_code, text, headers):
+    self.status_code = status_code
+    self.text = text
+    self.headers = headers
+
+  def json(self):
+    return json.loads(self.text)
+#pylint: enable=R0903
+
+# Marks the end of the prefetched items
+_END = object()
+
+async def _iter_prefetched(iterable, depth):
+  """Asynchronous iteration over `iterable`, whose items are retrieved by a task up to
+  `depth` items ahead, as `craftai.prefetch.iter_prefetched` does"""
+  if depth < 1:
+    async for item in iterable:
+      yield item
+    return
+
+  # Retrieved items, and error, given as (item, error)
+  items = asyncio.Queue()
+  # A slot is taken before retrieving each item and freed once the item is consumed
+  slots = asyncio.Semaphore(depth)
+
+  async def retrieve():
+    try:
+      while True:
+        await slots.acquire()
+        try:
+          item = await iterable.__anext__()
+        except StopAsyncIteration:
+          items.put_nowait((_END, None))
+          return
+        items.put_nowait((item, None))
+    except Exception: # pylint: disable=broad-except
+      items.put_nowait((None, sys.exc_info()))
+
+  task = asyncio.ensure_future(retrieve())
+  try:
+    while True:
+      item, error = await items.get()
+      if error is not None:
+        six.reraise(*error)
+      if item is _END:
+        return
+      slots.release()
+      yield item
+  finally:
+    task.cancel()
+
+class Client(CraftAIClient):
+  """Asyncio client class for craft ai's API.
+
+  Its methods are the coroutines of the `craftai.Client` methods, sending
+  at most `maxConcurrentRequests` requests at once, 10 by default, over a
+  shared aiohttp connection pool. The paginated operations and states are
+  iterated with `async for`, the next pages being prefetched by a task
+  as `craftai.Client` prefetches them. The decision trees cache and store aren't
+  supported. The client must be closed with `close()`, or used with
+  `async with`.
+  """
+
+  def __init__(self, cfg):
+    self._session = None
+    self._semaphore = None
+    super(Client, self).__init__(cfg)
+
+  @property
+  def config(self):
+    return self._config
+
+  @config.setter
+  def config(self, cfg):
+#pylint: disable=E1101
+    CraftAIClient.config.fset(self, cfg)
+#pylint: enable=E1101
+    if self.decision_tree_cache is not None or self.decision_tree_store is not None:
+      raise CraftAiBadRequestError("""Unable to create client with a decision trees"""
+                                   """ cache or store, they aren't supported by the"""
+                                   """ asyncio client.""")
+
+  async def close(self):
+    if self._session is not None:
+      await self._session.close()
+      self._session = None
+
+  async def __aenter__(self):
+    return self
+
+  async def __aexit__(self, *exc_info):
+    await self.close()
+
+#pylint: disable=R0913
+  async def _request(self, method, url, params=None, headers=None, data=None):
+    if self._session is None:
+      concurrency = self._config["maxConcurrentRequests"]
+      self._semaphore = asyncio.Semaphore(concurrency)
+      self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency))
+
+    req_headers = {
+      "Authorization": "Bearer " + self._config.get("token"),
+      "User-Agent": USER_AGENT
+    }
+    req_headers.update(headers or {})
+    if params is not None:
+      # As requests does, the parameters without value aren't sent
+      params = {key: value for key, value in params.items() if value is not None}
+    async with self._semaphore:
+      async with self._session.request(method, url, params=params, headers=req_headers,
+                                       data=data, proxy=self._config.get("proxy")) as resp:
+        return _Response(resp.status, await resp.text(), resp.headers)
+#pylint: enable=R0913
+
+  #################
+  # Agent methods #
+  #################
+
+  async def create_agent(self, configuration, agent_id=""):
+    # Extra header in addition to the main session's
+    ct_header = {"Content-Type": "application/json; charset=utf-8"}
+
+    payload = {"configuration": configuration}
+
+    if agent_id != "":
+      # Raises an error when agent_id is invalid
+      self._check_agent_id(agent_id)
+
+      payload["id"] = agent_id
+
+    try:
+      json_pl = json.dumps(payload)
+    except TypeError as e:
+      raise CraftAiBadRequestError("Invalid configuration or agent id given. {}"
+                                   .format(e.__str__()))
+
+    req_url = "{}/agents".format(self._base_url)
+    resp = await self._request("POST", req_url, headers=ct_header, data=json_pl)
+
+    return self._decode_response(resp)
+
+  async def get_agent(self, agent_id):
+    # Raises an error when agent_id is invalid
+    self._check_agent_id(agent_id)
+
+    req_url = "{}/agents/{}".format(self._base_url, agent_id)
+    resp = await self._request("GET", req_url)
+
+    return self._decode_response(resp)
+
+  async def list_agents(self):
+    req_url = "{}/agents".format(self._base_url)
+    resp = await self._request("GET", req_url)
+
+    return self._decode_response(resp)["agentsList"]
+
+  async def delete_agent(self, agent_id):
+    # Raises an error when agent_id is invalid
+    self._check_agent_id(agent_id)
+
+    req_url = "{}/agents/{}".format(self._base_url, agent_id)
+    resp = await self._request("DELETE", req_url)
+
+    return self._decode_response(resp)
+
+  async def get_shared_agent_inspector_url(self, agent_id, timestamp=None):
+    # Raises an error when agent_id is invalid
+    self._check_agent_id(agent_id)
+
+    req_url = "{}/agents/{}/shared".format(self._base_url, agent_id)
+    resp = await self._request("GET", req_url)
+
+    url = self._decode_response(resp)
+
+    if timestamp != None:
+      return "{}?t={}".format(url["shortUrl"], str(timestamp))
+
+    return url["shortUrl"]
+
+  async def delete_shared_agent_inspector_url(self, agent_id):
+    # Raises an error when agent_id is invalid
+    self._check_agent_id(agent_id)
+
+    req_url = "{}/agents/{}/shared".format(self._base_url, agent_id)
+    resp = await self._request("DELETE", req_url)
+
+    return self._decode_response(resp)
+
+  ###################
+  # Context methods #
+  ###################
+
+  async def add_operations(self, agent_id, operations):
+    # Raises an error when agent_id is invalid
+    self._check_agent_id(agent_id)
+
+    # Extra header in addition to the main session's
+    ct_header = {"Content-Type": "application/json; charset=utf-8"}
+    chunk_size = self._config["operationsChunksSize"]
+
+    # The chunks of an agent are sent in order
+    for offset in range(0, max(len(operations), 1), chunk_size):
+      try:
+        json_pl = json.dumps(operations[offset:offset + chunk_size])
+      except TypeError as e:
+        raise CraftAiBadRequestError("Invalid configuration or agent id given. {}"
+                                     .format(e.__str__()))
+
+      req_url = "{}/agents/{}/context".format(self._base_url, agent_id)
+      resp = await self._request("POST", req_url, headers=ct_header, data=json_pl)
+
+      self._decode_response(resp)
+
+    return {
+      "message": "Successfully added %i operation(s) to the agent \"%s/%s/%s\" context."
+                 % (len(operations), self._config["owner"], self._config["project"], agent_id)
+    }
+
+  async def add_operations_bulk(self, operations_by_agent):
+    """Add the context operations of several agents concurrently, see
+    `craftai.Client.add_operations_bulk`"""
+    async def add(agent_id, operations):
+      try:
+        return agent_id, await self.add_operations(agent_id, operations), None
+      except Exception as e: # pylint: disable=broad-except
+        return agent_id, None, e
+
+    bulk = {"results": {}, "errors": {}}
+    outcomes = await asyncio.gather(*[add(agent_id, operations)
+                                      for agent_id, operations in operations_by_agent.items()])
+    for agent_id, result, error in outcomes:
+      if error is None:
+        bulk["results"][agent_id] = result
+      else:
+        bulk["errors"][agent_id] = error
+    return bulk
+
+  def _iter_pages(self, url, params=None, prefetch_depth=None):
+    if prefetch_depth is None:
+      prefetch_depth = self._config["pagesPrefetch"]
+    return _iter_prefetched(self._retrieve_pages(url, params), prefetch_depth)
+
+  async def _retrieve_pages(self, url, params):
+    # The pages are retrieved one at a time, as they are consumed
+    while url is not None:
+      resp = await self._request("GET", url, params=params)
+      yield self._decode_response(resp)
+      url = resp.headers.get("x-craft-ai-next-page-url")
+      # The next page URLs hold the parameters
+      params = None
+
+  @staticmethod
+  async def _iter_items(pages):
+    async for page in pages:
+      for item in page:
+        yield item
+
+#pylint: disable=R0913
+  def iter_operations(self, agent_id, start=None, end=None, pages=False, prefetch=None):
+    """Asynchronous iterator over the context operations of the agent, see
+    `craftai.Client.iter_operations`"""
+    # Raises an error when agent_id is invalid
+    self._check_agent_id(agent_id)
+
+    req_url = "{}/agents/{}/context".format(self._base_url, agent_id)
+    operations_pages = self._iter_pages(req_url, {"start": start, "end": end}, prefetch)
+    return operations_pages if pages else self._iter_items(operations_pages)
+#pylint: enable=R0913
+
+  async def get_operations_list(self, agent_id, start=None, end=None, windows=1):
+    return await self._get_windows_items(self.iter_operations, agent_id, start, end, windows)
+
+#pylint: disable=R0913
+  def iter_state_history(self, agent_id, start=None, end=None, pages=False, prefetch=None):
+    """Asynchronous iterator over the state history of the agent, see
+    `craftai.Client.iter_state_history`"""
+    # Raises an error when agent_id is invalid
+    self._check_agent_id(agent_id)
+
+    req_url = "{}/agents/{}/context/state/history".format(self._base_url, agent_id)
+    states_pages = self._iter_pages(req_url, {"start": start, "end": end}, prefetch)
+    return states_pages if pages else self._iter_items(states_pages)
+#pylint: enable=R0913
+
+  async def get_state_history(self, agent_id, start=None, end=None, windows=1):
+    return await self._get_windows_items(self.iter_state_history, agent_id, start, end, windows)
+
+#pylint: disable=R0913
+  async def _get_windows_items(self, iter_items, agent_id, start, end, windows):
+    # Raises an error when agent_id is invalid
+    self._check_agent_id(agent_id)
+    self._check_windows(windows)
+    if windows > 1 and (start is None or end is None):
+      agent = await self.get_agent(agent_id)
+      start = agent.get("firstTimestamp") if start is None else start
+      end = agent.get("lastTimestamp") if end is None else end
+
+    async def retrieve(bounds):
+      items = []
+      async for page in iter_items(agent_id, bounds[0], bounds[1], pages=True):
+        items.extend(page)
+      return items
+
+    windows_bounds = self._split_range(start, end, windows)
+    if len(windows_bounds) == 1:
+      return await retrieve(windows_bounds[0])
+    windows_items = await asyncio.gather(*[retrieve(bounds) for bounds in windows_bounds])
+    return self._stitch_windows(windows_items)
+#pylint: enable=R0913
+
+  async def get_context_state(self, agent_id, timestamp):
+    # Raises an error when agent_id is invalid
+    self._check_agent_id(agent_id)
+
+    req_url = "{}/agents/{}/context/state".format(self._base_url, agent_id)
+    resp = await self._request("GET", req_url, params={"t": timestamp})
+
+    return self._decode_response(resp)
+
+  #########################
+  # Decision tree methods #
+  #########################
+
+  async def _get_decision_tree(self, agent_id, timestamp, version):
+    # If we give no timestamp the default behaviour is to give the tree from the latest timestamp
+    req_url = "{}/agents/{}/decision/tree".format(self._base_url, agent_id)
+    resp = await self._request("GET", req_url, params={"t": timestamp},
+                               headers={"x-craft-ai-tree-version": version})
+
+    return self._decode_response(resp)
+
+  async def get_decision_tree(self, agent_id, timestamp=None,
+                              version=DEFAULT_DECISION_TREE_VERSION):
+    # Raises an error when agent_id is invalid
+    self._check_agent_id(agent_id)
+
+    if self._config["decisionTreeRetrievalTimeout"] is False:
+      # Don't retry
+      return await self._get_decision_tree(agent_id, timestamp, version)
+    start = current_time_ms()
+    while True:
+      now = current_time_ms()
+      if now - start > self._config["decisionTreeRetrievalTimeout"]:
+        # Client side timeout
+        raise CraftAiLongRequestTimeOutError()
+      try:
+        return await self._get_decision_tree(agent_id, timestamp, version)
+      except CraftAiLongRequestTimeOutError:
+        # Do nothing and continue.
+        continue
@@ -0,0 +1,300 @@
+from datetime import date, datetime, tzinfo
+
+import numpy as np
+import six
+
+from craftai.errors import CraftAiDecisionError, CraftAiTimeError
+from craftai.interpreter_v1 import InterpreterV1, _VALUE_VALIDATORS as _VALUE_VALIDATORS_V1
+from craftai.interpreter_v2 import InterpreterV2, _VALUE_VALIDATORS as _VALUE_VALIDATORS_V2
+from craftai.time import format_offset, local_zone
+from craftai.timezones import is_timezone, timezone_offset_in_sec
+from craftai.timezones import timezone_offset_in_standard_format
+from craftai.types import TYPES
+
+_NUMERIC_KINDS = "biuf"
+_INTEGER_KINDS = "biu"
+
+_SECONDS_PER_DAY = 24 * 60 * 60
+# Days since the epoch of the dates `datetime` supports
+_MIN_DAY = date.min.toordinal() - date(1970, 1, 1).toordinal()
+_MAX_DAY = date.max.toordinal() - date(1970, 1, 1).toordinal()
+
+_INTEGER_RANGES = {
+  TYPES["day_of_week"]: (0, 6),
+  TYPES["day_of_month"]: (1, 31),
+  TYPES["month_of_year"]: (1, 12),
+  TYPES["timezone"]: (-720, 840)
+}
+
+def column_array(values):
+  """Convert a column of values to a NumPy array.
+
+  Lists are only converted to numerical arrays when all their values are
+  numbers of the same kind so that, unlike `np.asarray`, values are never
+  converted to strings nor integers to floats when some values are missing.
+  """
+  if isinstance(values, np.ndarray):
+    return values
+  values = list(values)
+  value_types = set(type(value) for value in values)
+  if value_types == set([bool]):
+    return np.array(values, dtype=bool)
+  if value_types and value_types <= set(six.integer_types):
+    return np.array(values, dtype=np.int64)
+  if float in value_types and value_types <= set([float] + list(six.integer_types)):
+    return np.array(values, dtype=np.float64)
+  array = np.empty(len(values), dtype=object)
+  array[:] = values
+  return array
+
+def missing_values(values):
+  """Mask of the missing values of a column, `None` or NaN."""
+  if values.dtype.kind == "f":
+    return np.isnan(values)
+  if values.dtype.kind == "O":
+    # NaN is the only value that is not equal to itself
+    return np.equal(values, None) | np.not_equal(values, values)
+  return np.zeros(len(values), dtype=bool)
+
+def invalid_values(property_type, is_optional, values, missing, validators=None):
+  """Mask of the values of a column that aren't valid for the given type.
+
+  Numerical columns are checked at once, other columns are checked value
+  per value with the given validators, those used by `InterpreterV2` by
+  default.
+  """
+  validators = _VALUE_VALIDATORS_V2 if validators is None else validators
+  if property_type not in validators:
+    return np.zeros(len(values), dtype=bool)
+  if values.dtype.kind in _NUMERIC_KINDS:
+    invalid = _invalid_numbers(property_type, values, missing)
+    if invalid is not None:
+      return invalid
+
+  validator = validators[property_type]
+  is_valid = lambda value: validator(value) or (is_optional and value == {})
+  present_values = values[~missing]
+  try:
+    # Columns usually hold few distinct values, e.g. enums, check them once
+    if all(is_valid(value) for value in set(present_values)):
+      return np.zeros(len(values), dtype=bool)
+  except TypeError:
+    # Unhashable values, e.g. optional `{}` values
+    pass
+  return ~missing & np.array([not is_valid(value) for value in values], dtype=bool)
+
+def _invalid_numbers(property_type, values, missing):
+  # The mask of the invalid values of a numerical column, None when they are checked one by one
+  kind = values.dtype.kind
+  if property_type == TYPES["continuous"] or (property_type == TYPES["boolean"] and kind == "b"):
+    return np.zeros(len(values), dtype=bool)
+  if property_type == TYPES["time_of_day"]:
+    with np.errstate(invalid="ignore"):
+      return ~missing & ~((values >= 0) & (values < 24))
+  if property_type in _INTEGER_RANGES:
+    if kind not in _INTEGER_KINDS:
+      return ~missing
+    low, high = _INTEGER_RANGES[property_type]
+    return ~missing & ~((values >= low) & (values <= high))
+  if property_type in (TYPES["boolean"], TYPES["enum"]):
+    return ~missing
+  return None
+
+def _column_arrays(columns):
+  # The number of contexts and the array of each column
+  if not isinstance(columns, dict):
+    raise CraftAiDecisionError(
+      """Invalid context columns, the given object isn't a dict."""
+    )
+  arrays = {key: column_array(value) for key, value in columns.items()}
+  sizes = set(len(array) for array in arrays.values())
+  if len(sizes) > 1:
+    raise CraftAiDecisionError(
+      """Invalid context columns, the given columns don't have the same length."""
+    )
+  return (sizes.pop() if sizes else 0), arrays
+
+def prepare_columns(configuration, columns, deactivate_missing_values=True, major=2):
+  """Check the given context columns against the configuration.
+
+  Returns the number of contexts and a dictionary associating each context
+  property to its values, as a NumPy array, and its missing values mask.
+  Raises a `CraftAiDecisionError` if any of the contexts is not valid, with
+  the message `InterpreterV2._check_context`, or `InterpreterV1` one when
+  `major` is 1, gives for the first context that isn't valid.
+  """
+  validators = _VALUE_VALIDATORS_V2 if major == 2 else _VALUE_VALIDATORS_V1
+  size, arrays = _column_arrays(columns)
+
+  expected_properties = [
+    p for p in configuration["context"]
+    if not p in configuration["output"]
+  ]
+
+  prepared_columns = {}
+  # The first row of each column whose value is missing, when missing values
+  # aren't handled, or invalid
+  invalid_rows = []
+  for property_name in expected_properties:
+    property_def = configuration["context"][property_name]
+    if property_name not in arrays:
+      if deactivate_missing_values and size:
+        invalid_rows.append(0)
+      values = np.empty(size, dtype=object)
+      prepared_columns[property_name] = (values, np.ones(size, dtype=bool))
+      continue
+
+    values = arrays[property_name]
+    missing = missing_values(values)
+
+    if property_def["type"] == TYPES["timezone"]:
+      # Convert timezones as integers into standard +/hh:mm format
+      values = _standard_timezones(values, missing)
+
+    # Optional values are only supported by V2 trees
+    invalid = invalid_values(property_def["type"], major == 2 and property_def.get("is_optional"),
+                             values, missing, validators)
+    if deactivate_missing_values:
+      invalid |= missing
+    if invalid.any():
+      invalid_rows.append(np.argmax(invalid))
+
+    prepared_columns[property_name] = (values, missing)
+
+  if invalid_rows:
+    _check_row(configuration, prepared_columns, min(invalid_rows), deactivate_missing_values,
+               major)
+
+  return size, prepared_columns
+
+def _check_row(configuration, prepared_columns, row, deactivate_missing_values, major):
+  # Raises the error of the given row's context, checked as a single context
+  context = {}
+  for property_name, (values, missing) in prepared_columns.items():
+    value = None if missing[row] else values[row]
+    context[property_name] = value.item() if isinstance(value, np.generic) else value
+#pylint: disable=W0212
+  if major == 2:
+    InterpreterV2._check_context(configuration, context, deactivate_missing_values)
+  else:
+    InterpreterV1._check_context(configuration, context)
+#pylint: enable=W0212
+
+def _standard_timezones(values, missing):
+  if values.dtype.kind in _INTEGER_KINDS:
+    offsets, inverse = np.unique(values, return_inverse=True)
+    formatted = np.array([timezone_offset_in_standard_format(int(offset)) for offset in offsets],
+                         dtype=object)
+    return formatted[inverse]
+  if values.dtype.kind == "O":
+    try:
+      if not any(isinstance(value, six.integer_types) for value in set(values[~missing])):
+        return values
+    except TypeError:
+      # Unhashable values, converted one by one
+      pass
+    values = values.copy()
+    for index in np.flatnonzero(~missing):
+      values[index] = timezone_offset_in_standard_format(values[index])
+  return values
+
+def time_features(timestamps, timezones=None):
+  """Compute the time properties of POSIX timestamps in seconds at once.
+
+  The properties are those `Time(t, timezone).to_dict()` gives for each
+  timestamp. `timezones` is either the timezone of every timestamp or a
+  sequence of the timezone of each of them, timezones being given as `Time`
+  takes them: strings, integer offsets in hours or minutes, tzinfo objects,
+  the local timezone being used for None. Returns NumPy arrays indexed by
+  time type, `timezone` giving the formatted timezones.
+  """
+  timestamps = np.asarray(timestamps)
+  if timestamps.size and timestamps.dtype.kind not in _INTEGER_KINDS:
+    raise CraftAiTimeError(
+      """Unable to instantiate Time from given timestamps. They must be integers."""
+    )
+  timestamps = timestamps.astype(np.int64)
+
+  if not isinstance(timezones, (list, tuple, np.ndarray)):
+    return time_features_from_offsets(timestamps, _utc_offsets(timestamps, timezones))
+
+  if len(timezones) != len(timestamps):
+    raise CraftAiTimeError(
+      """Unable to instantiate Time from given timestamps, they don't have as many"""
+      """ timezones as timestamps."""
+    )
+  if isinstance(timezones, np.ndarray) and timezones.dtype.kind in "iuU":
+    # Integers follow the same rules as `Time` integer timezones
+    uniques, inverse = np.unique(timezones, return_inverse=True)
+    groups = [(timezone, np.flatnonzero(inverse == code))
+              for code, timezone in enumerate(uniques.tolist())]
+  else:
+    rows_by_timezone = {}
+    try:
+      for row, timezone in enumerate(timezones):
+        rows_by_timezone.setdefault(timezone, []).append(row)
+    except TypeError:
+      raise CraftAiTimeError(
+        """Unable to instantiate Time with the given timezone."""
+        """ {} is neither a string nor a timezone.""".format(timezones[row])
+      )
+    groups = [(timezone, np.array(rows, dtype=np.int64))
+              for timezone, rows in rows_by_timezone.items()]
+
+  offsets = np.empty(len(timestamps), dtype=np.int64)
+  for timezone, rows in groups:
+    offsets[rows] = _utc_offsets(timestamps[rows], timezone)
+  return time_features_from_offsets(timestamps, offsets)
+
+def time_features_from_offsets(timestamps, offsets):
+  """Compute the time properties of POSIX timestamps with their UTC offset, both in seconds.
+
+  See `time_features`.
+  """
+  local_timestamps = np.asarray(timestamps, dtype=np.int64) + offsets
+#pylint: disable=E1101
+  days, seconds = np.divmod(local_timestamps, _SECONDS_PER_DAY)
+  if days.size and (days.min() < _MIN_DAY or days.max() > _MAX_DAY):
+    raise CraftAiTimeError(
+      """Unable to instantiate Time from given timestamp. year is out of range"""
+    )
+  hours, seconds = np.divmod(seconds, 3600)
+  minutes, seconds = np.divmod(seconds, 60)
+#pylint: enable=E1101
+  dates = days.astype("datetime64[D]")
+  months = dates.astype("datetime64[M]")
+
+  unique_offsets, inverse = np.unique(offsets, return_inverse=True)
+  timezones = np.array([format_offset(int(offset)) for offset in unique_offsets], dtype=object)
+
+  return {
+    TYPES["time_of_day"]: hours + minutes / 60 + seconds / 3600,
+    # 1970-01-01 was a Thursday
+    TYPES["day_of_week"]: (days + 3) % 7,
+    TYPES["day_of_month"]: (dates - months).astype(np.int64) + 1,
+    TYPES["month_of_year"]: months.astype(np.int64) % 12 + 1,
+    TYPES["timezone"]: timezones[inverse.reshape(-1)]
+  }
+
+def _utc_offsets(timestamps, timezone):
+  if isinstance(timezone, tzinfo) or not timezone:
+    # Like `Time`, the local timezone is used by default, the offsets of the
+    # timezones with daylight saving time depend on the timestamp
+    zone = timezone if isinstance(timezone, tzinfo) else local_zone()
+    uniques, inverse = np.unique(timestamps, return_inverse=True)
+    offsets = np.empty(len(uniques), dtype=np.int64)
+    for index, timestamp in enumerate(uniques.tolist()):
+      try:
+        offset = datetime.fromtimestamp(timestamp, zone).utcoffset()
+      except (OverflowError, OSError, ValueError) as e:
+        raise CraftAiTimeError(
+          """Unable to instantiate Time from given timestamp. {}""".
+          format(e.__str__()))
+      offsets[index] = offset.days * _SECONDS_PER_DAY + offset.seconds
+    return offsets[inverse.reshape(-1)]
+  if is_timezone(timezone):
+    return np.full(len(timestamps), timezone_offset_in_sec(timezone), dtype=np.int64)
+  raise CraftAiTimeError(
+    """Unable to instantiate Time with the given timezone."""
+    """ {} is neither a string nor a timezone.""".format(timezone)
+  )
@@ -3,6 +3,7 @@
 from __future__ import absolute_import
 
 import json
+from multiprocessing.pool import ThreadPool
 import time
 
 from platform import python_implementation, python_version
@@ -17,6 +18,9 @@ from craftai.errors import CraftAiUnknownError, CraftAiInternalError, CraftAiLon
 from craftai.errors import CraftAiNetworkError
 from craftai.interpreter import Interpreter
 from craftai.jwt_decode import jwt_decode
+from craftai.prefetch import iter_prefetched
+from craftai.tree_cache import TreeCache
+from craftai.tree_store import TreeStore
 
 USER_AGENT = "craft-ai-client-python/{} [{} {}]".format(pkg_version,
                                                         python_implementation(),
@@ -25,6 +29,39 @@ USER_AGENT = "craft-ai-client-python/{} [{} {}]".format(pkg_version,
 def current_time_ms():
   return int(round(time.time() * 1000))
 
+def _set_requests_defaults(cfg):
+  if not isinstance(cfg.get("pagesPrefetch"), six.integer_types) or cfg["pagesPrefetch"] < 0:
+    cfg["pagesPrefetch"] = 0
+  if (not isinstance(cfg.get("maxConcurrentRequests"), six.integer_types) or
+      cfg["maxConcurrentRequests"] < 1):
+    cfg["maxConcurrentRequests"] = 10
+
+def _tree_cache(cache_cfg):
+  """The decision trees cache of the `decisionTreeCache` configuration, if any"""
+  if not cache_cfg:
+    return None
+  if not isinstance(cache_cfg, dict):
+    cache_cfg = {}
+  return TreeCache(
+    max_size=cache_cfg.get("maxSize", 128),
+    ttl=cache_cfg.get("ttl", 60),
+    stale_while_revalidate=cache_cfg.get("staleWhileRevalidate", 0)
+  )
+
+def _tree_store(store_cfg, namespace):
+  """The decision trees store of the `decisionTreeStore` configuration, if any"""
+  if not store_cfg:
+    return None
+  if not isinstance(store_cfg, dict):
+    store_cfg = {"directory": store_cfg}
+  return TreeStore(
+    store_cfg["directory"],
+    ttl=store_cfg.get("ttl", 60),
+    max_size=store_cfg.get("maxSize", 256 * 1024 * 1024),
+    namespace=namespace,
+    collect_interval=store_cfg.get("collectInterval", 60)
+  )
+
 class CraftAIClient(object):
   """Client class for craft ai's API"""
 
@@ -32,6 +69,8 @@ class CraftAIClient(object):
     self._base_url = ""
     self._headers = {}
     self._config = {}
+    self.decision_tree_cache = None
+    self.decision_tree_store = None
     # Requests session: connection pooling and base configuration for all requests
     self._requests_session = requests.Session()
 
@@ -68,9 +107,11 @@ class CraftAIClient(object):
                                     """ or invalid owner provided.""")
     if not isinstance(cfg.get("operationsChunksSize"), six.integer_types):
       cfg["operationsChunksSize"] = 200
+    _set_requests_defaults(cfg)
     if (cfg.get("decisionTreeRetrievalTimeout") is not False and
         not isinstance(cfg.get("decisionTreeRetrievalTimeout"), six.integer_types)):
       cfg["decisionTreeRetrievalTimeout"] = 1000 * 60 * 5 # 5 minutes
+    self.decision_tree_cache = _tree_cache(cfg.get("decisionTreeCache"))
     if not isinstance(cfg.get("url"), six.string_types):
       cfg["url"] = "https://beta.craft.ai"
     if cfg.get("url").endswith("/"):
@@ -84,6 +125,8 @@ class CraftAIClient(object):
                                               self.config["owner"],
                                               self.config["project"])
 
+    self.decision_tree_store = _tree_store(cfg.get("decisionTreeStore"), self._base_url)
+
     if cfg.get("proxy"):
       scheme = six.moves.urllib.parse.urlparse(self.config["url"]).scheme
       if not scheme:
@@ -93,6 +136,10 @@ class CraftAIClient(object):
       proxies = {}
       proxies[scheme] = cfg.get("proxy")
       self._requests_session.proxies = proxies
+    # As many pooled connections as concurrent requests
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.config["maxConcurrentRequests"])
+    self._requests_session.mount("http://", adapter)
+    self._requests_session.mount("https://", adapter)
     # Headers have to be set here to avoid multiple definitions
     # of the 'Authorization' header if config is modified
     base_headers = {}
@@ -160,6 +207,8 @@ class CraftAIClient(object):
 
     decoded_resp = self._decode_response(resp)
 
+    self._invalidate_decision_trees(agent_id)
+
     return decoded_resp
 
   def get_shared_agent_inspector_url(self, agent_id, timestamp=None):
@@ -215,6 +264,9 @@ class CraftAIClient(object):
 
       self._decode_response(resp)
 
+      # The decision trees of the agent may change with the new operations
+      self._invalidate_decision_trees(agent_id)
+
       if next_offset >= len(operations):
         is_looping = False
 
@@ -225,18 +277,65 @@ class CraftAIClient(object):
                  % (len(operations), self.config["owner"], self.config["project"], agent_id)
     }
 
-  def _get_operations_list_pages(self, url, ops_list):
-    if url is None:
-      return ops_list
+  def add_operations_bulk(self, operations_by_agent):
+    """Add the context operations of several agents, associated to their ids.
 
-    resp = self._requests_session.get(url)
-
-    new_ops_list = self._decode_response(resp)
-    next_page_url = resp.headers.get("x-craft-ai-next-page-url")
-
-    return self._get_operations_list_pages(next_page_url, ops_list + new_ops_list)
+    The agents are handled concurrently, sending at most
+    `maxConcurrentRequests` requests at once, the chunks of each agent being
+    sent in order. An agent failing doesn't stop the others: the results of
+    the agents and the errors of those which failed are returned in
+    `{"results": {agent_id: result}, "errors": {agent_id: error}}`.
+    """
+    def add(agent_operations):
+      agent_id, operations = agent_operations
+      try:
+        return agent_id, self.add_operations(agent_id, operations), None
+      except Exception as e: # pylint: disable=broad-except
+        return agent_id, None, e
+
+    bulk = {"results": {}, "errors": {}}
+    if not operations_by_agent:
+      return bulk
+    pool = ThreadPool(min(len(operations_by_agent), self._config["maxConcurrentRequests"]))
+    try:
+      for agent_id, result, error in pool.imap_unordered(add, operations_by_agent.items()):
+        if error is None:
+          bulk["results"][agent_id] = result
+        else:
+          bulk["errors"][agent_id] = error
+    finally:
+      pool.terminate()
+    return bulk
+
+  def _iter_pages(self, url, params=None, prefetch_depth=None):
+    if prefetch_depth is None:
+      prefetch_depth = self._config["pagesPrefetch"]
+    return iter_prefetched(self._retrieve_pages(url, params), prefetch_depth)
+
+  def _retrieve_pages(self, url, params):
+    # The pages are retrieved one at a time, as they are consumed
+    while url is not None:
+      resp = self._requests_session.get(url, params=params)
+      yield self._decode_response(resp)
+      url = resp.headers.get("x-craft-ai-next-page-url")
+      # The next page URLs hold the parameters
+      params = None
 
-  def get_operations_list(self, agent_id, start=None, end=None):
+  @staticmethod
+  def _iter_items(pages):
+    for page in pages:
+      for item in page:
+        yield item
+
+#pylint: disable=R0913
+  def iter_operations(self, agent_id, start=None, end=None, pages=False, prefetch=None):
+    """Iterate over the context operations of the agent, retrieving them page by page.
+
+    Yields the operations one by one or, with `pages=True`, the list of
+    operations of each page. With `prefetch` greater than 0, up to `prefetch`
+    pages are retrieved in the background while the current one is consumed,
+    it defaults to the `pagesPrefetch` configuration.
+    """
     # Raises an error when agent_id is invalid
     self._check_agent_id(agent_id)
 
@@ -245,25 +344,28 @@ class CraftAIClient(object):
       "start": start,
       "end": end
     }
-    resp = self._requests_session.get(req_url, params=req_params)
-
-    initial_ops_list = self._decode_response(resp)
-    next_page_url = resp.headers.get("x-craft-ai-next-page-url")
+    operations_pages = self._iter_pages(req_url, req_params, prefetch)
+    return operations_pages if pages else self._iter_items(operations_pages)
+#pylint: enable=R0913
 
-    return self._get_operations_list_pages(next_page_url, initial_ops_list)
+  def get_operations_list(self, agent_id, start=None, end=None, windows=1):
+    """The context operations of the agent between `start` and `end`.
 
-  def _get_state_history_pages(self, url, state_history):
-    if url is None:
-      return state_history
-
-    resp = self._requests_session.get(url)
-
-    new_state_history = self._decode_response(resp)
-    next_page_url = resp.headers.get("x-craft-ai-next-page-url")
+    With `windows` greater than 1, the range is split in as many windows
+    whose pages are retrieved concurrently, the missing bounds being the
+    first and last timestamps of the agent. The operations are returned in
+    timestamp order, once each.
+    """
+    return self._get_windows_items(self.iter_operations, agent_id, start, end, windows)
 
-    return self._get_state_history_pages(next_page_url, state_history + new_state_history)
+#pylint: disable=R0913
+  def iter_state_history(self, agent_id, start=None, end=None, pages=False, prefetch=None):
+    """Iterate over the state history of the agent, retrieving it page by page.
 
-  def get_state_history(self, agent_id, start=None, end=None):
+    Yields the states one by one or, with `pages=True`, the list of states
+    of each page. `prefetch` is the number of pages retrieved in the
+    background, as in `iter_operations`.
+    """
     # Raises an error when agent_id is invalid
     self._check_agent_id(agent_id)
 
@@ -272,12 +374,67 @@ class CraftAIClient(object):
       "start": start,
       "end": end
     }
-    resp = self._requests_session.get(req_url, params=req_params)
+    states_pages = self._iter_pages(req_url, req_params, prefetch)
+    return states_pages if pages else self._iter_items(states_pages)
+#pylint: enable=R0913
 
-    initial_states_history = self._decode_response(resp)
-    next_page_url = resp.headers.get("x-craft-ai-next-page-url")
+  def get_state_history(self, agent_id, start=None, end=None, windows=1):
+    """The state history of the agent between `start` and `end`, retrieved in
+    `windows` concurrent windows as in `get_operations_list`.
+    """
+    return self._get_windows_items(self.iter_state_history, agent_id, start, end, windows)
+
+#pylint: disable=R0913
+  def _get_windows_items(self, iter_items, agent_id, start, end, windows):
+    # Raises an error when agent_id is invalid
+    self._check_agent_id(agent_id)
+    self._check_windows(windows)
+    if windows > 1 and (start is None or end is None):
+      agent = self.get_agent(agent_id)
+      start = agent.get("firstTimestamp") if start is None else start
+      end = agent.get("lastTimestamp") if end is None else end
+
+    def retrieve(bounds):
+      items = []
+      for page in iter_items(agent_id, bounds[0], bounds[1], pages=True):
+        items.extend(page)
+      return items
+
+    windows_bounds = CraftAIClient._split_range(start, end, windows)
+    if len(windows_bounds) == 1:
+      return retrieve(windows_bounds[0])
+    # The requests share the connection pool of the session
+    pool = ThreadPool(len(windows_bounds))
+    try:
+      return CraftAIClient._stitch_windows(pool.map(retrieve, windows_bounds))
+    finally:
+      pool.terminate()
+#pylint: enable=R0913
+
+  @staticmethod
+  def _check_windows(windows):
+    if not isinstance(windows, six.integer_types) or windows < 1:
+      raise CraftAiBadRequestError("""Invalid number of windows given, it must be"""
+                                   """ a positive integer.""")
 
-    return self._get_state_history_pages(next_page_url, initial_states_history)
+  @staticmethod
+  def _stitch_windows(windows_items):
+    items = []
+    for window_items in windows_items:
+      if items:
+        # The consecutive windows share their boundary
+        last_timestamp = items[-1]["timestamp"]
+        window_items = [item for item in window_items if item["timestamp"] > last_timestamp]
+      items.extend(window_items)
+    return items
+
+  @staticmethod
+  def _split_range(start, end, windows):
+    """Bounds of at most `windows` consecutive windows covering [start, end]"""
+    if windows == 1 or start is None or end is None or end <= start:
+      return [(start, end)]
+    boundaries = sorted(set(start + (end - start) * i // windows for i in range(windows + 1)))
+    return list(zip(boundaries[:-1], boundaries[1:]))
 
   def get_context_state(self, agent_id, timestamp):
     # Raises an error when agent_id is invalid
@@ -314,6 +471,22 @@ class CraftAIClient(object):
   def get_decision_tree(self, agent_id, timestamp=None, version=DEFAULT_DECISION_TREE_VERSION):
     # Raises an error when agent_id is invalid
     self._check_agent_id(agent_id)
+    if self.decision_tree_cache is not None:
+      return self.decision_tree_cache.get(
+        agent_id, timestamp, version,
+        lambda: self._retrieve_decision_tree(agent_id, timestamp, version)
+      )
+    return self._retrieve_decision_tree(agent_id, timestamp, version)
+
+  def _retrieve_decision_tree(self, agent_id, timestamp, version):
+    if self.decision_tree_store is not None:
+      return self.decision_tree_store.get(
+        agent_id, timestamp, version,
+        lambda: self._wait_decision_tree(agent_id, timestamp, version)
+      )
+    return self._wait_decision_tree(agent_id, timestamp, version)
+
+  def _wait_decision_tree(self, agent_id, timestamp, version):
     if self._config["decisionTreeRetrievalTimeout"] is False:
       # Don't retry
       return self._get_decision_tree(agent_id, timestamp, version)
@@ -330,9 +503,16 @@ class CraftAIClient(object):
           # Do nothing and continue.
           continue
 
+  def _invalidate_decision_trees(self, agent_id):
+    if self.decision_tree_cache is not None:
+      self.decision_tree_cache.invalidate(agent_id)
+    if self.decision_tree_store is not None:
+      self.decision_tree_store.invalidate(agent_id)
+
   @staticmethod
-  def decide(tree, *args):
-    return Interpreter.decide(tree, args)
+  def decide(tree, *args, **kwargs):
+    # `explain=False` only gives the predicted values and confidences, see `Interpreter.decide`
+    return Interpreter.decide(tree, args, **kwargs)
 
   @staticmethod
   def _parse_body(response):
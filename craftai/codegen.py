@@ -0,0 +1,441 @@
+"""Compile decision trees into Python source code.
+
+Each output tree becomes a function made of nested `if`/`elif` statements
+on local variables with literal operands, the results of the leaves are
+literals as well. The generated module is compiled once per tree and can
+also be exported as a standalone `.py` module.
+"""
+import collections
+import hashlib
+import json
+import math
+import types
+
+import semver
+import six
+
+from craftai.errors import CraftAiError, CraftAiDecisionError, CraftAiNullDecisionError
+from craftai.interpreter_v1 import _VALUE_VALIDATORS as _VALUE_VALIDATORS_V1
+from craftai.interpreter_v1 import _DECISION_VERSION as _DECISION_VERSION_V1
+from craftai.interpreter_v2 import InterpreterV2, _VALUE_VALIDATORS as _VALUE_VALIDATORS_V2
+from craftai.interpreter_v2 import _DECISION_VERSION as _DECISION_VERSION_V2
+from craftai.operators import OPERATORS_V1, OPERATORS_V2, LT, safe_op
+from craftai.trees import parse_tree
+
+# Deeply nested blocks hit the Python parser limits, deeper subtrees are
+# generated as separate functions.
+_MAX_NESTING = 40
+
+# Number of generated modules kept in memory by `load`
+CACHE_SIZE = 64
+
+_MODULES = collections.OrderedDict()
+
+# A decision tree with what the generated code depends on its version
+_ParsedTree = collections.namedtuple("_ParsedTree", [
+  "bare_tree", "configuration", "version", "major", "decision_version", "operators",
+  "validators", "deactivate_missing_values"
+])
+
+_HEADER = """\"\"\"Decision tree compiled by craftai.codegen, do not edit.
+
+`decide(context, explain=True)` takes a decision for a complete context,
+like `craftai.Interpreter.decide(tree, [context], explain)` does.
+\"\"\"
+from craftai.errors import CraftAiDecisionError, CraftAiNullDecisionError
+from craftai.interpreter_v{major} import InterpreterV{major}
+from craftai.timezones import timezone_offset_in_standard_format
+
+TREE_HASH = {tree_hash}
+VERSION = {version}
+DECISION_VERSION = {decision_version}
+CONFIGURATION = {configuration}
+CONTEXT_PROPERTIES = {context_properties}
+TIMEZONE_PROPERTY = {timezone_property}
+DEACTIVATE_MISSING_VALUES = {deactivate_missing_values}
+"""
+
+_FOOTER = """
+OUTPUTS = [
+{outputs}
+]
+
+LEAN_OUTPUTS = [
+{lean_outputs}
+]
+
+check_context = InterpreterV{major}.context_checker(CONFIGURATION{check_context_args})
+
+def decide(context, explain=True):
+  context = {{key: context.get(key) for key in CONTEXT_PROPERTIES}}
+  if TIMEZONE_PROPERTY is not None:
+    context[TIMEZONE_PROPERTY] = timezone_offset_in_standard_format(context[TIMEZONE_PROPERTY])
+  check_context(context)
+  if not explain:
+    return {{
+      "output": {{output: decide_output(context) for output, decide_output in LEAN_OUTPUTS}},
+      "_version": DECISION_VERSION
+    }}
+  return {{
+    "output": {{output: decide_output(context) for output, decide_output in OUTPUTS}},
+    "_version": DECISION_VERSION,
+    "context": context
+  }}
+"""
+
+def tree_hash(tree):
+  """Hash identifying the content of a decision tree"""
+  canonical_tree = json.dumps(tree, sort_keys=True, separators=(",", ":"), default=repr)
+  return hashlib.sha1(canonical_tree.encode("utf-8")).hexdigest()
+
+def generate_source(tree):
+  """Returns the source code of a Python module taking the decisions of the given tree.
+
+  The module defines one `decide_<n>(context)` function per output, listed
+  in `OUTPUTS`, taking a context already checked against the configuration,
+  and a `decide(context)` function checking the given context first. The
+  `decide_lean_<n>(context)` functions, listed in `LEAN_OUTPUTS`, only give
+  the predicted value and confidence of the decisions.
+  """
+  return _generate_source(tree, tree_hash(tree))
+
+def export(tree, path):
+  """Writes the Python module generated from the given tree to `path`"""
+  with open(path, "w") as module_file:
+    module_file.write(generate_source(tree))
+
+def load(tree):
+  """Returns the module generated from the given tree.
+
+  The module is only generated and compiled once per tree content, the
+  last `CACHE_SIZE` modules are kept in memory.
+  """
+  key = tree_hash(tree)
+  module = _MODULES.get(key)
+  if module is None:
+    source = _generate_source(tree, key)
+    module = types.ModuleType("craftai_generated_{}".format(key))
+    six.exec_(compile(source, "<craftai.codegen {}>".format(key), "exec"), module.__dict__)
+    module.SOURCE = source
+    _MODULES[key] = module
+    while len(_MODULES) > CACHE_SIZE:
+      _MODULES.popitem(last=False)
+  return module
+
+def _parse(tree):
+  bare_tree, configuration, tree_version = parse_tree(tree)
+  if semver.match(tree_version, ">=1.0.0") and semver.match(tree_version, "<2.0.0"):
+    return _ParsedTree(bare_tree, configuration, tree_version, 1, _DECISION_VERSION_V1,
+                       OPERATORS_V1, _VALUE_VALIDATORS_V1, True)
+  if semver.match(tree_version, ">=2.0.0") and semver.match(tree_version, "<3.0.0"):
+    return _ParsedTree(bare_tree, configuration, tree_version, 2, _DECISION_VERSION_V2,
+                       OPERATORS_V2, _VALUE_VALIDATORS_V2,
+                       configuration.get("deactivate_missing_values", True) is not False)
+  raise CraftAiDecisionError(
+    """Invalid decision tree format, "{}" is currently not a valid version.""".
+    format(tree_version)
+  )
+
+def _generate_source(tree, key):
+  parsed_tree = _parse(tree)
+  configuration = parsed_tree.configuration
+  output_properties = configuration.get("output")
+  timezone_properties = [
+    key for key in configuration["context"]
+    if configuration["context"][key]["type"] == "timezone"
+  ]
+
+  lines = [_HEADER.format(
+    major=parsed_tree.major,
+    tree_hash=_literal(key),
+    version=_literal(parsed_tree.version),
+    decision_version=_literal(parsed_tree.decision_version),
+    configuration=_literal(configuration),
+    context_properties=_literal([
+      key for key in configuration["context"] if key not in output_properties
+    ]),
+    timezone_property=_literal(timezone_properties[0] if timezone_properties else None),
+    deactivate_missing_values=_literal(parsed_tree.deactivate_missing_values)
+  )]
+  outputs = []
+  lean_outputs = []
+  constants = []
+  functions = []
+  for index, output in enumerate(output_properties):
+    for lean in [False, True]:
+      generator = _OutputGenerator(parsed_tree, index, constants, lean)
+      functions.extend(generator.generate())
+      (lean_outputs if lean else outputs).append(
+        "  ({}, {}),".format(_literal(output), generator.name))
+  lines.extend("{} = {}".format(name, literal) for name, literal in constants)
+  lines.append("")
+  lines.extend(functions)
+  lines.append(_FOOTER.format(
+    outputs="\n".join(outputs),
+    lean_outputs="\n".join(lean_outputs),
+    major=parsed_tree.major,
+    check_context_args="" if parsed_tree.major == 1 else ", DEACTIVATE_MISSING_VALUES"
+  ))
+  return "\n".join(lines)
+
+def _literal(value):
+  # Python source of a JSON value, floats keep their exact value
+  if isinstance(value, bool) or value is None:
+    return repr(value)
+  if isinstance(value, float):
+    if math.isnan(value) or math.isinf(value):
+      return "float({!r})".format(repr(value))
+    return repr(value)
+  if isinstance(value, six.integer_types + six.string_types):
+    return repr(value)
+  if isinstance(value, (list, tuple)):
+    return "[{}]".format(", ".join(_literal(item) for item in value))
+  if isinstance(value, dict):
+    return "{{{}}}".format(", ".join(
+      "{}: {}".format(_literal(item_key), _literal(item)) for item_key, item in value.items()
+    ))
+  raise CraftAiError("Unable to generate the source of the decision tree, {!r} is not"
+                     " a valid JSON value.".format(value))
+
+def _raise_statement(exception):
+  # Errors found while generating the code are raised when the branch is reached
+  exception_type = type(exception)
+  if issubclass(exception_type, CraftAiError):
+    return "raise {}({})".format(exception_type.__name__, _literal(exception.message))
+  if exception_type.__module__ not in ("builtins", "exceptions"):
+    raise exception
+  return "raise {}({})".format(exception_type.__name__,
+                               ", ".join(_literal(arg) for arg in exception.args))
+
+def _is_leaf(node):
+  return not (node.get("children") is not None and len(node.get("children")))
+
+#pylint: disable=R0902,R0903
+class _OutputGenerator(object):
+  """Generates the functions taking the decisions of the output at `index`"""
+
+  def __init__(self, parsed_tree, index, constants, lean=False):
+    self.name = "decide_{}{}".format("lean_" if lean else "", index)
+    self.tree = parsed_tree
+    self.output = parsed_tree.configuration["output"][index]
+    self.bare_tree = parsed_tree.bare_tree[self.output]
+    self.output_values = self.bare_tree.get("output_values")
+    self.output_type = parsed_tree.configuration["context"][self.output]["type"]
+    self.variables = {}
+    # Subtrees generated as separate functions, (name, node, decision rules)
+    self.subtrees = []
+    self.subtrees_count = 0
+    # Module level (name, literal) of the leaves results and decision rules,
+    # they are copied by the generated functions like `_OutputTreeV2` does.
+    self.constants = constants
+    # Lean functions only return the predicted value and confidence
+    self.lean = lean
+
+  def generate(self):
+    functions = []
+    pending = [(self.name, self.bare_tree, [])]
+    while pending:
+      name, node, decision_rules = pending.pop(0)
+      self.variables = {}
+      self.subtrees = []
+      body = []
+      self._node(node, decision_rules, 1, body)
+      header = [
+        "def {}(context):".format(name),
+        "  # Decisions of {}".format(_literal(self.output))
+      ]
+      header.extend(
+        "  {} = context.get({})".format(variable, _literal(property_name))
+        for property_name, variable in sorted(self.variables.items(), key=lambda item: item[1])
+      )
+      functions.append("\n".join(header + body) + "\n")
+      pending.extend(self.subtrees)
+    return functions
+
+  def _constant(self, prefix, value):
+    name = "_{}_{}".format(prefix, len(self.constants))
+    self.constants.append((name, _literal(value)))
+    return name
+
+  def _variable(self, property_name):
+    if property_name not in self.variables:
+      self.variables[property_name] = "v{}".format(len(self.variables))
+    return self.variables[property_name]
+
+  def _may_be_none(self):
+    return self.tree.major == 2 and not self.tree.deactivate_missing_values
+
+  def _may_be_empty(self, property_name):
+    # Only optional properties accept `{}` values once the context is checked
+    property_def = self.tree.configuration["context"].get(property_name)
+    return (property_def is None or property_def["type"] not in self.tree.validators or
+            bool(self.tree.major == 2 and property_def.get("is_optional")))
+
+  def _node(self, node, decision_rules, depth, lines):
+    indent = "  " * depth
+    if _is_leaf(node):
+      lines.extend(indent + statement for statement in self._leaf(node, decision_rules))
+      return
+    if depth >= _MAX_NESTING:
+      self.subtrees_count += 1
+      name = "_{}_{}".format(self.name, self.subtrees_count)
+      self.subtrees.append((name, node, decision_rules))
+      lines.append(indent + "return {}(context)".format(name))
+      return
+
+    if self._children(node["children"], decision_rules, depth, lines):
+      lines.extend(indent + statement
+                   for statement in self._no_matching_child(node, decision_rules))
+
+  def _children(self, children, decision_rules, depth, lines):
+    # The conditions of the children in order, returns False when an invalid
+    # operator is reached, the following code being unreachable
+    indent = "  " * depth
+    raise_missing = self.tree.major == 1 or self.tree.deactivate_missing_values
+    # The missing values are checked once when all the children split on the same property
+    checked_once = raise_missing and len(set(
+      child["decision_rule"]["property"] for child in children)) == 1
+    if checked_once:
+      lines.extend(self._missing_check(children[0]["decision_rule"]["property"], indent))
+
+    keyword = "if"
+    for child in children:
+      decision_rule = child["decision_rule"]
+      if raise_missing and not checked_once:
+        keyword = "if"
+        lines.extend(self._missing_check(decision_rule["property"], indent))
+      operator = decision_rule["operator"]
+      if (not isinstance(operator, six.string_types) or
+          not operator in self.tree.operators.values()):
+        lines.append(indent + _raise_statement(CraftAiDecisionError(
+          """Invalid decision tree format, {} is not a valid"""
+          """ decision operator.""".format(operator)
+        )))
+        return False
+      if self.lean:
+        child_decision_rules = decision_rules + [None]
+      else:
+        child_decision_rules = decision_rules + [self._constant("RULE", {
+          "property": decision_rule["property"],
+          "operator": operator,
+          "operand": decision_rule["operand"]
+        })]
+      lines.append("{}{} {}:".format(indent, keyword,
+                                     self._condition(decision_rule["property"], operator,
+                                                     decision_rule["operand"])))
+      self._node(child, child_decision_rules, depth + 1, lines)
+      keyword = "elif"
+    return True
+
+  def _missing_check(self, property_name, indent):
+    return [
+      "{}if {} is None:".format(indent, self._variable(property_name)),
+      "{}  {}".format(indent, _raise_statement(CraftAiDecisionError(
+        """Unable to take decision, property '{}' is missing from the given context.""".
+        format(property_name)
+      )))
+    ]
+
+  def _condition(self, property_name, operator, operand):
+    variable = self._variable(property_name)
+    if operator == self.tree.operators["IS"]:
+      return "{} == {}".format(variable, _literal(operand))
+    if operator == self.tree.operators.get("IN_MULTI"):
+      if (not self._may_be_empty(property_name) and isinstance(operand, list) and
+          operand and all(isinstance(item, six.string_types) for item in operand)):
+        # Set literals of constants are compiled as frozensets
+        return "{} in {{{}}}".format(variable, ", ".join(_literal(item) for item in operand))
+      return "{} in {}".format(variable, _literal(operand))
+
+    # Comparisons never validate missing and `{}` values, see `safe_op`
+    guards = []
+    if self._may_be_none():
+      guards.append("{} is not None".format(variable))
+    if self._may_be_empty(property_name):
+      guards.append("{} != {{}}".format(variable))
+    if operator == self.tree.operators["GTE"]:
+      comparisons = ["{} >= {}".format(variable, _literal(operand))]
+    elif operator == self.tree.operators["LT"]:
+      comparisons = ["{} < {}".format(variable, _literal(operand))]
+    else:
+      low, high = _literal(operand[0]), _literal(operand[1])
+      if safe_op(operand[0], operand[1], LT):
+        comparisons = ["{} >= {}".format(variable, low), "{} < {}".format(variable, high)]
+      else:
+        comparisons = ["({0} >= {1} or {0} < {2})".format(variable, low, high)]
+    return " and ".join(guards + comparisons)
+
+  def _leaf(self, node, decision_rules):
+    try:
+      result = self._leaf_result(node, decision_rules)
+    except Exception as e: # pylint: disable=broad-except
+      return [_raise_statement(e)]
+    if result["predicted_value"] is None:
+      return [_raise_statement(CraftAiNullDecisionError(
+        """Unable to take decision: the decision tree has no valid"""
+        """ predicted value for the given context."""
+      ))]
+    return self._return_statements(result, decision_rules)
+
+  def _leaf_result(self, node, decision_rules):
+    if self.tree.major == 1:
+      result = {
+        "predicted_value": node.get("predicted_value"),
+        "confidence": node.get("confidence") or 0
+      }
+      if node.get("standard_deviation", None) is not None:
+        result["standard_deviation"] = node.get("standard_deviation")
+    else:
+      # We check if a leaf has the key 'prediction' corresponging to a v2 tree
+      prediction = node.get("prediction")
+      if prediction is None:
+        prediction = node
+      predicted_value = prediction.get("value")
+      if predicted_value is None:
+        return {"predicted_value": None}
+      result = {
+        "predicted_value": predicted_value,
+        "confidence": prediction.get("confidence") or 0,
+        "nb_samples": prediction["nb_samples"]
+      }
+      distribution = prediction.get("distribution")
+      if not isinstance(distribution, list) and distribution.get("standard_deviation"):
+        result["standard_deviation"] = distribution.get("standard_deviation")
+      # Distributions are only forwarded by the parent nodes when they are not empty
+      elif distribution or not decision_rules:
+        result["distribution"] = distribution
+    return result
+
+  def _no_matching_child(self, node, decision_rules):
+    if self.tree.major == 1 or self.tree.deactivate_missing_values:
+      property_name = node["children"][0]["decision_rule"]["property"]
+      return ["raise CraftAiNullDecisionError(\"Unable to take decision: value '{{}}' for"
+              " property '{{}}' doesn't validate any of the decision rules.\".format({}, {}))"
+              .format(self._variable(property_name), _literal(property_name))]
+    # If there is no child corresponding matching the operators then we compute
+    # the probabilistic distribution from this node, once for all.
+    try:
+      result = InterpreterV2.compute_distribution(node, self.output_values, self.output_type)
+    except Exception as e: # pylint: disable=broad-except
+      return [_raise_statement(e)]
+    del result["decision_rules"]
+    if decision_rules and "distribution" in result and not result["distribution"]:
+      del result["distribution"]
+    statements = self._return_statements(result, decision_rules)
+    if not self.lean and isinstance(result.get("distribution"), list):
+      # Each decision gets its own copy of the computed distribution
+      statements.insert(1, "result[\"distribution\"] = list(result[\"distribution\"])")
+    return statements
+
+  def _return_statements(self, result, decision_rules):
+    if self.lean:
+      return ["return {{\"predicted_value\": {}, \"confidence\": {}}}".format(
+        _literal(result["predicted_value"]), _literal(result["confidence"]))]
+    return [
+      "result = {}.copy()".format(self._constant("RESULT", result)),
+      "result[\"decision_rules\"] = [{}]".format(
+        ", ".join("{}.copy()".format(rule) for rule in decision_rules)),
+      "return result"
+    ]
+
+#pylint: enable=R0902,R0903
@@ -0,0 +1,599 @@
+from bisect import bisect_right
+
+import semver
+import six
+
+from craftai.decision import Decision, OutputDecision
+from craftai.errors import CraftAiError, CraftAiDecisionError, CraftAiNullDecisionError
+from craftai.interpreter_v1 import InterpreterV1, _DECISION_VERSION as _DECISION_VERSION_V1
+from craftai.interpreter_v2 import InterpreterV2, _DECISION_VERSION as _DECISION_VERSION_V2
+from craftai.operators import OPERATORS_V1, OPERATORS_FUNCTION_V1, OPERATORS_V2
+from craftai.operators import OPERATORS_FUNCTION_V2
+from craftai.time import Time
+from craftai.timezones import get_timezone_key, timezone_offset_in_standard_format
+from craftai.trees import DeferredError, bound_children, index_children, join_decide_args
+from craftai.trees import context_plan, copy_result, lean_result, parse_tree
+
+_NUMBER_TYPES = six.integer_types + (float,)
+
+def _invalid_operator(operator):
+  def raise_invalid_operator(*_):
+    raise CraftAiDecisionError(
+      """Invalid decision tree format, {} is not a valid"""
+      """ decision operator.""".format(operator)
+    )
+  return raise_invalid_operator
+
+def _resolve_operator(operator, operators, operators_function):
+  if (not isinstance(operator, six.string_types) or
+      not operator in operators.values()):
+    return _invalid_operator(operator)
+  return operators_function[operator]
+
+def _is_leaf(node):
+  return not (node.get("children") is not None and len(node.get("children")))
+
+#pylint: disable=R0902,R0903,R0913,C0123
+class _Node(object):
+  """A decision tree node whose children decision rules are resolved"""
+
+  __slots__ = ("children", "leaf", "source", "fallback", "split_property", "index", "bounds",
+               "bounds_children")
+
+  def __init__(self, children, leaf, source, index=None, bounds=None):
+    # List of (property, operator function, operand, decision rule, child node)
+    self.children = children
+    # Partial decision result for leaves, None for inner nodes
+    self.leaf = leaf
+    # The node as found in the decision tree json
+    self.source = source
+    # Decision result, or error, when no child matches and missing values are handled
+    self.fallback = None
+    # Value to (decision rule, child node) of the nodes splitting on values, see `index_children`
+    self.index = index
+    # Sorted bounds and (decision rule, child node) of the values between each bound
+    # for the nodes splitting on intervals, see `bound_children`
+    self.bounds, self.bounds_children = bounds or (None, None)
+    self.split_property = children[0][0] if index is not None or bounds is not None else None
+
+  def find_child(self, context, deactivate_missing_values=True):
+    """The (decision rule, child node) of the first child validated by the context, or None"""
+    index = self.index
+    if index is not None:
+      context_value = context.get(self.split_property)
+      if context_value is None and deactivate_missing_values:
+        _raise_missing_property(self.split_property)
+      try:
+        return index.get(context_value)
+      except TypeError:
+        # Unhashable values, e.g. optional `{}` values, are checked against each child
+        pass
+    bounds = self.bounds
+    if bounds is not None:
+      context_value = context.get(self.split_property)
+      if context_value is None and deactivate_missing_values:
+        _raise_missing_property(self.split_property)
+      # NaN, missing and `{}` values are checked against each child
+      if type(context_value) in _NUMBER_TYPES and context_value == context_value:
+        return self.bounds_children[bisect_right(bounds, context_value)]
+    for property_name, operator_function, operand, decision_rule, child in self.children:
+      context_value = context.get(property_name)
+      if context_value is None and deactivate_missing_values:
+        _raise_missing_property(property_name)
+      if operator_function(context_value, operand):
+        return decision_rule, child
+    return None
+#pylint: enable=R0902,R0903,R0913,C0123
+
+def _compile_node(node, operators, operators_function, make_leaf):
+  if _is_leaf(node):
+    return _Node(None, make_leaf(node), node)
+
+  children = []
+  for child in node["children"]:
+    decision_rule = child["decision_rule"]
+    operator = decision_rule["operator"]
+    children.append((
+      decision_rule["property"],
+      _resolve_operator(operator, operators, operators_function),
+      decision_rule["operand"],
+      {
+        "property": decision_rule["property"],
+        "operator": operator,
+        "operand": decision_rule["operand"]
+      },
+      _compile_node(child, operators, operators_function, make_leaf)
+    ))
+  index = index_children([
+    (property_name, decision_rule["operator"], operand, (decision_rule, child))
+    for property_name, _, operand, decision_rule, child in children
+  ], operators)
+  bounds = None
+  if index is None:
+    bounds = bound_children([
+      (property_name, decision_rule["operator"], operand, (decision_rule, child))
+      for property_name, _, operand, decision_rule, child in children
+    ], operators)
+  return _Node(children, None, node, index, bounds)
+
+def _make_leaf_v1(node):
+  leaf = {
+    "predicted_value": node.get("predicted_value"),
+    "confidence": node.get("confidence") or 0
+  }
+  if node.get("standard_deviation", None) is not None:
+    leaf["standard_deviation"] = node.get("standard_deviation")
+  return leaf
+
+def _make_leaf_v2(node):
+  # We check if a leaf has the key 'prediction' corresponging to a v2 tree
+  prediction = node.get("prediction")
+  if prediction is None:
+    prediction = node
+
+  if prediction.get("value") is None:
+    # The decisions reaching this leaf are null decisions
+    return {"predicted_value": None}
+
+  leaf = {
+    "predicted_value": prediction.get("value"),
+    "confidence": prediction.get("confidence") or 0,
+    "nb_samples": prediction["nb_samples"]
+  }
+
+  distribution = prediction.get("distribution")
+  if not isinstance(distribution, list) and distribution.get("standard_deviation"):
+    leaf["standard_deviation"] = distribution.get("standard_deviation")
+  else:
+    leaf["distribution"] = distribution
+  return leaf
+
+def _raise_no_matching_child(node, context):
+  prop = node.children[0][0]
+  raise CraftAiNullDecisionError(
+    """Unable to take decision: value '{}' for property '{}' doesn't"""
+    """ validate any of the decision rules.""".format(context.get(prop), prop)
+  )
+
+def _raise_null_leaf():
+  raise CraftAiNullDecisionError(
+    """Unable to take decision: the decision tree has no valid"""
+    """ predicted value for the given context."""
+  )
+
+def _raise_missing_property(property_name):
+  raise CraftAiDecisionError(
+    """Unable to take decision, property '{}' is missing from the given context.""".
+    format(property_name)
+  )
+
+def _set_fallbacks(root, output_values, output_type):
+  # Computes the distribution of every node in a single bottom-up pass,
+  # errors are deferred to the decisions needing these distributions.
+  distributions = {}
+  stack = [root]
+  while stack:
+    node = stack[-1]
+    if node.leaf is None and node.children[0][4] not in distributions:
+      stack.extend(child for _, _, _, _, child in reversed(node.children))
+      continue
+    stack.pop()
+    try:
+      if node.leaf is not None:
+        distributions[node] = InterpreterV2.leaf_distribution(node.source)
+        continue
+      children_distributions = [distributions[child] for _, _, _, _, child in node.children]
+      errors = [d for d in children_distributions if isinstance(d, DeferredError)]
+      if errors:
+        distributions[node] = node.fallback = errors[0]
+        continue
+      distributions[node] = InterpreterV2.compute_mean(*zip(*children_distributions))
+    except Exception as e: # pylint: disable=broad-except
+      distributions[node] = node.fallback = DeferredError(e)
+      continue
+    try:
+      node.fallback = InterpreterV2.distribution_result(distributions[node][0],
+                                                        distributions[node][1],
+                                                        output_values,
+                                                        output_type)
+    except Exception as e: # pylint: disable=broad-except
+      node.fallback = DeferredError(e)
+
+def _fallback_result(node):
+  if isinstance(node.fallback, DeferredError):
+    node.fallback.throw()
+  return copy_result(node.fallback)
+
+class _OutputTreeV1(object):
+  """Compiled tree of a V1 decision tree output"""
+
+  def __init__(self, bare_tree):
+    self.root = _compile_node(bare_tree, OPERATORS_V1, OPERATORS_FUNCTION_V1, _make_leaf_v1)
+
+  def decide(self, context):
+    decision_rules = []
+    node = self.root
+    while node.leaf is None:
+      matching_child = node.find_child(context)
+      if matching_child is None:
+        _raise_no_matching_child(node, context)
+      decision_rules.append(matching_child[0].copy())
+      node = matching_child[1]
+
+    if node.leaf["predicted_value"] is None:
+      _raise_null_leaf()
+    result = node.leaf.copy()
+    result["decision_rules"] = decision_rules
+    return result
+
+  def decide_lean(self, context):
+    node = self.root
+    while node.leaf is None:
+      matching_child = node.find_child(context)
+      if matching_child is None:
+        _raise_no_matching_child(node, context)
+      node = matching_child[1]
+
+    if node.leaf["predicted_value"] is None:
+      _raise_null_leaf()
+    return lean_result(node.leaf)
+
+  def decide_lazy(self, context):
+    path = []
+    node = self.root
+    while node.leaf is None:
+      matching_child = node.find_child(context)
+      if matching_child is None:
+        _raise_no_matching_child(node, context)
+      path.append(matching_child[0])
+      node = matching_child[1]
+
+    if node.leaf["predicted_value"] is None:
+      _raise_null_leaf()
+    return OutputDecision(node.leaf, path, dict.copy)
+
+class _OutputTreeV2(object):
+  """Compiled tree of a V2 decision tree output"""
+
+  def __init__(self, bare_tree, output_type, deactivate_missing_values):
+    self.root = _compile_node(bare_tree, OPERATORS_V2, OPERATORS_FUNCTION_V2, _make_leaf_v2)
+    self.output_values = bare_tree.get("output_values")
+    self.output_type = output_type
+    self.deactivate_missing_values = deactivate_missing_values
+    if not deactivate_missing_values:
+      _set_fallbacks(self.root, self.output_values, output_type)
+
+  def decide(self, context):
+    deactivate_missing_values = self.deactivate_missing_values
+    decision_rules = []
+    node = self.root
+    while node.leaf is None:
+      matching_child = node.find_child(context, deactivate_missing_values)
+      if matching_child is None:
+        if deactivate_missing_values:
+          _raise_no_matching_child(node, context)
+        # If there is no child corresponding matching the operators then we use
+        # the probabilistic distribution of this node.
+        result = _fallback_result(node)
+        break
+      decision_rules.append(matching_child[0].copy())
+      node = matching_child[1]
+    else:
+      if node.leaf["predicted_value"] is None:
+        _raise_null_leaf()
+      result = node.leaf.copy()
+
+    result["decision_rules"] = decision_rules
+    # Distributions are only forwarded by the parent nodes when they are not empty
+    if decision_rules and "distribution" in result and not result["distribution"]:
+      del result["distribution"]
+    return result
+
+  def decide_lean(self, context):
+    deactivate_missing_values = self.deactivate_missing_values
+    node = self.root
+    while node.leaf is None:
+      matching_child = node.find_child(context, deactivate_missing_values)
+      if matching_child is None:
+        if deactivate_missing_values:
+          _raise_no_matching_child(node, context)
+        if isinstance(node.fallback, DeferredError):
+          node.fallback.throw()
+        return lean_result(node.fallback)
+      node = matching_child[1]
+
+    if node.leaf["predicted_value"] is None:
+      _raise_null_leaf()
+    return lean_result(node.leaf)
+
+  def decide_lazy(self, context):
+    deactivate_missing_values = self.deactivate_missing_values
+    path = []
+    node = self.root
+    while node.leaf is None:
+      matching_child = node.find_child(context, deactivate_missing_values)
+      if matching_child is None:
+        if deactivate_missing_values:
+          _raise_no_matching_child(node, context)
+        if isinstance(node.fallback, DeferredError):
+          node.fallback.throw()
+        return OutputDecision(node.fallback, path, dict.copy)
+      path.append(matching_child[0])
+      node = matching_child[1]
+
+    if node.leaf["predicted_value"] is None:
+      _raise_null_leaf()
+    return OutputDecision(node.leaf, path, dict.copy)
+
+class _GeneratedOutputTree(object):
+  """Output tree whose decisions are taken by generated functions"""
+
+  __slots__ = "decide", "decide_lean"
+
+  def __init__(self, decide, decide_lean):
+    self.decide = decide
+    self.decide_lean = decide_lean
+
+  def decide_lazy(self, context):
+    # The generated functions build the decision rules as they go
+    return OutputDecision.from_dict(self.decide(context))
+
+ENGINES = ["tree", "flat", "codegen"]
+
+#pylint: disable=R0902
+class CompiledTree(object):
+  """Decision tree parsed once to take many decisions.
+
+  The results of `decide` are identical to those of `Interpreter.decide`
+  for the same tree. The `engine` selects how each output tree is stored:
+
+  - "tree", nested nodes whose decision rules are resolved (default),
+  - "flat", a compact struct of NumPy arrays (requires NumPy),
+  - "codegen", Python functions generated from the tree, see `craftai.codegen`.
+  """
+
+  def __init__(self, tree, engine="tree"):
+    if engine not in ENGINES:
+      raise CraftAiError("Unknown decision engine '{}', it must be one of {}."
+                         .format(engine, ", ".join(ENGINES)))
+
+    bare_tree, configuration, tree_version = parse_tree(tree)
+
+    self.configuration = configuration
+    self.version = tree_version
+
+    if semver.match(tree_version, ">=1.0.0") and semver.match(tree_version, "<2.0.0"):
+      self._decision_version = _DECISION_VERSION_V1
+      deactivate_missing_values = True
+      if engine == "tree":
+        self._output_trees = [
+          (output, _OutputTreeV1(bare_tree[output])) for output in configuration.get("output")
+        ]
+      elif engine == "flat":
+        # NumPy is only required by the flat engine
+        from craftai.flat_tree import FlatTree
+        self._output_trees = [
+          (output, FlatTree(bare_tree[output], configuration["context"][output]["type"],
+                            major=1))
+          for output in configuration.get("output")
+        ]
+    elif semver.match(tree_version, ">=2.0.0") and semver.match(tree_version, "<3.0.0"):
+      self._decision_version = _DECISION_VERSION_V2
+      # Check if missing values are handled
+      deactivate_missing_values = True
+      if configuration.get("deactivate_missing_values", True) is False:
+        deactivate_missing_values = False
+      if engine == "flat":
+        # NumPy is only required by the flat engine
+        from craftai.flat_tree import FlatTree
+        output_tree_class = FlatTree
+      else:
+        output_tree_class = _OutputTreeV2
+      if engine != "codegen":
+        self._output_trees = [
+          (output, output_tree_class(bare_tree[output],
+                                     configuration["context"][output]["type"],
+                                     deactivate_missing_values))
+          for output in configuration.get("output")
+        ]
+    else:
+      raise CraftAiDecisionError(
+        """Invalid decision tree format, "{}" is currently not a valid version.""".
+        format(tree_version)
+      )
+    if engine == "codegen":
+      # Imported here as the generator relies on the interpreter
+      from craftai import codegen
+      module = codegen.load(tree)
+      self._output_trees = [
+        (output, _GeneratedOutputTree(decide_output, decide_lean_output))
+        for (output, decide_output), (_, decide_lean_output) in zip(module.OUTPUTS,
+                                                                    module.LEAN_OUTPUTS)
+      ]
+    self._bare_tree = bare_tree
+    self._flat_output_trees = None
+    if engine == "flat":
+      self._flat_output_trees = self._output_trees
+    self._set_configuration(deactivate_missing_values)
+
+  def _set_configuration(self, deactivate_missing_values):
+    configuration = self.configuration
+    self._deactivate_missing_values = deactivate_missing_values
+    if self._decision_version == _DECISION_VERSION_V1:
+      self._check_context = InterpreterV1.context_checker(configuration)
+    else:
+      self._check_context = InterpreterV2.context_checker(configuration,
+                                                          deactivate_missing_values)
+
+    if configuration != {}:
+      self._context_properties, self._generated_properties = context_plan(configuration)
+      self._timezone_key = get_timezone_key(configuration["context"])
+    else:
+      self._context_properties = []
+      self._generated_properties = []
+      self._timezone_key = None
+
+  def decide(self, *args, **kwargs):
+    """Take a decision for the given context and time, as `Interpreter.decide` does.
+
+    With `explain=False`, the decision only gives the predicted value and
+    confidence of each output, neither the decision rules nor the context.
+    With `lazy=True`, explained decisions are returned as a `Decision`
+    object whose decision rules are only built when they are accessed,
+    `Decision.to_dict()` giving the usual decision.
+    """
+    return self.decide_context(self.decision_context(*args), kwargs.get("explain", True),
+                               kwargs.get("lazy", False))
+
+  def decision_context(self, *args):
+    """The context a decision is taken for, rebuilt from the given context and time."""
+    if self.configuration != {}:
+      time = None if len(args) == 1 else args[1]
+      context = self._rebuild_context(args[0], time)
+    else:
+      context = join_decide_args(args)
+
+    # Convert timezones as integers into standard +/hh:mm format
+    # This should only happen when no time generated value is required
+    if self._timezone_key:
+      context[self._timezone_key] = timezone_offset_in_standard_format(
+        context[self._timezone_key])
+    return context
+
+  def decide_context(self, context, explain=True, lazy=False):
+    """Take a decision for a context given by `decision_context`, as `decide` does."""
+    self._check_context(context)
+
+    if not explain:
+      return {
+        "output": {
+          output: output_tree.decide_lean(context) for output, output_tree in self._output_trees
+        },
+        "_version": self._decision_version
+      }
+
+    if lazy:
+      return Decision(
+        {output: output_tree.decide_lazy(context) for output, output_tree in self._output_trees},
+        self._decision_version,
+        context
+      )
+
+    decision = {
+      "output": {
+        output: output_tree.decide(context) for output, output_tree in self._output_trees
+      },
+      "_version": self._decision_version,
+      "context": context
+    }
+    return decision
+
+  def _rebuild_context(self, state, time):
+    context = {feature: state.get(feature) for feature in self._context_properties}
+    if self._generated_properties and isinstance(time, Time):
+      time_dict = time.to_dict()
+      for prop, prop_type in self._generated_properties:
+        context[prop] = time_dict[prop_type]
+    return context
+
+  def decide_batch(self, columns, decision_rules=False):
+    """Take the decisions for many contexts given as columns.
+
+    `columns` associates each context property to the list, or NumPy array,
+    of its values; `None` and NaN are missing values. Returns, for each output,
+    NumPy arrays of the `predicted_value`, `confidence`, `nb_samples` and
+    `error` of the decisions; `error` holds the message of the null decisions.
+    The `decision_rules` of each decision are only gathered on demand.
+    The `distribution` of classification decisions is a matrix, one row per
+    decision; the other distributions, e.g. regression distributions without
+    standard deviation, are objects, `None` for the decisions without any.
+    The decisions of V1 trees have neither `nb_samples` nor distribution.
+    NumPy is required.
+    """
+    # NumPy is only required by the flat engine
+    from craftai.batch import prepare_columns
+
+    size, prepared_columns = prepare_columns(self.configuration, columns,
+                                             self._deactivate_missing_values, self._major)
+    return {
+      "output": {
+        output: flat_tree.decide_batch(prepared_columns, size, decision_rules)
+        for output, flat_tree in self._flat_trees()
+      },
+      "_version": self._decision_version
+    }
+
+  def _flat_trees(self):
+    from craftai.flat_tree import FlatTree
+
+    if self._flat_output_trees is None:
+      self._flat_output_trees = [
+        (output, FlatTree(self._bare_tree[output],
+                          self.configuration["context"][output]["type"],
+                          self._deactivate_missing_values,
+                          self._major))
+        for output in self.configuration.get("output")
+      ]
+    return self._flat_output_trees
+
+  @property
+  def decision_version(self):
+    """The version of the decisions taken on the tree."""
+    return self._decision_version
+
+  @property
+  def context_properties(self):
+    """The properties of the contexts given by `decision_context`."""
+    return list(self._context_properties)
+
+  @property
+  def bare_tree(self):
+    """The decision tree of each output, `None` for the trees given by `load`."""
+    return self._bare_tree
+
+  @property
+  def _major(self):
+    return 1 if self._decision_version == _DECISION_VERSION_V1 else 2
+
+  def save(self, path):
+    """Save the tree in a compact binary file, loaded by `CompiledTree.load`.
+
+    The file holds the flat representation of the tree, its arrays are
+    memory mapped when it is loaded. NumPy is required.
+    """
+    # NumPy is only required by the flat engine
+    from craftai.flat_tree import save_flat_trees
+
+    save_flat_trees(path, {"version": self.version, "configuration": self.configuration},
+                    self._flat_trees())
+
+  @classmethod
+  def load(cls, path):
+    """Load a tree saved by `CompiledTree.save`, as a tree compiled with the flat engine.
+
+    The arrays of the tree aren't copied from the memory mapped file, the
+    processes loading the same file share a single copy of them.
+    """
+    # NumPy is only required by the flat engine
+    from craftai.flat_tree import load_flat_trees
+
+    metadata, flat_trees = load_flat_trees(path)
+    compiled_tree = cls.__new__(cls)
+    cls._set_flat_trees(compiled_tree, metadata["configuration"], metadata["version"], flat_trees)
+    return compiled_tree
+
+  def _set_flat_trees(self, configuration, tree_version, flat_trees):
+    self.configuration = configuration
+    self.version = tree_version
+    if semver.match(tree_version, "<2.0.0"):
+      self._decision_version = _DECISION_VERSION_V1
+    else:
+      self._decision_version = _DECISION_VERSION_V2
+    self._output_trees = flat_trees
+    self._flat_output_trees = flat_trees
+    # The tree itself isn't saved
+    self._bare_tree = None
+    # Missing values are never handled by V1 trees
+    self._set_configuration(
+      self._major == 1 or configuration.get("deactivate_missing_values", True) is not False)
+#pylint: enable=R0902
@@ -0,0 +1,90 @@
+"""Decision results of the compiled trees built without nested dictionaries"""
+
+from craftai.trees import copy_result
+
+class OutputDecision(object):
+  """Decision taken for one output, as returned by `CompiledTree.decide(..., lazy=True)`.
+
+  The predicted value and the other results are read from the leaf, or the
+  node whose distribution is used, shared by all the decisions reaching it.
+  The decision rules are only built from the path leading to this node when
+  they are first accessed. `to_dict` gives the dictionary that
+  `Interpreter.decide` would give for this output.
+  """
+
+  __slots__ = "_result", "_path", "_rule", "_decision_rules"
+
+  def __init__(self, result, path, rule):
+    # Result shared by the decisions, without decision rules, it must not be modified
+    self._result = result
+    # Steps from the root to the node, `rule(step)` being the decision rule of each step
+    self._path = path
+    self._rule = rule
+    self._decision_rules = None
+
+  @property
+  def predicted_value(self):
+    return self._result["predicted_value"]
+
+  @property
+  def confidence(self):
+    return self._result["confidence"]
+
+  @property
+  def nb_samples(self):
+    return self._result.get("nb_samples")
+
+  @property
+  def standard_deviation(self):
+    return self._result.get("standard_deviation")
+
+  @property
+  def distribution(self):
+    # Distributions are only forwarded by the parent nodes when they are not empty
+    distribution = self._result.get("distribution")
+    if self._path and not distribution:
+      return None
+    return distribution
+
+  @property
+  def decision_rules(self):
+    if self._decision_rules is None:
+      self._decision_rules = [self._rule(step) for step in self._path]
+    return self._decision_rules
+
+  def to_dict(self):
+    result = copy_result(self._result)
+    result["decision_rules"] = [self._rule(step) for step in self._path]
+    if self._path and "distribution" in result and not result["distribution"]:
+      del result["distribution"]
+    return result
+
+  @staticmethod
+  def from_dict(result):
+    """The output decision of a decision result dictionary, e.g. from generated code"""
+    result = result.copy()
+    return OutputDecision(result, result.pop("decision_rules"), dict.copy)
+
+#pylint: disable=R0903
+class Decision(object):
+  """Decision taken by `CompiledTree.decide(..., lazy=True)`.
+
+  `output` associates each output to its `OutputDecision`, `version` is the
+  version of the decision format and `context` the context of the decision.
+  """
+
+  __slots__ = "output", "version", "context"
+
+  def __init__(self, output, version, context):
+    self.output = output
+    self.version = version
+    self.context = context
+
+  def to_dict(self):
+    """The decision as `Interpreter.decide` gives it"""
+    return {
+      "output": {output: decision.to_dict() for output, decision in self.output.items()},
+      "_version": self.version,
+      "context": self.context
+    }
+#pylint: enable=R0903
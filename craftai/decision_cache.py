@@ -0,0 +1,207 @@
+"""Cache of the decisions taken on decision trees"""
+
+from bisect import bisect_right
+from collections import OrderedDict
+import itertools
+import numbers
+import threading
+
+from craftai.compiled_tree import CompiledTree
+from craftai.errors import CraftAiError, CraftAiDecisionError
+from craftai.operators import OPERATORS_V2
+from craftai.trees import DeferredError, copy_result, lean_result
+from craftai.types import TYPES
+
+_THRESHOLD_OPERATORS = [OPERATORS_V2["GTE"], OPERATORS_V2["LT"]]
+_QUANTIZED_TYPES = [TYPES["continuous"], TYPES["time_of_day"]]
+
+def _is_number(value):
+  return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+def _split_thresholds(bare_tree, configuration):
+  """Thresholds of the properties that are only compared to numbers in the tree.
+
+  All the values of such a property lying between two consecutive thresholds
+  follow the same path in the tree.
+  """
+  thresholds = {
+    key: set() for key, value in configuration["context"].items()
+    if value["type"] in _QUANTIZED_TYPES and key not in configuration["output"]
+  }
+  for key, value in configuration["context"].items():
+    if key in thresholds:
+      # Values out of these bounds, or NaN, are never quantized, the time of day bounds
+      # also give the values validity
+      if value["type"] == TYPES["time_of_day"]:
+        thresholds[key].update([0, 24])
+      else:
+        thresholds[key].update([float("-inf"), float("inf")])
+
+  nodes = [bare_tree[output] for output in configuration["output"]]
+  while nodes:
+    node = nodes.pop()
+    for child in node.get("children") or []:
+      nodes.append(child)
+      decision_rule = child["decision_rule"]
+      property_name = decision_rule["property"]
+      if property_name not in thresholds:
+        continue
+      operator = decision_rule["operator"]
+      operand = decision_rule["operand"]
+      if operator in _THRESHOLD_OPERATORS and _is_number(operand):
+        thresholds[property_name].add(operand)
+      elif (operator == OPERATORS_V2["IN_INTERVAL"] and isinstance(operand, list) and
+            len(operand) == 2 and all(_is_number(bound) for bound in operand)):
+        thresholds[property_name].update(operand)
+      else:
+        del thresholds[property_name]
+
+  return {key: sorted(value) for key, value in thresholds.items()}
+
+def _context_key(context, properties, thresholds):
+  key = []
+  for property_name in properties:
+    value = context.get(property_name)
+    property_thresholds = thresholds.get(property_name)
+    if (property_thresholds is not None and _is_number(value) and
+        property_thresholds[0] <= value < property_thresholds[-1]):
+      # Only the position of the value among the thresholds matters
+      key.append((DecisionCache, bisect_right(property_thresholds, value)))
+      continue
+    try:
+      hash(value)
+    except TypeError:
+      # Unhashable values, e.g. optional `{}` values
+      key.append((type(value), repr(value)))
+      continue
+    # The type distinguishes values such as `1` and `True` which aren't valid for the same types
+    key.append((type(value), value))
+  return tuple(key)
+
+def _copy_output(output):
+  return {
+    output_name: dict(copy_result(result),
+                      decision_rules=[rule.copy() for rule in result["decision_rules"]])
+    for output_name, result in output.items()
+  }
+
+#pylint: disable=R0902
+class DecisionCache(object):
+  """Least recently used cache of the decisions taken on decision trees.
+
+  Decisions are keyed by the identity of the tree object and by the context
+  rebuilt from the given context and time, the trees must therefore not be
+  modified once used. Cached decisions are equal to those of
+  `Interpreter.decide`, including the null decisions errors.
+
+  With `quantize`, the values of the continuous and time of day properties
+  are only distinguished by their position among the split thresholds of
+  the tree, values following the same path in the tree share their decision.
+  """
+
+  def __init__(self, max_size=1024, quantize=False, max_trees=16):
+    if max_size < 1 or max_trees < 1:
+      raise CraftAiError("""Invalid decision cache size, it must be a positive integer.""")
+    self.max_size = max_size
+    self.max_trees = max_trees
+    self.quantize = quantize
+    self.hits = 0
+    self.misses = 0
+    self._decisions = OrderedDict()
+    self._trees = OrderedDict()
+    self._tree_ids = itertools.count()
+    self._lock = threading.Lock()
+
+  def decide(self, tree, args, explain=True):
+    """Take a decision as `Interpreter.decide(tree, args, explain)`, reusing cached decisions"""
+    tree_id, compiled_tree, properties, thresholds = self._compiled_tree(tree)
+    context = compiled_tree.decision_context(*args)
+    if properties is None:
+      properties = sorted(context)
+    key = (tree_id, _context_key(context, properties, thresholds))
+
+    with self._lock:
+      cached = self._decisions.pop(key, None)
+      if cached is not None:
+        self._decisions[key] = cached
+        self.hits += 1
+      else:
+        self.misses += 1
+
+    if cached is None:
+      try:
+        decision = compiled_tree.decide_context(context)
+        cached = decision["output"]
+      except CraftAiDecisionError as e:
+        # Error messages give the context values, only exact contexts share them
+        if self.quantize:
+          raise
+        cached = DeferredError(e)
+      self._store(key, cached)
+
+    if isinstance(cached, DeferredError):
+      cached.throw()
+    if not explain:
+      return {
+        "output": {output: lean_result(result) for output, result in cached.items()},
+        "_version": compiled_tree.decision_version
+      }
+    return {
+      "output": _copy_output(cached),
+      "_version": compiled_tree.decision_version,
+      "context": context
+    }
+
+  def info(self):
+    """Statistics of the cache"""
+    return {
+      "hits": self.hits,
+      "misses": self.misses,
+      "size": len(self._decisions),
+      "max_size": self.max_size
+    }
+
+  def clear(self):
+    with self._lock:
+      self._decisions.clear()
+      self._trees.clear()
+      self.hits = 0
+      self.misses = 0
+
+  def __len__(self):
+    return len(self._decisions)
+
+  def _store(self, key, cached):
+    with self._lock:
+      self._decisions[key] = cached
+      while len(self._decisions) > self.max_size:
+        self._decisions.popitem(last=False)
+
+  def _compiled_tree(self, tree):
+    with self._lock:
+      entry = self._trees.pop(id(tree), None)
+      if entry is not None:
+        self._trees[id(tree)] = entry
+        return entry[1:]
+
+    compiled_tree = CompiledTree(tree)
+    configuration = compiled_tree.configuration
+    if configuration != {}:
+      properties = compiled_tree.context_properties
+      thresholds = {}
+      if self.quantize:
+        thresholds = _split_thresholds(compiled_tree.bare_tree, configuration)
+    else:
+      # The context isn't rebuilt, all its properties are kept
+      properties = None
+      thresholds = {}
+
+    with self._lock:
+      # The tree is kept alongside its id so that the id can't be reused by another tree,
+      # the decisions of evicted trees are never hit again as ids aren't reused
+      entry = (tree, next(self._tree_ids), compiled_tree, properties, thresholds)
+      self._trees[id(tree)] = entry
+      while len(self._trees) > self.max_trees:
+        self._trees.popitem(last=False)
+    return entry[1:]
+#pylint: enable=R0902
@@ -0,0 +1,811 @@
+from bisect import bisect_right
+import copy
+import json
+import mmap
+import numbers
+import struct
+
+import numpy as np
+import six
+
+from craftai.decision import OutputDecision
+from craftai.errors import CraftAiError, CraftAiDecisionError, CraftAiNullDecisionError
+from craftai.interpreter_v2 import InterpreterV2
+from craftai.operators import OPERATORS_V1, OPERATORS_V2 as OPERATORS
+from craftai.operators import OPERATORS_FUNCTION_V2 as OPERATORS_FUNCTION
+from craftai.trees import DeferredError, bound_children, copy_result, index_children
+from craftai.trees import lean_result
+from craftai.types import TYPES
+
+# Operators are stored as small integer codes in the flat arrays
+OPERATOR_CODES = {
+  OPERATORS["IS"]: 0,
+  OPERATORS["IN_INTERVAL"]: 1,
+  OPERATORS["GTE"]: 2,
+  OPERATORS["LT"]: 3,
+  OPERATORS["IN_MULTI"]: 4
+}
+INVALID_OPERATOR_CODE = -1
+NO_OPERATOR_CODE = -2
+
+_OPERATORS_FROM_CODES = {code: operator for operator, code in OPERATOR_CODES.items()}
+
+_IS = OPERATOR_CODES[OPERATORS["IS"]]
+_IN_INTERVAL = OPERATOR_CODES[OPERATORS["IN_INTERVAL"]]
+_GTE = OPERATOR_CODES[OPERATORS["GTE"]]
+_LT = OPERATOR_CODES[OPERATORS["LT"]]
+_IN_MULTI = OPERATOR_CODES[OPERATORS["IN_MULTI"]]
+
+_NUMBER_TYPES = six.integer_types + (float,)
+
+# Children index of the nodes not indexed yet, see `FlatTree._index_children`
+_NOT_INDEXED = object()
+
+# The arrays of a flat tree, saved as they are in the flat trees files
+_ARRAYS = ["feature", "operator", "operand_low", "operand_high", "first_child", "children_count",
+           "leaf_index", "parent", "leaf_nb_samples", "leaf_standard_deviation"]
+
+# Flat trees files start with this magic string and the size of their JSON header, the
+# arrays follow, each one aligned on `_ALIGNMENT` bytes
+_MAGIC = b"CRAFTAIFLAT1"
+_HEADER_SIZE = struct.Struct("<Q")
+_ALIGNMENT = 64
+
+def _is_leaf(node):
+  return not (node.get("children") is not None and len(node.get("children")))
+
+def _is_valid_operator(operator, operators):
+  return isinstance(operator, six.string_types) and operator in operators
+
+def _bounds(operator, operand):
+  # Numerical operands are duplicated as floats for the comparisons,
+  # the original operands are kept for the decision rules.
+  if operator == OPERATORS["IN_INTERVAL"]:
+    return float(operand[0]), float(operand[1])
+  if operator in (OPERATORS["GTE"], OPERATORS["LT"]):
+    return float(operand), np.nan
+  return np.nan, np.nan
+
+def _raise_missing_property(property_name):
+  raise CraftAiDecisionError(
+    """Unable to take decision, property '{}' is missing from the given context.""".
+    format(property_name)
+  )
+
+def _layout(bare_tree):
+  # The nodes of the tree laid out breadth first, with the position of their parent
+  nodes = [(bare_tree, -1)]
+  position = 0
+  while position < len(nodes):
+    node = nodes[position][0]
+    if not _is_leaf(node):
+      nodes.extend((child, position) for child in node["children"])
+    position += 1
+  return nodes
+
+def _structure_arrays(nodes):
+  # The arrays linking the nodes to their children, parent and leaf, and the leaves
+  first_children = []
+  children_counts = []
+  leaf_indices = []
+  leaves = []
+  next_child = 1
+  for node, _ in nodes:
+    if _is_leaf(node):
+      first_children.append(-1)
+      children_counts.append(0)
+      leaf_indices.append(len(leaves))
+      leaves.append(node)
+    else:
+      first_children.append(next_child)
+      children_counts.append(len(node["children"]))
+      leaf_indices.append(-1)
+      next_child += len(node["children"])
+  arrays = {
+    "first_child": np.array(first_children, dtype=np.int32),
+    "children_count": np.array(children_counts, dtype=np.int32),
+    "leaf_index": np.array(leaf_indices, dtype=np.int32),
+    "parent": np.array([parent for _, parent in nodes], dtype=np.int32)
+  }
+  return arrays, leaves
+
+def _decision_rules_state(nodes, valid_operators):
+  # The decision rules leading to each node, the root has none
+  properties = []
+  properties_index = {}
+  features = [-1]
+  operators = [NO_OPERATOR_CODE]
+  operands = [None]
+  bounds = [(np.nan, np.nan)]
+  invalid_operators = {}
+  for decision_rule in (node["decision_rule"] for node, _ in nodes[1:]):
+    property_name = decision_rule["property"]
+    if property_name not in properties_index:
+      properties_index[property_name] = len(properties)
+      properties.append(property_name)
+    operator = decision_rule["operator"]
+    features.append(properties_index[property_name])
+    operands.append(decision_rule["operand"])
+    if _is_valid_operator(operator, valid_operators):
+      operators.append(OPERATOR_CODES[operator])
+      bounds.append(_bounds(operator, decision_rule["operand"]))
+    else:
+      # Invalid operators are kept to raise when they are evaluated
+      operators.append(INVALID_OPERATOR_CODE)
+      invalid_operators[len(features) - 1] = operator
+      bounds.append((np.nan, np.nan))
+
+  bounds = np.array(bounds, dtype=np.float64).reshape(-1, 2)
+  arrays = {
+    "feature": np.array(features, dtype=np.int32),
+    "operator": np.array(operators, dtype=np.int8),
+    "operand_low": bounds[:, 0].copy(),
+    "operand_high": bounds[:, 1].copy()
+  }
+  attributes = {
+    "properties": properties,
+    "operand": operands,
+    "invalid_operators": invalid_operators
+  }
+  return arrays, attributes
+
+def _leaves_state(leaves, output_values, major):
+  # The payload of the leaves
+  values = []
+  confidences = []
+  nb_samples = []
+  standard_deviations = []
+  distributions = []
+  for leaf in leaves:
+    if major == 1:
+      values.append(leaf.get("predicted_value"))
+      confidences.append(leaf.get("confidence") or 0)
+      nb_samples.append(0)
+      standard_deviation = leaf.get("standard_deviation", None)
+      standard_deviations.append(np.nan if standard_deviation is None else standard_deviation)
+      distributions.append(None)
+      continue
+    # We check if a leaf has the key 'prediction' corresponging to a v2 tree
+    prediction = leaf.get("prediction")
+    if prediction is None:
+      prediction = leaf
+    values.append(prediction.get("value"))
+    confidences.append(prediction.get("confidence") or 0)
+    distribution = prediction.get("distribution")
+    if prediction.get("value") is None:
+      # The decisions reaching this leaf are null decisions, its distribution
+      # may still be used by the missing values fallbacks
+      nb_samples.append(prediction.get("nb_samples", 0))
+      standard_deviations.append(np.nan)
+      distributions.append(distribution if isinstance(distribution, list) else None)
+      continue
+    nb_samples.append(prediction["nb_samples"])
+    if not isinstance(distribution, list) and distribution.get("standard_deviation"):
+      standard_deviations.append(distribution.get("standard_deviation"))
+      distributions.append(None)
+    else:
+      standard_deviations.append(np.nan)
+      distributions.append(distribution)
+
+  arrays = {
+    "leaf_nb_samples": np.array(nb_samples, dtype=np.int64),
+    "leaf_standard_deviation": np.array(standard_deviations, dtype=np.float64)
+  }
+  attributes = {
+    "leaf_value": values,
+    # As the predicted values, the confidences are kept as given, integers included
+    "leaf_confidence": confidences,
+    "leaf_distribution": None
+  }
+  # Classification distributions are stored as a (leaves x output values) matrix
+  if (output_values is not None and
+      all(isinstance(d, list) and len(d) == len(output_values) for d in distributions)):
+    arrays["leaf_distribution"] = np.array(distributions, dtype=np.float64).reshape(
+      len(distributions), len(output_values))
+  else:
+    attributes["leaf_distribution"] = distributions
+  return arrays, attributes
+
+def _flatten(bare_tree, output_type, deactivate_missing_values, major):
+  # The arrays and the other attributes of the flat tree, see `FlatTree.state`
+  nodes = _layout(bare_tree)
+  output_values = bare_tree.get("output_values")
+  arrays, leaves = _structure_arrays(nodes)
+  rules_arrays, attributes = _decision_rules_state(
+    nodes, set((OPERATORS if major == 2 else OPERATORS_V1).values()))
+  leaves_arrays, leaves_attributes = _leaves_state(leaves, output_values, major)
+  arrays.update(rules_arrays)
+  arrays.update(leaves_arrays)
+  attributes.update(leaves_attributes)
+  attributes.update({
+    "output_values": output_values,
+    "output_type": output_type,
+    "major": major,
+    "deactivate_missing_values": deactivate_missing_values or major == 1
+  })
+  return arrays, attributes
+
+#pylint: disable=R0902
+class FlatTree(object):
+  """Decision tree of one output stored as a struct of arrays.
+
+  Nodes are laid out breadth first so that the children of a node are
+  contiguous: the children of node `i` are the nodes `first_child[i]` to
+  `first_child[i] + children_count[i] - 1`. The decision rule leading to a
+  node is stored at this node's index, leaves point to their payload
+  through `leaf_index` and `parent` gives the parent of each node.
+
+  V1 trees, `major` being 1, are lowered to the same arrays: their leaves
+  have neither samples count nor distribution, `in` isn't one of their
+  operators and missing values are never handled.
+  """
+
+  def __init__(self, bare_tree, output_type, deactivate_missing_values=True, major=2):
+    self._set_state(*_flatten(bare_tree, output_type, deactivate_missing_values, major))
+
+  @classmethod
+  def from_state(cls, arrays, attributes):
+    """The tree of the given `state()`, its arrays are used without copy"""
+    flat_tree = cls.__new__(cls)
+    cls._set_state(flat_tree, arrays, attributes)
+    return flat_tree
+
+  def _set_state(self, arrays, attributes):
+    self.output_values = attributes["output_values"]
+    self.output_type = attributes["output_type"]
+    self.major = attributes["major"]
+    self.deactivate_missing_values = attributes["deactivate_missing_values"]
+    self.properties = attributes["properties"]
+    self.feature = arrays["feature"]
+    self.operator = arrays["operator"]
+    self.operand = attributes["operand"]
+    self.operand_low = arrays["operand_low"]
+    self.operand_high = arrays["operand_high"]
+    self.first_child = arrays["first_child"]
+    self.children_count = arrays["children_count"]
+    self.leaf_index = arrays["leaf_index"]
+    self.parent = arrays["parent"]
+    self.invalid_operators = dict(attributes["invalid_operators"])
+    self.leaf_value = attributes["leaf_value"]
+    self.leaf_confidence = attributes["leaf_confidence"]
+    self.leaf_nb_samples = arrays["leaf_nb_samples"]
+    self.leaf_standard_deviation = arrays["leaf_standard_deviation"]
+    self.leaf_distribution = arrays.get("leaf_distribution", attributes["leaf_distribution"])
+    # The nodes are indexed when they are first reached, large trees load without
+    # going through all of their nodes
+    self.children_index = [_NOT_INDEXED] * self.nodes_count
+    self.children_bounds = [None] * self.nodes_count
+    self._batch_payload_cache = None
+    # Results of the leaves reached by lazy decisions, shared by these decisions
+    self._leaf_results_cache = {}
+    # Distributions of the nodes used when no child matches, see `_fallbacks`
+    self.fallbacks = None if self.deactivate_missing_values else self._fallbacks()
+
+  def _index_children(self, node):
+    # Children of the nodes splitting on values, indexed by value, see `index_children`,
+    # and of the nodes splitting on intervals, by interval, see `bound_children`
+    first = int(self.first_child[node])
+    children = [
+      (self.feature[child], _OPERATORS_FROM_CODES.get(self.operator[child]),
+       self.operand[child], child)
+      for child in range(first, first + int(self.children_count[node]))
+    ]
+    index = index_children(children, OPERATORS)
+    if index is None:
+      self.children_bounds[node] = bound_children(children, OPERATORS)
+    self.children_index[node] = index
+    return index
+
+  def state(self):
+    """The arrays and the other attributes of the tree, from which `from_state` rebuilds it"""
+    arrays = {name: getattr(self, name) for name in _ARRAYS}
+    leaf_distribution = self.leaf_distribution
+    if isinstance(leaf_distribution, np.ndarray):
+      arrays["leaf_distribution"] = leaf_distribution
+      leaf_distribution = None
+    attributes = {
+      "output_values": self.output_values,
+      "output_type": self.output_type,
+      "major": self.major,
+      "deactivate_missing_values": self.deactivate_missing_values,
+      "properties": self.properties,
+      "operand": self.operand,
+      "leaf_value": self.leaf_value,
+      "leaf_confidence": self.leaf_confidence,
+      "leaf_distribution": leaf_distribution,
+      "invalid_operators": [[node, operator] for node, operator in self.invalid_operators.items()]
+    }
+    return arrays, attributes
+
+  @property
+  def nodes_count(self):
+    return len(self.feature)
+
+  def decide(self, context):
+    node, path = self._follow(context)
+    if self.children_count[node]:
+      # If there is no child corresponding matching the operators then we compute
+      # the probabilistic distribution from this node.
+      result = self.compute_distribution(node)
+    else:
+      result = self._leaf_result(int(self.leaf_index[node]))
+
+    result["decision_rules"] = [self.decision_rule(child) for child in path]
+    # Distributions are only forwarded by the parent nodes when they are not empty
+    if path and "distribution" in result and not result["distribution"]:
+      del result["distribution"]
+    return result
+
+  def decide_lean(self, context):
+    node, _ = self._follow(context)
+    if self.children_count[node]:
+      fallback = self.fallbacks[node]
+      if isinstance(fallback, DeferredError):
+        fallback.throw()
+      return lean_result(fallback)
+    leaf = int(self.leaf_index[node])
+    predicted_value = self.leaf_value[leaf]
+    if predicted_value is None:
+      raise CraftAiNullDecisionError(
+        """Unable to take decision: the decision tree has no valid"""
+        """ predicted value for the given context."""
+      )
+    return {"predicted_value": predicted_value, "confidence": self.leaf_confidence[leaf]}
+
+  def decide_lazy(self, context):
+    node, path = self._follow(context)
+    if self.children_count[node]:
+      result = self.fallbacks[node]
+      if isinstance(result, DeferredError):
+        result.throw()
+    else:
+      leaf = int(self.leaf_index[node])
+      result = self._leaf_results_cache.get(leaf)
+      if result is None:
+        result = self._leaf_results_cache[leaf] = self._leaf_result(leaf)
+    return OutputDecision(result, path, self.decision_rule)
+
+  def _follow(self, context):
+    # The node where the decision is taken, a leaf or the node whose distribution
+    # is used when no child matches, and the path leading to it.
+    children_count = self.children_count
+    path = []
+    node = 0
+    while children_count[node]:
+      matching_child = self._find_child(node, context)
+      if matching_child < 0:
+        if self.deactivate_missing_values:
+          property_name = self.properties[self.feature[self.first_child[node]]]
+          raise CraftAiNullDecisionError(
+            """Unable to take decision: value '{}' for property '{}' doesn't"""
+            """ validate any of the decision rules.""".format(context.get(property_name),
+                                                              property_name)
+          )
+        break
+      path.append(matching_child)
+      node = matching_child
+    return node, path
+
+#pylint: disable=C0123
+  def _find_child(self, node, context):
+    # The first child of the node whose decision rule the context validates, -1 if none
+    index = self.children_index[node]
+    if index is _NOT_INDEXED:
+      index = self._index_children(node)
+    bounds = self.children_bounds[node]
+    if index is not None or bounds is not None:
+      property_name = self.properties[self.feature[self.first_child[node]]]
+      context_value = context.get(property_name)
+      if context_value is None and self.deactivate_missing_values:
+        _raise_missing_property(property_name)
+      if index is not None:
+        try:
+          return index.get(context_value, -1)
+        except TypeError:
+          # Unhashable values, e.g. optional `{}` values, are checked against each child
+          pass
+      # NaN, missing and `{}` values are checked against each child
+      elif type(context_value) in _NUMBER_TYPES and context_value == context_value:
+        matching_child = bounds[1][bisect_right(bounds[0], context_value)]
+        return -1 if matching_child is None else matching_child
+    return self._scan_children(node, context)
+#pylint: enable=C0123
+
+  def _scan_children(self, node, context):
+    first = int(self.first_child[node])
+    for child in range(first, first + int(self.children_count[node])):
+      property_name = self.properties[self.feature[child]]
+      context_value = context.get(property_name)
+      if context_value is None:
+        if self.deactivate_missing_values:
+          _raise_missing_property(property_name)
+        if self.operator[child] in (_IN_INTERVAL, _GTE, _LT):
+          # Missing values never validate a comparison
+          continue
+      if self._matches(child, context_value):
+        return child
+    return -1
+
+  def _matches(self, child, context_value):
+    code = self.operator[child]
+    if code == _IN_INTERVAL:
+      low = self.operand_low[child]
+      high = self.operand_high[child]
+      if low < high:
+        return context_value != {} and context_value >= low and context_value < high
+      return context_value != {} and (context_value >= low or context_value < high)
+    if code == _IS:
+      return context_value == self.operand[child]
+    if code == _GTE:
+      return context_value != {} and context_value >= self.operand_low[child]
+    if code == _LT:
+      return context_value != {} and context_value < self.operand_low[child]
+    if code == _IN_MULTI:
+      return context_value in self.operand[child]
+    raise CraftAiDecisionError(
+      """Invalid decision tree format, {} is not a valid"""
+      """ decision operator.""".format(self.invalid_operators[child])
+    )
+
+  def decision_rule(self, node):
+    operator_code = self.operator[node]
+    return {
+      "property": self.properties[self.feature[node]],
+      "operator": _OPERATORS_FROM_CODES[operator_code],
+      "operand": self.operand[node]
+    }
+
+  def decision_rules(self, node):
+    """The decision rules leading from the root to the given node"""
+    path = []
+    while node > 0:
+      path.append(node)
+      node = self.parent[node]
+    return [self.decision_rule(child) for child in reversed(path)]
+
+  def _leaf_distribution(self, leaf):
+    distribution = self.leaf_distribution[leaf]
+    if isinstance(distribution, np.ndarray):
+      return distribution.tolist()
+    return distribution
+
+  def _leaf_result(self, leaf):
+    predicted_value = self.leaf_value[leaf]
+    if predicted_value is None:
+      raise CraftAiNullDecisionError(
+        """Unable to take decision: the decision tree has no valid"""
+        """ predicted value for the given context."""
+      )
+    result = {
+      "predicted_value": predicted_value,
+      "confidence": self.leaf_confidence[leaf]
+    }
+    standard_deviation = self.leaf_standard_deviation[leaf]
+    if self.major == 1:
+      if not np.isnan(standard_deviation):
+        result["standard_deviation"] = standard_deviation.item()
+      return result
+    result["nb_samples"] = self.leaf_nb_samples[leaf].item()
+    if np.isnan(standard_deviation):
+      result["distribution"] = self._leaf_distribution(leaf)
+    else:
+      result["standard_deviation"] = standard_deviation.item()
+    return result
+
+  def _fallbacks(self):
+    # Computes the distribution of every node in a single bottom-up pass, children
+    # come after their parent in the breadth first layout. See `InterpreterV2._distribution`.
+    distributions = [None] * self.nodes_count
+    fallbacks = [None] * self.nodes_count
+    for node in range(self.nodes_count - 1, -1, -1):
+      count = int(self.children_count[node])
+      try:
+        if count == 0:
+          leaf = int(self.leaf_index[node])
+          distribution = self._leaf_distribution(leaf)
+          nb_samples = self.leaf_nb_samples[leaf].item()
+          if isinstance(distribution, list):
+            distributions[node] = (distribution, nb_samples)
+          elif self.leaf_value[leaf] is not None:
+            distributions[node] = (self.leaf_value[leaf], nb_samples)
+          else:
+            raise CraftAiDecisionError(
+              """Unable to take decision: the decision tree has no valid"""
+              """ predicted value for the given context."""
+            )
+          continue
+        first = int(self.first_child[node])
+        children_distributions = distributions[first:first + count]
+        errors = [d for d in children_distributions if isinstance(d, DeferredError)]
+        if errors:
+          distributions[node] = fallbacks[node] = errors[0]
+          continue
+        distributions[node] = InterpreterV2.compute_mean(*zip(*children_distributions))
+      except Exception as e: # pylint: disable=broad-except
+        distributions[node] = fallbacks[node] = DeferredError(e)
+        continue
+      try:
+        fallbacks[node] = InterpreterV2.distribution_result(distributions[node][0],
+                                                            distributions[node][1],
+                                                            self.output_values,
+                                                            self.output_type)
+      except Exception as e: # pylint: disable=broad-except
+        fallbacks[node] = DeferredError(e)
+    return fallbacks
+
+  def compute_distribution(self, node):
+    fallback = self.fallbacks[node]
+    if isinstance(fallback, DeferredError):
+      fallback.throw()
+    return copy_result(fallback)
+
+  ##########################
+  # Decisions over columns #
+  ##########################
+
+  def decide_batch(self, columns, size, decision_rules=False):
+    """Take the decisions for `size` contexts given as columns.
+
+    `columns` associates each context property to its values and missing
+    values mask, as returned by `craftai.batch.prepare_columns`. The rows are
+    split between the children of each node level by level. If
+    `decision_rules` is true, the decision rules of each decision are also
+    returned, the rows reaching the same node share the same list.
+    """
+    final_nodes = np.zeros(size, dtype=np.int32)
+    unmatched = np.zeros(size, dtype=bool)
+
+    frontier = [(0, np.arange(size))]
+    while frontier:
+      next_frontier = []
+      for node, rows in frontier:
+        final_nodes[rows] = node
+        if self.children_count[node]:
+          unmatched[self._split_rows(node, rows, columns, next_frontier)] = True
+      frontier = next_frontier
+
+    results = self._batch_results(final_nodes, unmatched, columns)
+    if decision_rules:
+      results["decision_rules"] = self._batch_decision_rules(final_nodes, results["error"])
+    return results
+
+  def _split_rows(self, node, rows, columns, children_rows):
+    # Appends the rows matching each child of the node to `children_rows`,
+    # returns the rows matching none of them
+    remaining = rows
+    first = int(self.first_child[node])
+    for child in range(first, first + int(self.children_count[node])):
+      if not remaining.size:
+        break
+      property_name = self.properties[self.feature[child]]
+      if property_name in columns:
+        values, missing = columns[property_name]
+        values = values[remaining]
+        missing = missing[remaining]
+      else:
+        values = np.empty(remaining.size, dtype=object)
+        missing = np.ones(remaining.size, dtype=bool)
+      if self.deactivate_missing_values and missing.any():
+        _raise_missing_property(property_name)
+      matched = self._match_batch(child, values) & ~missing
+      children_rows.append((child, remaining[matched]))
+      remaining = remaining[~matched]
+    return remaining
+
+  def _match_batch(self, node, values):
+    code = self.operator[node]
+    operand = self.operand[node]
+    if code == INVALID_OPERATOR_CODE:
+      raise CraftAiDecisionError(
+        """Invalid decision tree format, {} is not a valid"""
+        """ decision operator.""".format(self.invalid_operators[node])
+      )
+    if code in (_IS, _IN_MULTI):
+      matched = np.zeros(len(values), dtype=bool)
+      targets = [operand] if code == _IS else operand
+      for target in targets:
+        matched |= _equal(values, target)
+      return matched
+    if values.dtype.kind not in "biuf":
+      # Values that are not numbers, e.g. optional `{}` values, are compared one by one
+      operator_function = OPERATORS_FUNCTION[_OPERATORS_FROM_CODES[code]]
+      return np.array([bool(operator_function(value, operand)) for value in values],
+                      dtype=bool)
+    low = self.operand_low[node]
+    with np.errstate(invalid="ignore"):
+      if code == _GTE:
+        return values >= low
+      if code == _LT:
+        return values < low
+      high = self.operand_high[node]
+      if low < high:
+        return (values >= low) & (values < high)
+      return (values >= low) | (values < high)
+
+  def _batch_payload(self):
+    # The leaves payload as arrays with an additional last entry for the
+    # contexts that don't reach a leaf, null leaves carry no payload either.
+    if self._batch_payload_cache is None:
+      null_leaves = np.array([value is None for value in self.leaf_value] + [True], dtype=bool)
+      if self.output_type == TYPES["continuous"]:
+        values = np.array([np.nan if value is None else value for value in self.leaf_value] +
+                          [np.nan], dtype=np.float64)
+      else:
+        values = np.empty(len(self.leaf_value) + 1, dtype=object)
+        values[:-1] = self.leaf_value
+      payload = {
+        "predicted_value": values,
+        "confidence": np.array(self.leaf_confidence + [np.nan], dtype=np.float64)
+      }
+      if self.major == 2:
+        payload["nb_samples"] = np.append(self.leaf_nb_samples, 0)
+      if self.output_type == TYPES["continuous"]:
+        payload["standard_deviation"] = np.append(self.leaf_standard_deviation, np.nan)
+      if isinstance(self.leaf_distribution, np.ndarray):
+        payload["distribution"] = np.vstack([
+          self.leaf_distribution,
+          np.full((1, self.leaf_distribution.shape[1]), np.nan)
+        ])
+        null_distribution = np.nan
+      elif self.major == 2:
+        # The other distributions, e.g. those of the regression leaves without
+        # standard deviation, are given as objects
+        payload["distribution"] = _object_array(
+          [self._batch_distribution(leaf) for leaf in range(len(self.leaf_value))] + [None])
+        null_distribution = None
+      for key in payload:
+        if key == "distribution":
+          payload[key][null_leaves] = null_distribution
+        elif key != "predicted_value":
+          payload[key][null_leaves] = np.nan if key != "nb_samples" else 0
+#pylint: disable=W0201
+      self._batch_payload_cache = (payload, null_leaves)
+#pylint: enable=W0201
+    return self._batch_payload_cache
+
+  def _batch_distribution(self, leaf):
+    # Empty distributions are only given by the decisions reaching a root leaf, see `decide`
+    distribution = self.leaf_distribution[leaf]
+    if distribution is None or not (distribution or self.nodes_count == 1):
+      return None
+    return copy.copy(distribution)
+
+  def _batch_results(self, final_nodes, unmatched, columns):
+    payload, null_leaves = self._batch_payload()
+    no_payload = len(null_leaves) - 1
+    leaves = self.leaf_index[final_nodes]
+    leaves[unmatched] = no_payload
+
+    results = {key: values[leaves] for key, values in payload.items()}
+    errors = np.empty(len(final_nodes), dtype=object)
+    results["error"] = errors
+
+    null_rows = np.flatnonzero(null_leaves[leaves] & ~unmatched)
+    if null_rows.size:
+      errors[null_rows] = CraftAiNullDecisionError(
+        """Unable to take decision: the decision tree has no valid"""
+        """ predicted value for the given context."""
+      ).message
+
+    unmatched_rows = np.flatnonzero(unmatched)
+    if unmatched_rows.size and self.deactivate_missing_values:
+      self._batch_unmatched_errors(final_nodes, unmatched_rows, columns, errors)
+    elif unmatched_rows.size:
+      self._batch_fallbacks(final_nodes, unmatched_rows, results)
+    return results
+
+  def _batch_unmatched_errors(self, final_nodes, unmatched_rows, columns, errors):
+    for row in unmatched_rows:
+      node = final_nodes[row]
+      property_name = self.properties[self.feature[self.first_child[node]]]
+      value = columns[property_name][0][row] if property_name in columns else None
+      errors[row] = CraftAiNullDecisionError(
+        """Unable to take decision: value '{}' for property '{}' doesn't"""
+        """ validate any of the decision rules.""".format(value, property_name)
+      ).message
+
+  def _batch_fallbacks(self, final_nodes, unmatched_rows, results):
+    # If there is no child corresponding matching the operators then we compute
+    # the probabilistic distribution from these nodes.
+    for node in np.unique(final_nodes[unmatched_rows]):
+      rows = unmatched_rows[final_nodes[unmatched_rows] == node]
+      distribution = self.compute_distribution(int(node))
+      results["predicted_value"][rows] = distribution["predicted_value"]
+      results["nb_samples"][rows] = distribution["nb_samples"]
+      if "distribution" in results and "distribution" in distribution:
+        if results["distribution"].ndim == 1:
+          results["distribution"][rows] = _object_array([distribution["distribution"]])
+        else:
+          results["distribution"][rows] = distribution["distribution"]
+
+  def _batch_decision_rules(self, final_nodes, errors):
+    rules = np.empty(len(final_nodes), dtype=object)
+    valid_rows = np.flatnonzero(np.equal(errors, None))
+    nodes, inverse = np.unique(final_nodes[valid_rows], return_inverse=True)
+    nodes_rules = np.empty(len(nodes), dtype=object)
+    nodes_rules[:] = [self.decision_rules(int(node)) for node in nodes]
+    rules[valid_rows] = nodes_rules[inverse.reshape(-1)]
+    return rules
+
+#pylint: enable=R0902
+
+def _object_array(values):
+  # Sequences, e.g. lists of distributions, are kept as objects
+  array = np.empty(len(values), dtype=object)
+  for index, value in enumerate(values):
+    array[index] = value
+  return array
+
+def _equal(values, target):
+  kind = values.dtype.kind
+  target_is_number = isinstance(target, numbers.Number)
+  if (kind in "biuf" and not target_is_number) or (kind in "US" and target_is_number):
+    return np.zeros(len(values), dtype=bool)
+  return np.asarray(values == target, dtype=bool)
+
+def _aligned(size):
+  return -(-size // _ALIGNMENT) * _ALIGNMENT
+
+def _saved_arrays(flat_trees):
+  """The header of each tree and the (offset, array) of their arrays, at aligned offsets"""
+  trees = []
+  arrays = []
+  offset = 0
+  for output, flat_tree in flat_trees:
+    tree_arrays, attributes = flat_tree.state()
+    arrays_offsets = {}
+    for name, array in sorted(tree_arrays.items()):
+      array = np.ascontiguousarray(array)
+      arrays_offsets[name] = {"dtype": array.dtype.str, "shape": list(array.shape),
+                              "offset": offset}
+      arrays.append((offset, array))
+      offset += _aligned(array.nbytes)
+    trees.append({"output": output, "attributes": attributes, "arrays": arrays_offsets})
+  return trees, arrays
+
+def save_flat_trees(path, metadata, flat_trees):
+  """Save flat trees in a binary file whose arrays are loaded without copy by `load_flat_trees`.
+
+  `metadata` is a JSON serializable dictionary saved alongside the trees
+  and `flat_trees` is a list of (output, FlatTree).
+  """
+  trees, arrays = _saved_arrays(flat_trees)
+  header = {"metadata": metadata, "trees": trees}
+
+  header_data = json.dumps(header, separators=(",", ":")).encode("utf-8")
+  start = _aligned(len(_MAGIC) + _HEADER_SIZE.size + len(header_data))
+  with open(path, "wb") as tree_file:
+    tree_file.write(_MAGIC)
+    tree_file.write(_HEADER_SIZE.pack(len(header_data)))
+    tree_file.write(header_data)
+    for array_offset, array in arrays:
+      tree_file.write(b"\0" * (start + array_offset - tree_file.tell()))
+      tree_file.write(array.tobytes())
+
+def load_flat_trees(path):
+  """Load the flat trees saved by `save_flat_trees`, returns the metadata and the trees.
+
+  The arrays of the trees are read-only views of the memory mapped file,
+  the processes loading the same file share its memory.
+  """
+  with open(path, "rb") as tree_file:
+    buffer = mmap.mmap(tree_file.fileno(), 0, access=mmap.ACCESS_READ)
+  magic_size = len(_MAGIC)
+  if buffer[:magic_size] != _MAGIC:
+    raise CraftAiError("""Invalid flat trees file, {} wasn't saved by save_flat_trees.""".
+                       format(path))
+  header_size = _HEADER_SIZE.unpack(buffer[magic_size:magic_size + _HEADER_SIZE.size])[0]
+  header_start = magic_size + _HEADER_SIZE.size
+  header = json.loads(buffer[header_start:header_start + header_size].decode("utf-8"))
+  start = _aligned(header_start + header_size)
+
+  flat_trees = []
+  for tree in header["trees"]:
+    arrays = {}
+    for name, array in tree["arrays"].items():
+      dtype = np.dtype(str(array["dtype"]))
+      count = int(np.prod(array["shape"], dtype=np.int64))
+      arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count,
+                                   offset=start + array["offset"]).reshape(array["shape"])
+    flat_trees.append((tree["output"], FlatTree.from_state(arrays, tree["attributes"])))
+  return header["metadata"], flat_trees
@@ -1,16 +1,21 @@
-import re
 import semver
 
 from craftai.errors import CraftAiDecisionError
 from craftai.time import Time
 from craftai.timezones import get_timezone_key, timezone_offset_in_standard_format
+from craftai.trees import context_plan, join_decide_args, parse_tree
 from craftai.interpreter_v1 import InterpreterV1
 from craftai.interpreter_v2 import InterpreterV2
 
 class Interpreter(object):
 
   @staticmethod
-  def decide(tree, args):
+  def decide(tree, args, explain=True):
+    """Take a decision from the given tree for the context rebuilt from `args`.
+
+    Without `explain`, the decision only gives the predicted value and
+    confidence of each output, neither the decision rules nor the context.
+    """
     bare_tree, configuration, tree_version = Interpreter._parse_tree(tree)
     if configuration != {}:
       time = None if len(args) == 1 else args[1]
@@ -24,71 +29,67 @@ class Interpreter(object):
     context = Interpreter._convert_timezones_to_standard_format(configuration, context)
 
     if semver.match(tree_version, ">=1.0.0") and semver.match(tree_version, "<2.0.0"):
-      decision = InterpreterV1.decide(configuration, bare_tree, context)
+      decision = InterpreterV1.decide(configuration, bare_tree, context, explain)
     elif semver.match(tree_version, ">=2.0.0") and semver.match(tree_version, "<3.0.0"):
-      decision = InterpreterV2.decide(configuration, bare_tree, context)
+      decision = InterpreterV2.decide(configuration, bare_tree, context, explain)
     else:
       raise CraftAiDecisionError(
         """Invalid decision tree format, "{}" is currently not a valid version.""".
         format(tree_version)
       )
 
-    decision["context"] = context
+    if explain:
+      decision["context"] = context
 
     return decision
 
+  @staticmethod
+  def compile(tree, engine="tree"):
+    """Parse the given decision tree once, returns a `CompiledTree`.
+
+    The returned object takes decisions with `CompiledTree.decide(context, time)`
+    without parsing the tree again, `engine` is described in `CompiledTree`.
+    """
+    # Imported here as the compiled tree relies on this module's helpers
+    from craftai.compiled_tree import CompiledTree
+    return CompiledTree(tree, engine)
+
+  @staticmethod
+  def decide_batch(tree, columns, decision_rules=False):
+    """Take the decisions for many contexts given as columns of values.
+
+    See `CompiledTree.decide_batch`.
+    """
+    return Interpreter.compile(tree, "flat").decide_batch(columns, decision_rules)
+
   ####################
   # Internal helpers #
   ####################
 
   @staticmethod
-  def _rebuild_context(configuration, state, time=None):
+  def _rebuild_context(configuration, state, time=None, plan=None):
+    # The plan should come from `context_plan`, it is computed when not given
+    context_properties, generated_properties = plan or context_plan(configuration)
 
     missings = []
-    # Model should come from _parse_tree and is assumed to be checked
-    # upon already
-    output = configuration["output"]
-    context = configuration["context"]
-
-    # We should not use the output key(s) to compare against
-    configuration_ctx = {
-      key: context[key] for (key, value) in context.items() if (key not in output)
-    }
-
-    # Check if we need the time object
-    to_generate = []
-
-    for prop in configuration_ctx.items():
-      prop_name = prop[0]
-      prop_attributes = prop[1]
-      if prop_attributes["type"] in ["time_of_day", "day_of_week", "day_of_month",
-                                     "month_of_year"]:
-        # is_generated is at True, we must generate the time for the
-        # associated context property
-        case_1 = "is_generated" in list(prop_attributes.keys()) and prop[1]["is_generated"]
-        # is_generated is not given, by default at True, so we must
-        # generate it as well
-        case_2 = "is_generated" not in list(prop_attributes.keys())
-        if case_1 or case_2:
-          to_generate.append(prop_name)
-
     # Propagate missings properties to next function
-    if to_generate:
+    if generated_properties:
       # Can't generate from time -> missings properties are errors
       if not isinstance(time, Time):
         # Check for missings properties
-        for prop in to_generate:
-          if prop not in list(state.keys()):
+        for prop, _ in generated_properties:
+          if prop not in state:
             missings.append("expected property '{}' is not defined".format(prop))
 
-      # Generate context properties which need to
+      # Generate context properties which need to, the time is only converted once
       else:
-        for prop in to_generate:
-          state[prop] = time.to_dict()[configuration_ctx[prop]["type"]]
+        time_dict = time.to_dict()
+        for prop, prop_type in generated_properties:
+          state[prop] = time_dict[prop_type]
 
     # Rebuild the context with generated and non-generated values
     context = {
-      feature: state.get(feature) for feature, properties in configuration_ctx.items()
+      feature: state.get(feature) for feature in context_properties
     }
 
     return {
@@ -96,20 +97,8 @@ class Interpreter(object):
       "errors": missings
     }
 
-  @staticmethod
-  def join_decide_args(args):
-    joined_args = {}
-    for arg in args:
-      if isinstance(arg, Time):
-        joined_args.update(arg.to_dict())
-      try:
-        joined_args.update(arg)
-      except TypeError:
-        raise CraftAiDecisionError(
-          """Invalid context args, the given objects aren't dicts"""
-          """ or Time instances."""
-        )
-    return joined_args
+  _context_plan = staticmethod(context_plan)
+  join_decide_args = staticmethod(join_decide_args)
 
   @staticmethod
   def _convert_timezones_to_standard_format(configuration, context):
@@ -118,41 +107,4 @@ class Interpreter(object):
       context[timezone_key] = timezone_offset_in_standard_format(context[timezone_key])
     return context
 
-  @staticmethod
-  def _parse_tree(tree_object):
-    # Checking definition of tree_object
-    if not isinstance(tree_object, dict):
-      raise CraftAiDecisionError("Invalid decision tree format, the given json is not an object.")
-
-    # Checking version existence
-    tree_version = tree_object.get("_version")
-    if not tree_version:
-      raise CraftAiDecisionError(
-        """Invalid decision tree format, unable to find the version"""
-        """ informations."""
-      )
-
-    # Checking version and tree validity according to version
-    if re.compile(r"\d+.\d+.\d+").match(tree_version) is None:
-      raise CraftAiDecisionError(
-        """Invalid decision tree format, "{}" is not a valid version.""".
-        format(tree_version)
-      )
-    elif semver.match(tree_version, ">=1.0.0") and semver.match(tree_version, "<3.0.0"):
-      if tree_object.get("configuration") is None:
-        raise CraftAiDecisionError(
-          """Invalid decision tree format, no configuration found"""
-        )
-      if tree_object.get("trees") is None:
-        raise CraftAiDecisionError(
-          """Invalid decision tree format, no tree found."""
-        )
-      bare_tree = tree_object.get("trees")
-      configuration = tree_object.get("configuration")
-    else:
-      raise CraftAiDecisionError(
-        """Invalid decision tree format, {} is not a supported"""
-        """ version.""".
-        format(tree_version)
-      )
-    return bare_tree, configuration, tree_version
+  _parse_tree = staticmethod(parse_tree)
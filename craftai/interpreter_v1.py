@@ -29,14 +29,15 @@ _VALUE_VALIDATORS = {
 class InterpreterV1(object):
 
   @staticmethod
-  def decide(configuration, bare_tree, context):
+  def decide(configuration, bare_tree, context, explain=True):
     InterpreterV1._check_context(configuration, context)
 
+    # Without explanations, only the predicted values and confidences are given
+    decide_output = InterpreterV1._decide_recursion if explain else InterpreterV1._decide_lean
     decision_result = {}
     decision_result["output"] = {}
     for output in configuration.get("output"):
-      decision_result["output"][output] = InterpreterV1._decide_recursion(bare_tree[output],
-                                                                          context)
+      decision_result["output"][output] = decide_output(bare_tree[output], context)
 
     decision_result["_version"] = _DECISION_VERSION
     return decision_result
@@ -97,6 +98,30 @@ class InterpreterV1(object):
 
     return final_result
 
+  @staticmethod
+  def _decide_lean(node, context):
+    # Same path as `_decide_recursion` without building the decision rules
+    while node.get("children"):
+      matching_child = InterpreterV1._find_matching_child(node, context)
+      if not matching_child:
+        prop = node.get("children")[0].get("decision_rule").get("property")
+        raise CraftAiNullDecisionError(
+          """Unable to take decision: value '{}' for property '{}' doesn't"""
+          """ validate any of the decision rules.""".format(context.get(prop), prop)
+        )
+      node = matching_child
+
+    predicted_value = node.get("predicted_value")
+    if predicted_value is None:
+      raise CraftAiNullDecisionError(
+        """Unable to take decision: the decision tree has no valid"""
+        """ predicted value for the given context."""
+      )
+    return {
+      "predicted_value": predicted_value,
+      "confidence": node.get("confidence") or 0
+    }
+
   @staticmethod
   def _find_matching_child(node, context):
     for child in node["children"]:
@@ -170,6 +195,29 @@ class InterpreterV1(object):
 
         raise CraftAiDecisionError(message)
 
+  @staticmethod
+  def context_checker(configuration):
+    """Returns a function checking contexts as `_check_context` does.
+
+    The configuration is compiled once into a tuple of (property, value
+    validator). Valid contexts are checked without building any list, invalid
+    ones are checked again by `_check_context` for its message.
+    """
+    schema = tuple(
+      (property_name, _VALUE_VALIDATORS.get(property_def["type"]))
+      for property_name, property_def in configuration["context"].items()
+      if not property_name in configuration["output"]
+    )
+
+    def check_context(context):
+      for property_name, validator in schema:
+        property_value = context.get(property_name)
+        if property_value is None or (validator is not None and not validator(property_value)):
+          InterpreterV1._check_context(configuration, context)
+          return
+
+    return check_context
+
   @staticmethod
   def validate_property_value(configuration, context, property_name):
     if not property_name in context:
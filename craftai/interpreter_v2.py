@@ -23,6 +23,9 @@ _VALUE_VALIDATORS = {
                                          and value >= 1 and value <= 12)
 }
 
+# Default of the properties missing from the context, `None` values being missing values
+_MISSING = object()
+
 ##############################
 ## Interpreter for V2 Trees ##
 ##############################
@@ -30,7 +33,7 @@ _VALUE_VALIDATORS = {
 class InterpreterV2(object):
 
   @staticmethod
-  def decide(configuration, bare_tree, context):
+  def decide(configuration, bare_tree, context, explain=True):
     # Check if missing values are handled
     deactivate_missing_values = True
     if configuration.get("deactivate_missing_values", True) is False:
@@ -38,16 +41,17 @@ class InterpreterV2(object):
 
     InterpreterV2._check_context(configuration, context, deactivate_missing_values)
 
+    # Without explanations, only the predicted values and confidences are given
+    decide_output = InterpreterV2._decide_recursion if explain else InterpreterV2._decide_lean
     decision_result = {}
     decision_result["output"] = {}
     for output in configuration.get("output"):
       output_type = configuration["context"][output]["type"]
-      decision_result["output"][output] = InterpreterV2._decide_recursion(bare_tree[output],
-                                                                          context,
-                                                                          bare_tree[output].get(
-                                                                            "output_values"),
-                                                                          output_type,
-                                                                          deactivate_missing_values)
+      decision_result["output"][output] = decide_output(bare_tree[output],
+                                                        context,
+                                                        bare_tree[output].get("output_values"),
+                                                        output_type,
+                                                        deactivate_missing_values)
     decision_result["_version"] = _DECISION_VERSION
     return decision_result
 
@@ -120,9 +124,47 @@ class InterpreterV2(object):
 
     return final_result
 
+  @staticmethod
+  def _decide_lean(node, context, output_values, output_type, deactivate_missing_values):
+    # Same path as `_decide_recursion` without building the decision rules
+    while node.get("children"):
+      matching_child = InterpreterV2._find_matching_child(node, context, deactivate_missing_values)
+      if not matching_child:
+        if not deactivate_missing_values:
+          result = InterpreterV2.compute_distribution(node, output_values, output_type)
+          return {"predicted_value": result["predicted_value"], "confidence": result["confidence"]}
+        prop = node.get("children")[0].get("decision_rule").get("property")
+        raise CraftAiNullDecisionError(
+          """Unable to take decision: value '{}' for property '{}' doesn't"""
+          """ validate any of the decision rules.""".format(context.get(prop), prop)
+        )
+      node = matching_child
+
+    # We check if a leaf has the key 'prediction' corresponging to a v2 tree
+    prediction = node.get("prediction")
+    if prediction is None:
+      prediction = node
+    predicted_value = prediction.get("value")
+    if predicted_value is None:
+      raise CraftAiNullDecisionError(
+        """Unable to take decision: the decision tree has no valid"""
+        """ predicted value for the given context."""
+      )
+    return {
+      "predicted_value": predicted_value,
+      "confidence": prediction.get("confidence") or 0
+    }
+
   @staticmethod
   def compute_distribution(node, output_values, output_type):
     result, size = InterpreterV2._distribution(node)
+    final_result = InterpreterV2.distribution_result(result, size, output_values, output_type)
+    final_result["decision_rules"] = []
+    return final_result
+
+  @staticmethod
+  def distribution_result(result, size, output_values, output_type):
+    # Decision result of a distribution, or mean value, and its number of samples
     if output_type == "enum":
       final_result = {
         "predicted_value": output_values[result.index(max(result))],
@@ -130,7 +172,6 @@ class InterpreterV2(object):
       }
     else:
       final_result = {"predicted_value": result}
-    final_result["decision_rules"] = []
     final_result["confidence"] = None
     final_result["nb_samples"] = size
     return final_result
@@ -139,29 +180,36 @@ class InterpreterV2(object):
   def _distribution(node):
     # If it is a leaf
     if not (node.get("children") is not None and len(node.get("children"))):
-      prediction = node["prediction"]
-      value_distribution = prediction["distribution"]
-      nb_samples = prediction["nb_samples"]
-      # It is a classification problem
-      if isinstance(value_distribution, list):
-        return [value_distribution, nb_samples]
-
-      # It is a regression problem
-      predicted_value = prediction.get("value")
-      if predicted_value is not None:
-        return [predicted_value, nb_samples]
-
-      raise CraftAiDecisionError(
-        """Unable to take decision: the decision tree has no valid"""
-        """ predicted value for the given context."""
-      )
+      return InterpreterV2.leaf_distribution(node)
 
     # If it is not a leaf, we recurse into the children and store
     # the distributions/means and sizes of each child branch.
     def recurse(_child):
       return InterpreterV2._distribution(_child)
     values_sizes = map(recurse, node.get("children"))
-    values, sizes = zip(*values_sizes)
+    return InterpreterV2.compute_mean(*zip(*values_sizes))
+
+  @staticmethod
+  def leaf_distribution(node):
+    prediction = node["prediction"]
+    value_distribution = prediction["distribution"]
+    nb_samples = prediction["nb_samples"]
+    # It is a classification problem
+    if isinstance(value_distribution, list):
+      return [value_distribution, nb_samples]
+
+    # It is a regression problem
+    predicted_value = prediction.get("value")
+    if predicted_value is not None:
+      return [predicted_value, nb_samples]
+
+    raise CraftAiDecisionError(
+      """Unable to take decision: the decision tree has no valid"""
+      """ predicted value for the given context."""
+    )
+
+  @staticmethod
+  def compute_mean(values, sizes):
     if isinstance(values[0], list):
       return InterpreterV2.compute_mean_distributions(values, sizes)
     return InterpreterV2.compute_mean_values(values, sizes)
@@ -258,6 +306,40 @@ class InterpreterV2(object):
 
         raise CraftAiDecisionError(message)
 
+  @staticmethod
+  def context_checker(configuration, deactivate_missing_values=True):
+    """Returns a function checking contexts as `_check_context` does.
+
+    The configuration is compiled once into a tuple of (property, value
+    validator, is optional). Valid contexts are checked without building any
+    list, invalid ones are checked again by `_check_context` for its message.
+    """
+    schema = tuple(
+      (
+        property_name,
+        _VALUE_VALIDATORS.get(property_def["type"]),
+        bool(property_def.get("is_optional"))
+      )
+      for property_name, property_def in configuration["context"].items()
+      if not property_name in configuration["output"]
+    )
+
+    def check_context(context):
+      for property_name, validator, is_optional in schema:
+        property_value = context.get(property_name, _MISSING)
+        if property_value is None:
+          if deactivate_missing_values:
+            break
+        elif (property_value is _MISSING or
+              (validator is not None and not validator(property_value) and
+               not (is_optional and property_value == {}))):
+          break
+      else:
+        return
+      InterpreterV2._check_context(configuration, context, deactivate_missing_values)
+
+    return check_context
+
   @staticmethod
   def validate_property_value(configuration, context, property_name):
     if not property_name in context:
@@ -41,16 +41,16 @@ class Client(VanillaClient):
     else:
       return super(Client, self).add_operations(agent_id, operations)
 
-  def get_operations_list(self, agent_id, start=None, end=None):
-    operations_list = super(Client, self).get_operations_list(agent_id, start, end)
+  def get_operations_list(self, agent_id, start=None, end=None, windows=1):
+    operations_list = super(Client, self).get_operations_list(agent_id, start, end, windows)
     return pd.DataFrame(
       [operation["context"] for operation in operations_list],
       index=pd.to_datetime([operation["timestamp"] for operation in operations_list],
                            unit="s").tz_localize("UTC")
     )
 
-  def get_state_history(self, agent_id, start=None, end=None):
-    state_history = super(Client, self).get_state_history(agent_id, start, end)
+  def get_state_history(self, agent_id, start=None, end=None, windows=1):
+    state_history = super(Client, self).get_state_history(agent_id, start, end, windows)
 
     return pd.DataFrame(
       [state["sample"] for state in state_history],
@@ -59,7 +59,7 @@ class Client(VanillaClient):
     )
 
   @staticmethod
-  def decide_from_contexts_df(tree, contexts_df):
+  def decide_from_contexts_df(tree, contexts_df, n_jobs=1, executor=None):
     if isinstance(contexts_df, pd.DataFrame):
       if not isinstance(contexts_df.index, pd.DatetimeIndex):
         raise CraftAiBadRequestError("Invalid dataframe given, it is not time indexed.")
@@ -68,4 +68,4 @@ class Client(VanillaClient):
                                      it must be tz-aware.""")
     else:
       raise CraftAiBadRequestError("Invalid data given, it is not a DataFrame.")
-    return Interpreter.decide_from_contexts_df(tree, contexts_df)
+    return Interpreter.decide_from_contexts_df(tree, contexts_df, n_jobs, executor)
@@ -1,41 +1,197 @@
+import copy
+import multiprocessing
+
+import numpy as np
 import pandas as pd
+import six
+
+from .. import Interpreter as VanillaInterpreter
+from ..errors import CraftAiError
+from ..trees import context_plan, parse_tree
+from ..types import TYPES
+from .utils import create_timezone_df, column_values, create_time_features
+
+def decide_from_columns(tree, configuration, contexts_df, timezone_df):
+  """Take the decisions on all the rows of the DataFrame at once, from its columns"""
+  output_properties = configuration["output"]
+  columns = _context_columns(configuration, contexts_df, timezone_df)
+  decision = VanillaInterpreter.compile(tree, "flat").decide_batch(columns, decision_rules=True)
+
+  # A null decision on any output is the row's error
+  errors = np.empty(len(contexts_df), dtype=object)
+  for output in output_properties:
+    no_error = pd.isnull(errors)
+    errors[no_error] = decision["output"][output]["error"][no_error]
+  error_rows = pd.notnull(errors)
+
+  # As when deciding row by row, the rows with an error only have this error and
+  # each column is given by at least one of the rows, the columns being sorted
+  data = {}
+  if not error_rows.all() or not error_rows.size:
+    for output in output_properties:
+      data.update(_output_columns(tree, configuration, output, decision["output"][output],
+                                  error_rows))
+  if error_rows.any():
+    errors[~error_rows] = np.nan
+    data["error"] = errors
+
+  return pd.DataFrame(data, index=contexts_df.index, columns=sorted(data))
 
-from .. import Interpreter as VanillaInterpreter, Time
-from ..errors import CraftAiNullDecisionError
-from .utils import is_valid_property_value, create_timezone_df, DUMMY_COLUMN_NAME
+def _context_columns(configuration, contexts_df, timezone_df):
+  _, generated_properties = context_plan(configuration)
+  generated_properties = dict(generated_properties)
 
-def decide_from_row(tree, columns, row, timezone_df):
-  context = {
-    col: row[col] for col in columns if is_valid_property_value(col, row[col])
-  }
   # If a timezone_df is provided use it
   # otherwise use the dataframe index timezone
+  timezones = None
   if isinstance(timezone_df, pd.DataFrame):
-    timezone = timezone_df.loc[row.name].values[0]
-    context.update({timezone_df.columns[0]: timezone})
+    timezones = np.asarray(timezone_df.iloc[:, 0], dtype=object)
+  time_features = create_time_features(contexts_df.index, timezones)
+
+  columns = {}
+  for key in configuration["context"]:
+    if key in configuration["output"]:
+      continue
+    if key in generated_properties:
+      columns[key] = time_features[generated_properties[key]]
+    elif timezones is not None and key == timezone_df.columns[0]:
+      columns[key] = timezones
+    elif key in contexts_df.columns:
+      columns[key] = column_values(contexts_df[key])
+  return columns
+
+def _output_columns(tree, configuration, output, results, error_rows):
+  columns = {}
+  predicted_values = results["predicted_value"]
+  if configuration["context"][output]["type"] == TYPES["enum"]:
+    predicted_values = predicted_values.copy()
+    predicted_values[error_rows] = None
+    predicted_values = _categorical(predicted_values,
+                                    tree["trees"][output].get("output_values") or [])
+  else:
+    predicted_values = _with_nulls(predicted_values, error_rows)
+  columns[output + "_predicted_value"] = predicted_values
+  columns[output + "_confidence"] = _with_nulls(results["confidence"], error_rows)
+  columns[output + "_decision_rules"] = _with_nulls(results["decision_rules"], error_rows)
+  if "nb_samples" in results:
+    columns[output + "_nb_samples"] = _with_nulls(results["nb_samples"], error_rows)
+  if "distribution" in results:
+    distributions = results["distribution"]
+    if distributions.ndim == 1:
+      # Distributions objects, absent from the decisions where they are None
+      absent_rows = error_rows | pd.isnull(distributions)
+      distributions = _object_array([copy.copy(distribution) for distribution in distributions])
+    else:
+      absent_rows = error_rows
+      distributions = _object_array(distributions.tolist())
+    if not absent_rows.all():
+      columns[output + "_distribution"] = _with_nulls(distributions, absent_rows)
+  if "standard_deviation" in results:
+    absent_rows = error_rows | np.isnan(results["standard_deviation"])
+    if not absent_rows.all():
+      columns[output + "_standard_deviation"] = _with_nulls(results["standard_deviation"],
+                                                            absent_rows)
+  return columns
+
+def _object_array(values):
+  array = np.empty(len(values), dtype=object)
+  for index, value in enumerate(values):
+    array[index] = value
+  return array
+
+def _with_nulls(values, null_rows):
+  if not null_rows.any():
+    return values
+  if values.dtype.kind in "biu":
+    values = values.astype(np.float64)
   else:
-    timezone = row.name.tz
-  time = Time(
-    t=row.name.value // 10 ** 9, # Timestamp.value returns nanoseconds
-    timezone=timezone
-  )
+    values = values.copy()
+  values[null_rows] = np.nan
+  return values
+
+def _categorical(values, categories):
+  present_values = pd.unique(values[np.not_equal(values, None)])
+  categories = list(categories) + [
+    value for value in present_values if value not in categories
+  ]
+  return pd.Categorical(values, categories=categories)
+
+# The decision tree of the worker processes, set once per process by `_set_worker_tree`
+_WORKER_TREE = []
+
+def _set_worker_tree(tree):
+  _, configuration, _ = parse_tree(tree)
+  _WORKER_TREE[:] = [tree, configuration]
+
+def _decide_from_worker_partition(partition):
   try:
-    decision = VanillaInterpreter.decide(tree, [context, time])
+    return decide_from_columns(*(_WORKER_TREE + list(partition)))
+  except CraftAiError as e:
+    # Returned rather than raised, see `_raise_first_error`
+    return e
+
+def _decide_from_tree_partition(tree, partition):
+  _set_worker_tree(tree)
+  return _decide_from_worker_partition(partition)
+
+def _partitions(contexts_df, timezone_df, n_partitions):
+  bounds = np.linspace(0, len(contexts_df), n_partitions + 1).astype(np.int64)
+  return [
+    (contexts_df.iloc[start:end], timezone_df.iloc[start:end] if timezone_df is not None else None)
+    for start, end in zip(bounds[:-1], bounds[1:])
+  ]
 
-    keys, values = zip(*[
-      (output + "_" + key, value)
-      for output, output_decision in decision["output"].items()
-      for key, value in output_decision.items()
-    ])
+def _raise_first_error(decisions_dfs):
+  # The partitions being consecutive, the first one failing holds the first invalid row
+  # of the whole DataFrame, its error is the one raised when deciding at once
+  for decisions_df in decisions_dfs:
+    if isinstance(decisions_df, CraftAiError):
+      raise decisions_df
 
-    return pd.Series(data=values, index=keys)
-  except CraftAiNullDecisionError as e:
-    return pd.Series(data=[e.message], index=["error"])
+def _concat_decisions(decisions_dfs):
+  """Concatenate the decisions of consecutive partitions as if they were taken at once"""
+  columns = []
+  for decisions_df in decisions_dfs:
+    columns.extend(column for column in decisions_df.columns if column not in columns)
+  # Some partitions may lack some columns, e.g. `error` or `standard_deviation`
+  columns = sorted(columns)
+
+  data = {}
+  for column in columns:
+    values = [decisions_df[column] if column in decisions_df.columns
+              else pd.Series(np.nan, index=decisions_df.index)
+              for decisions_df in decisions_dfs]
+    # Only categorical series have the `cat` accessor, whatever the pandas version
+    if all(hasattr(value, "cat") for value in values):
+      # The categories of each partition start with the output values, the others are
+      # given in their order of appearance
+      categoricals = [value.values for value in values]
+      # Without output values, e.g. for V1 trees, the partitions without any predicted
+      # value have empty categories whose type may differ from the others
+      categories = next((categorical.categories for categorical in categoricals
+                         if not categorical.categories.empty), None)
+      if categories is not None:
+        categoricals = [categorical if not categorical.categories.empty
+                        else categorical.set_categories(categories[:0])
+                        for categorical in categoricals]
+      data[column] = pd.api.types.union_categoricals(categoricals)
+    else:
+      data[column] = pd.concat(values).values
+  index = decisions_dfs[0].index.append([decisions_df.index for decisions_df in decisions_dfs[1:]])
+  return pd.DataFrame(data, index=index, columns=columns)
 
 class Interpreter(VanillaInterpreter):
   @staticmethod
-  def decide_from_contexts_df(tree, contexts_df):
-    _, configuration, _ = VanillaInterpreter._parse_tree(tree)
+  def decide_from_contexts_df(tree, contexts_df, n_jobs=1, executor=None):
+    """Take the decisions on each row of the DataFrame.
+
+    With `n_jobs` greater than 1, the DataFrame is partitioned in as many
+    consecutive rows ranges, each one is decided by a worker process of a
+    pool, -1 using as many processes as CPUs, or by the given `executor`,
+    e.g. a `concurrent.futures.ProcessPoolExecutor`. The decisions are
+    identical to those taken at once.
+    """
+    _, configuration, _ = parse_tree(tree)
     tz_col = [key for key, value in configuration["context"].items()
               if value["type"] == "timezone"]
     if tz_col:
@@ -44,20 +200,30 @@ class Interpreter(VanillaInterpreter):
     # store the timezone to use. It can either be the DatetimeIndex
     # timezone or the timezone column if provided.
     timezone_df = None
-    columns = contexts_df.columns.tolist()
     if tz_col:
       timezone_df = create_timezone_df(contexts_df, tz_col)
-      if tz_col in columns:
-        columns.remove(tz_col)
-    if not contexts_df.columns.values.size:
-      # Add dummy column in order to avoid apply() issue (aka feature)
-      # with empty DataFrame.
-      # https://github.com/pandas-dev/pandas/issues/16621
-      df = contexts_df.copy(deep=True)
-      df[DUMMY_COLUMN_NAME] = 0
+
+    if n_jobs == -1:
+      n_jobs = multiprocessing.cpu_count()
+    if not isinstance(n_jobs, six.integer_types) or n_jobs < 1:
+      raise CraftAiError("""Invalid number of jobs, it must be a positive integer or -1.""")
+    n_partitions = min(n_jobs, len(contexts_df))
+    if n_partitions <= 1 and executor is None:
+      return decide_from_columns(tree, configuration, contexts_df, timezone_df)
+
+    # The timezones are forward filled on the whole DataFrame before it is partitioned
+    partitions = _partitions(contexts_df, timezone_df, max(n_partitions, 1))
+    if executor is not None:
+      futures = [executor.submit(_decide_from_tree_partition, tree, partition)
+                 for partition in partitions]
+      decisions_dfs = [future.result() for future in futures]
     else:
-      df = contexts_df
-    return df.apply(lambda row: decide_from_row(tree,
-                                                columns,
-                                                row,
-                                                timezone_df), axis=1)
+      # The tree is sent once to each worker process
+      pool = multiprocessing.Pool(n_partitions, _set_worker_tree, (tree,))
+      try:
+        decisions_dfs = pool.map(_decide_from_worker_partition, partitions)
+      finally:
+        pool.terminate()
+        pool.join()
+    _raise_first_error(decisions_dfs)
+    return _concat_decisions(decisions_dfs)
@@ -1,9 +1,11 @@
 import json
 import re
+import numpy as np
 import pandas as pd
 import six
 from IPython.core.display import display, HTML
 import semver
+from ..batch import time_features, time_features_from_offsets
 from ..errors import CraftAiError
 from ..constants import REACT_CRAFT_AI_DECISION_TREE_VERSION
 
@@ -23,11 +25,47 @@ def is_valid_property_value(key, value):
 def create_timezone_df(df, name):
   timezone_df = pd.DataFrame(index=df.index)
   if name in df.columns:
-    timezone_df[name] = df[name].fillna(method="ffill")
+    timezone_df[name] = df[name].ffill()
   else:
     timezone_df[name] = df.index.strftime("%z")
   return timezone_df
 
+def create_time_features(index, timezones=None):
+  """Compute the generated time features of each timestamp of a DatetimeIndex.
+
+  The features are those `Time(t, timezone).to_dict()` gives for each row,
+  `timezones` holds the timezone of each row, the index timezone is used
+  if it isn't provided. Returns NumPy arrays indexed by time type.
+  """
+  utc_index = index.tz_convert("UTC") if index.tz is not None else index.tz_localize("UTC")
+  # As `Timestamp.value // 10 ** 9`, whatever the index unit
+  timestamps = np.asarray((utc_index - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1),
+                          dtype=np.int64)
+  if timezones is None and index.tz is not None:
+    # pandas gives the UTC offsets of the index timezone at once
+    offsets = (index.tz_localize(None) - utc_index.tz_localize(None)) // pd.Timedelta(seconds=1)
+    return time_features_from_offsets(timestamps, np.asarray(offsets, dtype=np.int64))
+  return time_features(timestamps, timezones)
+
+def column_values(series):
+  """The values of a contexts DataFrame column as a NumPy array.
+
+  Like `is_valid_property_value`, null values and values having a length,
+  except strings, are missing, i.e. `None`.
+  """
+  if series.dtype.kind in "biuf":
+    return series.values
+  values = np.asarray(series, dtype=object).copy()
+  values[np.asarray(pd.isnull(series))] = None
+  # Inferred without the missing values, `skipna` requires pandas 0.21
+  inferred_type = pd.api.types.infer_dtype(values[np.asarray(pd.notnull(series))])
+  if inferred_type not in ("string", "boolean", "integer", "floating",
+                           "mixed-integer-float", "empty"):
+    for row in np.flatnonzero(np.not_equal(values, None)):
+      if not is_valid_property_value(series.name, values[row]):
+        values[row] = None
+  return values
+
 # Return a html version of the given tree
 def create_tree_html(tree_object, height=500):
   html_template = """ <html>
@@ -0,0 +1,70 @@
+"""Iteration over the items of an iterable retrieved ahead by a background thread"""
+
+import sys
+import threading
+
+import six
+
+# Time between two checks that the iteration wasn't abandoned, in seconds
+_POLL_INTERVAL = 0.1
+
+_ITEM = 0
+_ERROR = 1
+_END = 2
+
+def iter_prefetched(iterable, depth=1):
+  """Iterate over `iterable`, whose items are retrieved by a background thread.
+
+  The thread retrieves the next items while the caller processes the
+  current one, up to `depth` items ahead: it only retrieves an item when
+  fewer than `depth` retrieved items are waiting to be consumed. The errors
+  of the iterable are raised when the caller reaches them. The thread is
+  started by the first iteration and stops when the iteration ends or is
+  abandoned, e.g. on `break`.
+  """
+  if depth < 1:
+    for item in iterable:
+      yield item
+    return
+
+  items = six.moves.queue.Queue()
+  # A slot is taken before retrieving each item and freed once the item is consumed
+  slots = six.moves.queue.Queue(depth)
+  stopped = threading.Event()
+
+  def take_slot():
+    while not stopped.is_set():
+      try:
+        slots.put(None, timeout=_POLL_INTERVAL)
+        return True
+      except six.moves.queue.Full:
+        pass
+    return False
+
+  def retrieve():
+    try:
+      iterator = iter(iterable)
+      while take_slot():
+        try:
+          item = next(iterator)
+        except StopIteration:
+          items.put((_END, None))
+          return
+        items.put((_ITEM, item))
+    except Exception: # pylint: disable=broad-except
+      items.put((_ERROR, sys.exc_info()))
+
+  thread = threading.Thread(target=retrieve)
+  thread.daemon = True
+  thread.start()
+  try:
+    while True:
+      kind, value = items.get()
+      if kind == _END:
+        return
+      if kind == _ERROR:
+        six.reraise(*value)
+      slots.get_nowait()
+      yield value
+  finally:
+    stopped.set()
@@ -2,9 +2,10 @@
 # cf. https://stackoverflow.com/a/28854227
 from __future__ import absolute_import
 
+import numbers
 import time
 
-from datetime import datetime, tzinfo, timedelta
+from datetime import date, datetime, tzinfo, timedelta
 
 import six
 
@@ -16,9 +17,43 @@ from craftai.errors import CraftAiTimeError
 from craftai.timezones import is_timezone, timezone_offset_in_sec
 
 _EPOCH = datetime(1970, 1, 1, tzinfo=pyutc)
-
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_SECONDS_PER_DAY = 24 * 60 * 60
+
+_LOCAL_ZONE = []
+_FIXED_TIMEZONES = {}
+
+def local_zone():
+  """Local timezone, looked up once"""
+  if not _LOCAL_ZONE:
+    _LOCAL_ZONE.append(get_localzone())
+  return _LOCAL_ZONE[0]
+
+def fixed_timezone(offset):
+  """Timezone of the given UTC offset in seconds, the same object for a given offset"""
+  result = _FIXED_TIMEZONES.get(offset)
+  if result is None:
+    result = dt_timezone(timedelta(seconds=offset))
+    _FIXED_TIMEZONES[offset] = result
+  return result
+
+def format_offset(offset):
+  """Formats an UTC offset in seconds as `timezone` values, e.g. `-03:30`"""
+  sign = "-" if offset < 0 else "+"
+  minutes, seconds = divmod(abs(offset), 60)
+  hours, minutes = divmod(minutes, 60)
+  if seconds:
+    # As `strftime("%z")` gives them, for historical offsets
+    return "{}{:02d}:{:02d}{:02d}".format(sign, hours, minutes, seconds)
+  return "{}{:02d}:{:02d}".format(sign, hours, minutes)
+
+#pylint: disable=R0902
 class Time(object):
   """Handles time in a useful way for craft ai's client"""
+
+  __slots__ = ("_utc_iso", "_offset", "day_of_week", "time_of_day", "day_of_month",
+               "month_of_year", "timezone", "timestamp")
+
   def __init__(self, t=None, timezone=None):
 
     def time_from_datetime_timestamp_and_timezone(timestamp, timezone):
@@ -69,7 +104,7 @@ class Time(object):
     def set_time_and_timezone(timestamp, timezone):
       if timestamp is None:
         # If no initial timestamp is given, the current local time is used
-        _time = datetime.now(get_localzone())
+        _time = datetime.now(local_zone())
         # If a timezone is specified we can try to use it
         if timezone:
           # Handle theses cases :   Time(timezone="+01:00") & Time(timezone="CET")
@@ -80,7 +115,7 @@ class Time(object):
         # local UTC offset by default .
         try:
           #Handle format like  : Time().timezone
-          _time = datetime.fromtimestamp(timestamp, get_localzone())
+          _time = datetime.fromtimestamp(timestamp, local_zone())
         except (OverflowError, OSError) as e:
           raise CraftAiTimeError(
             """Unable to instantiate Time from given timestamp. {}""".
@@ -110,7 +145,7 @@ class Time(object):
       elif is_timezone(timezone):
         # If it's a string, we convert it to a usable timezone object
         offset = timezone_offset_in_sec(timezone)
-        _time = timestamp.astimezone(tz=dt_timezone(timedelta(seconds=offset)))
+        _time = timestamp.astimezone(tz=fixed_timezone(offset))
       else:
         raise CraftAiTimeError(
           """Unable to instantiate Time with the given timezone."""
@@ -122,19 +157,88 @@ class Time(object):
 
 
     try:
-      self.utc_iso = _time.isoformat()
+      self._utc_iso = _time.isoformat()
     except ValueError as e:
       raise CraftAiTimeError(
         """Unable to create ISO 8061 UTCstring. {}""".
         format(e.__str__()))
 
+    self._offset = None
     self.day_of_week = _time.weekday()
     self.time_of_day = _time.hour + _time.minute / 60 + _time.second / 3600
     self.day_of_month = _time.day
     self.month_of_year = _time.month
-    self.timezone = _time.strftime("%z")[:3] + ":" + _time.strftime("%z")[3:]
+    offset = _time.utcoffset()
+    if offset.microseconds == 0:
+      self.timezone = format_offset(offset.days * _SECONDS_PER_DAY + offset.seconds)
+    else:
+      self.timezone = _time.strftime("%z")[:3] + ":" + _time.strftime("%z")[3:]
     self.timestamp = Time.timestamp_from_datetime(_time)
 
+  @classmethod
+  def from_epoch(cls, timestamp, offset=None):
+    """Time of a POSIX timestamp in seconds with an UTC offset in seconds.
+
+    Gives the same values as `Time(timestamp, timezone)` when `offset` is
+    `timezone_offset_in_sec(timezone)` and as `Time(timestamp)` when `offset`
+    is None, the local UTC offset being used. The fields are computed from the timestamp without
+    building any datetime, the ISO string is only built when used.
+    """
+    if not isinstance(timestamp, numbers.Integral) or isinstance(timestamp, bool):
+      raise CraftAiTimeError(
+        """Unable to instantiate Time from given timestamp. It must be an integer."""
+      )
+    timestamp = int(timestamp)
+    if offset is None:
+      try:
+        utc_offset = datetime.fromtimestamp(timestamp, local_zone()).utcoffset()
+      except (OverflowError, OSError, ValueError) as e:
+        raise CraftAiTimeError(
+          """Unable to instantiate Time from given timestamp. {}""".
+          format(e.__str__()))
+      if utc_offset.microseconds or utc_offset.seconds % 60:
+        # Historical offsets which aren't whole minutes are formatted by datetime
+        return cls(timestamp)
+      offset = utc_offset.days * _SECONDS_PER_DAY + utc_offset.seconds
+    elif not isinstance(offset, numbers.Integral) or offset % 60 or abs(offset) >= 24 * 60 * 60:
+      raise CraftAiTimeError(
+        """Unable to instantiate Time with the given UTC offset. {} is not a whole number"""
+        """ of minutes strictly between -24 and 24 hours.""".format(offset)
+      )
+    offset = int(offset)
+
+    days, seconds = divmod(timestamp + offset, _SECONDS_PER_DAY)
+    try:
+      day = date.fromordinal(_EPOCH_ORDINAL + days)
+    except (OverflowError, ValueError) as e:
+      raise CraftAiTimeError(
+        """Unable to instantiate Time from given timestamp. {}""".
+        format(e.__str__()))
+    hour, seconds = divmod(seconds, 3600)
+    minute, second = divmod(seconds, 60)
+
+    self = cls.__new__(cls)
+#pylint: disable=W0212
+    self._utc_iso = None
+    self._offset = offset
+#pylint: enable=W0212
+    # 1970-01-01 was a Thursday
+    self.day_of_week = (days + 3) % 7
+    self.time_of_day = hour + minute / 60 + second / 3600
+    self.day_of_month = day.day
+    self.month_of_year = day.month
+    self.timezone = format_offset(offset)
+    self.timestamp = float(timestamp)
+    return self
+
+  @property
+  def utc_iso(self):
+    if self._utc_iso is None:
+      self._utc_iso = datetime.fromtimestamp(
+        int(self.timestamp), fixed_timezone(self._offset)
+      ).isoformat()
+    return self._utc_iso
+
   def to_dict(self):
     """Returns the Time instance as a usable dictionary for craftai"""
     return {
@@ -155,6 +259,7 @@ class Time(object):
                           date_time.minute, date_time.second,
                           -1, -1, -1)) + date_time.microsecond / 1e6
     return (date_time - _EPOCH).total_seconds()
+#pylint: enable=R0902
 
 #pylint: disable=C0103,W0212
 class dt_timezone(tzinfo):
@@ -0,0 +1,175 @@
+"""Cache of the decision trees retrieved by the client"""
+
+from collections import OrderedDict
+import numbers
+import sys
+import threading
+import time
+
+import six
+
+from craftai.errors import CraftAiError
+
+# Measures the time to live of the trees, unaffected by system clock changes when possible
+_CLOCK = getattr(time, "monotonic", time.time)
+
+#pylint: disable=R0902
+class TreeCache(object):
+  """Least recently used cache of decision trees, keyed by agent, timestamp and version.
+
+  The trees of the latest timestamp, or of a timestamp still to come, expire
+  `ttl` seconds after their retrieval, None meaning they never expire. For
+  `stale_while_revalidate` more seconds, the expired tree is still returned
+  while it is retrieved again in the background. The trees of a past
+  timestamp don't expire. Cached trees are shared and must not be modified.
+  """
+
+  def __init__(self, max_size=128, ttl=60, stale_while_revalidate=0, clock=None):
+    if max_size < 1:
+      raise CraftAiError("""Invalid decision tree cache size, it must be a positive integer.""")
+    if (ttl is not None and ttl < 0) or stale_while_revalidate < 0:
+      raise CraftAiError("""Invalid decision tree cache durations, they must be positive.""")
+    self.max_size = max_size
+    self.ttl = ttl
+    self.stale_while_revalidate = stale_while_revalidate
+    self.hits = 0
+    self.stale_hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self.refresh_errors = 0
+    self._clock = clock or _CLOCK
+    self._trees = OrderedDict()
+    # Key to the retrieval in progress of its tree
+    self._retrievals = {}
+    self._lock = threading.Lock()
+
+  def get(self, agent_id, timestamp, version, retrieve):
+    """The cached decision tree, or the one `retrieve()` gives when there is none"""
+    key = (agent_id, timestamp, version)
+    now = self._clock()
+    refresh = None
+    with self._lock:
+      entry = self._trees.pop(key, None)
+      if entry is not None:
+        self._trees[key] = entry
+        tree, expires_at = entry
+        if expires_at is None or now < expires_at:
+          self.hits += 1
+          return tree
+        if now < expires_at + self.stale_while_revalidate:
+          self.stale_hits += 1
+          # A single retrieval per tree
+          if key not in self._retrievals:
+            refresh = self._retrievals[key] = _Retrieval()
+        else:
+          entry = None
+      if entry is None:
+        self.misses += 1
+        retrieval = self._retrievals.get(key)
+        owner = retrieval is None
+        if owner:
+          retrieval = self._retrievals[key] = _Retrieval()
+
+    if entry is not None:
+      if refresh is not None:
+        thread = threading.Thread(target=self._refresh, args=(key, retrieve, refresh))
+        thread.daemon = True
+        thread.start()
+      return entry[0]
+
+    if owner:
+      self._retrieve(key, retrieve, retrieval)
+    # The concurrent misses of a tree share its retrieval
+    return retrieval.result()
+
+  def invalidate(self, agent_id):
+    """Drop the cached decision trees of the given agent"""
+    with self._lock:
+      for key in [key for key in self._trees if key[0] == agent_id]:
+        del self._trees[key]
+      # The trees being retrieved may predate the invalidation, they aren't cached
+      for key in [key for key in self._retrievals if key[0] == agent_id]:
+        self._retrievals.pop(key).invalidated = True
+
+  def info(self):
+    """Statistics of the cache"""
+    return {
+      "hits": self.hits,
+      "stale_hits": self.stale_hits,
+      "misses": self.misses,
+      "evictions": self.evictions,
+      "refresh_errors": self.refresh_errors,
+      "size": len(self._trees),
+      "max_size": self.max_size
+    }
+
+  def clear(self):
+    with self._lock:
+      self._trees.clear()
+      for retrieval in self._retrievals.values():
+        retrieval.invalidated = True
+      self._retrievals.clear()
+      self.hits = 0
+      self.stale_hits = 0
+      self.misses = 0
+      self.evictions = 0
+      self.refresh_errors = 0
+
+  def __len__(self):
+    return len(self._trees)
+
+  def _store(self, key, tree):
+    # Called with the lock held
+    timestamp = key[1]
+    if isinstance(timestamp, numbers.Real) and timestamp < time.time():
+      # The tree of a past timestamp never changes
+      expires_at = None
+    elif self.ttl is None:
+      expires_at = None
+    else:
+      expires_at = self._clock() + self.ttl
+    self._trees.pop(key, None)
+    self._trees[key] = (tree, expires_at)
+    while len(self._trees) > self.max_size:
+      self._trees.popitem(last=False)
+      self.evictions += 1
+
+  def _retrieve(self, key, retrieve, retrieval):
+    try:
+      retrieval.tree = retrieve()
+    except: # pylint: disable=bare-except
+      retrieval.error = sys.exc_info()
+    with self._lock:
+      if self._retrievals.get(key) is retrieval:
+        del self._retrievals[key]
+      if retrieval.error is None and not retrieval.invalidated:
+        self._store(key, retrieval.tree)
+    retrieval.done.set()
+
+  def _refresh(self, key, retrieve, retrieval):
+    self._retrieve(key, retrieve, retrieval)
+    if retrieval.error is not None:
+      # The stale tree is kept until it can't be used anymore
+      with self._lock:
+        self.refresh_errors += 1
+#pylint: enable=R0902
+
+#pylint: disable=R0903,E1133
+class _Retrieval(object):
+  """Retrieval of a decision tree, shared by the concurrent misses of its key"""
+
+  __slots__ = "done", "tree", "error", "invalidated"
+
+  def __init__(self):
+    self.done = threading.Event()
+    self.tree = None
+    self.error = None
+    # Set when the agent is invalidated during the retrieval, the tree isn't cached then
+    self.invalidated = False
+
+  def result(self):
+    self.done.wait()
+    if self.error is not None:
+      six.reraise(*self.error)
+    return self.tree
+#pylint: enable=R0903,E1133
@@ -0,0 +1,299 @@
+"""Store of the decision trees on disk, shared by the processes of a host"""
+
+from contextlib import contextmanager
+import errno
+import hashlib
+import json
+import numbers
+import os
+import tempfile
+import time
+
+from craftai.errors import CraftAiError
+
+try:
+  import fcntl
+except ImportError:
+  # No file locking, e.g. on Windows, the writes are still atomic
+  fcntl = None
+
+# Age, in seconds, from which the unindexed trees and temporary files are removed, younger
+# ones may be about to be indexed or still being written by another process
+_GRACE_PERIOD = 300
+
+def _hash(data):
+  return hashlib.sha1(data).hexdigest()
+
+def _atomic_write(path, data):
+  """Write the file at once, readers never see a partially written file"""
+  directory = os.path.dirname(path)
+  _makedirs(directory)
+  tmp_fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+  try:
+    with os.fdopen(tmp_fd, "wb") as tmp_file:
+      tmp_file.write(data)
+      tmp_file.flush()
+      os.fsync(tmp_file.fileno())
+    getattr(os, "replace", os.rename)(tmp_path, path)
+  except:
+    _remove(tmp_path)
+    raise
+
+def _makedirs(directory):
+  try:
+    os.makedirs(directory)
+  except OSError as e:
+    if e.errno != errno.EEXIST:
+      raise
+
+def _remove(path):
+  try:
+    os.remove(path)
+  except OSError as e:
+    if e.errno != errno.ENOENT:
+      raise
+
+def _is_older(path, age):
+  try:
+    return os.path.getmtime(path) < time.time() - age
+  except OSError as e:
+    if e.errno != errno.ENOENT:
+      raise
+    return False
+
+def _remove_abandoned(path):
+  """Remove the temporary file, abandoned by an interrupted write, when old enough"""
+  if _is_older(path, _GRACE_PERIOD):
+    _remove(path)
+
+def _read(path):
+  try:
+    with open(path, "rb") as stored_file:
+      return stored_file.read()
+  except IOError as e:
+    if e.errno != errno.ENOENT:
+      raise
+    return None
+
+def _read_entry(index_path):
+  data = _read(index_path)
+  if data is None:
+    return None
+  try:
+    return json.loads(data.decode("utf-8"))
+  except ValueError:
+    return None
+
+def _is_expired(entry):
+  expires_at = entry.get("expires_at")
+  return expires_at is not None and expires_at <= time.time()
+
+@contextmanager
+def _locked(path, blocking=True):
+  """Exclusive lock of the given lock file, yields False if it isn't blocking and busy"""
+  _makedirs(os.path.dirname(path))
+  with open(path, "a") as lock_file:
+    if fcntl is None:
+      yield True
+      return
+    try:
+      fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+    except IOError as e:
+      if blocking or e.errno not in (errno.EAGAIN, errno.EACCES):
+        raise
+      yield False
+      return
+    try:
+      yield True
+    finally:
+      fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+#pylint: disable=R0902,R0913
+class TreeStore(object):
+  """Directory of decision trees, indexed by agent, timestamp and version.
+
+  The trees are stored once per content, in files named after their hash,
+  and the index associates each agent, timestamp and version to the hash
+  of its tree. The files are written atomically and a tree missing from the
+  store is retrieved by a single process of the host at a time, the others
+  waiting for it to be stored.
+
+  As in `TreeCache`, the trees of the latest timestamp, or of a timestamp
+  still to come, expire `ttl` seconds after their retrieval, those of a past
+  timestamp don't. When the trees of the namespace exceed `max_size` bytes,
+  its least recently stored ones are removed. The `namespace`, e.g. the
+  owner and project, separates the agents of different projects in a shared
+  directory, each one bounded by its own `max_size`. The unused trees and
+  the abandoned temporary files are removed a few minutes after their write.
+  The store is collected after a retrieval at most once every
+  `collect_interval` seconds, `collect()` collecting it at once.
+  """
+
+  def __init__(self, directory, ttl=60, max_size=256 * 1024 * 1024, namespace="",
+               collect_interval=60):
+    if ttl is not None and ttl < 0:
+      raise CraftAiError("""Invalid decision tree store time to live, it must be positive.""")
+    if max_size < 0:
+      raise CraftAiError("""Invalid decision tree store size, it must be positive.""")
+    if collect_interval < 0:
+      raise CraftAiError("""Invalid decision tree store collect interval, it must be positive.""")
+    self.directory = directory
+    self.ttl = ttl
+    self.max_size = max_size
+    self.collect_interval = collect_interval
+    self._collected_at = None
+    self._index_directory = os.path.join(directory, "index",
+                                         _hash(namespace.encode("utf-8"))[:16])
+    self._objects_directory = os.path.join(directory, "objects")
+    self._locks_directory = os.path.join(directory, "locks")
+
+  def get(self, agent_id, timestamp, version, retrieve):
+    """The stored decision tree, or the one `retrieve()` gives when there is none"""
+    index_path = self._index_path(agent_id, timestamp, version)
+    tree = self._load(index_path)
+    if tree is not None:
+      return tree
+
+    # The trees share a bounded number of lock files
+    lock_path = os.path.join(self._locks_directory,
+                             _hash(index_path.encode("utf-8"))[:2] + ".lock")
+    with _locked(lock_path):
+      # Another process may have stored it while this one was waiting
+      tree = self._load(index_path)
+      if tree is not None:
+        return tree
+      tree = retrieve()
+      self._store(index_path, timestamp, tree)
+    # Collecting walks the whole store, it is only done once in a while
+    now = time.time()
+    if self._collected_at is None or now - self._collected_at >= self.collect_interval:
+      self._collected_at = now
+      self.collect()
+    return tree
+
+  def invalidate(self, agent_id):
+    """Remove the index of the decision trees of the given agent"""
+    agent_directory = os.path.join(self._index_directory, agent_id)
+    try:
+      names = os.listdir(agent_directory)
+    except OSError:
+      return
+    for name in names:
+      _remove(os.path.join(agent_directory, name))
+
+  def collect(self):
+    """Remove the expired index entries of the namespace, the unused trees and, if the
+    trees of the namespace exceed the maximum size, its least recently stored ones"""
+    with _locked(os.path.join(self._locks_directory, "collect.lock"), blocking=False) as locked:
+      if not locked:
+        # Another process is collecting
+        return
+      entries, referenced = self._collect_index()
+      sizes = self._object_sizes()
+      used = self._bound_entries(entries, sizes)
+      for tree_hash in sizes:
+        object_path = self._object_path(tree_hash)
+        # A recent tree may be written by a process which didn't index it yet
+        if (tree_hash not in used and tree_hash not in referenced and
+            _is_older(object_path, _GRACE_PERIOD)):
+          _remove(object_path)
+
+  def _collect_index(self):
+    """Remove the expired entries of the namespace, returns the (stored at, path, hash) of
+    the others and the hashes of the trees used by the other namespaces"""
+    entries = []
+    # The trees used by the other namespaces are kept, their entries are left to them
+    referenced = set()
+    for root, _, names in os.walk(os.path.join(self.directory, "index")):
+      own = (root + os.sep).startswith(self._index_directory + os.sep)
+      for name in names:
+        path = os.path.join(root, name)
+        if name.startswith(".tmp-"):
+          _remove_abandoned(path)
+          continue
+        entry = _read_entry(path)
+        expired = entry is None or _is_expired(entry)
+        if own and expired:
+          _remove(path)
+        elif own:
+          entries.append((entry["stored_at"], path, entry["hash"]))
+        elif not expired:
+          referenced.add(entry["hash"])
+    return entries, referenced
+
+  def _object_sizes(self):
+    """The size of each stored tree, by hash"""
+    sizes = {}
+    for root, _, names in os.walk(self._objects_directory):
+      for name in names:
+        path = os.path.join(root, name)
+        if name.startswith(".tmp-"):
+          _remove_abandoned(path)
+          continue
+        try:
+          sizes[name[:-len(".json")]] = os.path.getsize(path)
+        except OSError as e:
+          if e.errno != errno.ENOENT:
+            raise
+    return sizes
+
+  def _bound_entries(self, entries, sizes):
+    """Remove the least recently stored entries exceeding the maximum size, returns the hashes
+    of the trees of the remaining ones"""
+    # Most recently stored first
+    entries.sort(reverse=True)
+    used = set()
+    removed = set()
+    total_size = 0
+    for _, path, tree_hash in entries:
+      if tree_hash in used:
+        continue
+      if (tree_hash in removed or tree_hash not in sizes or
+          total_size + sizes[tree_hash] > self.max_size):
+        removed.add(tree_hash)
+        _remove(path)
+        continue
+      used.add(tree_hash)
+      total_size += sizes[tree_hash]
+    return used
+
+  def _index_path(self, agent_id, timestamp, version):
+    key = json.dumps([timestamp, version]).encode("utf-8")
+    return os.path.join(self._index_directory, agent_id, _hash(key) + ".json")
+
+  def _object_path(self, tree_hash):
+    return os.path.join(self._objects_directory, tree_hash[:2], tree_hash + ".json")
+
+  def _load(self, index_path):
+    entry = _read_entry(index_path)
+    if entry is None or _is_expired(entry):
+      return None
+    data = _read(self._object_path(entry["hash"]))
+    if data is None:
+      # Removed by a concurrent collection
+      return None
+    return json.loads(data.decode("utf-8"))
+
+  def _store(self, index_path, timestamp, tree):
+    data = json.dumps(tree, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    tree_hash = _hash(data)
+    object_path = self._object_path(tree_hash)
+    try:
+      # Keeps the tree from the collections until it is indexed
+      os.utime(object_path, None)
+    except OSError as e:
+      if e.errno != errno.ENOENT:
+        raise
+      _atomic_write(object_path, data)
+
+    now = time.time()
+    if isinstance(timestamp, numbers.Real) and timestamp < now:
+      # The tree of a past timestamp never changes
+      expires_at = None
+    elif self.ttl is None:
+      expires_at = None
+    else:
+      expires_at = now + self.ttl
+    entry = {"hash": tree_hash, "stored_at": now, "expires_at": expires_at}
+    _atomic_write(index_path, json.dumps(entry).encode("utf-8"))
+#pylint: enable=R0902,R0913
@@ -0,0 +1,185 @@
+"""Helpers shared by the interpreter and the compiled decision trees"""
+
+import numbers
+import re
+
+import semver
+
+from craftai.errors import CraftAiDecisionError
+from craftai.time import Time
+from craftai.types import GENERATED_TIME_TYPES
+
+def parse_tree(tree_object):
+  """The bare trees, configuration and version of the given decision tree"""
+  # Checking definition of tree_object
+  if not isinstance(tree_object, dict):
+    raise CraftAiDecisionError("Invalid decision tree format, the given json is not an object.")
+
+  # Checking version existence
+  tree_version = tree_object.get("_version")
+  if not tree_version:
+    raise CraftAiDecisionError(
+      """Invalid decision tree format, unable to find the version"""
+      """ informations."""
+    )
+
+  # Checking version and tree validity according to version
+  if re.compile(r"\d+.\d+.\d+").match(tree_version) is None:
+    raise CraftAiDecisionError(
+      """Invalid decision tree format, "{}" is not a valid version.""".
+      format(tree_version)
+    )
+  elif semver.match(tree_version, ">=1.0.0") and semver.match(tree_version, "<3.0.0"):
+    if tree_object.get("configuration") is None:
+      raise CraftAiDecisionError(
+        """Invalid decision tree format, no configuration found"""
+      )
+    if tree_object.get("trees") is None:
+      raise CraftAiDecisionError(
+        """Invalid decision tree format, no tree found."""
+      )
+    bare_tree = tree_object.get("trees")
+    configuration = tree_object.get("configuration")
+  else:
+    raise CraftAiDecisionError(
+      """Invalid decision tree format, {} is not a supported"""
+      """ version.""".
+      format(tree_version)
+    )
+  return bare_tree, configuration, tree_version
+
+def join_decide_args(args):
+  joined_args = {}
+  for arg in args:
+    if isinstance(arg, Time):
+      joined_args.update(arg.to_dict())
+    try:
+      joined_args.update(arg)
+    except TypeError:
+      raise CraftAiDecisionError(
+        """Invalid context args, the given objects aren't dicts"""
+        """ or Time instances."""
+      )
+  return joined_args
+
+def context_plan(configuration):
+  """How the context is rebuilt for the given configuration.
+
+  Returns the context properties, i.e. not the outputs, and the (property,
+  type) of the time properties generated from the given `Time`.
+  """
+  # Model should come from `parse_tree` and is assumed to be checked
+  # upon already
+  output = configuration["output"]
+  context = configuration["context"]
+
+  # We should not use the output key(s) to compare against
+  context_properties = [key for key in context if key not in output]
+
+  # `is_generated` defaults to True, the time properties are then generated
+  generated_properties = [
+    (key, context[key]["type"]) for key in context_properties
+    if context[key]["type"] in GENERATED_TIME_TYPES and context[key].get("is_generated", True)
+  ]
+  return context_properties, generated_properties
+
+def index_children(children, operators):
+  """Index of the children of a node by the values validating their decision rules.
+
+  `children` lists the (property, operator, operand, child) of the node's
+  children in order. Only children splitting a single property with `is`
+  and `in` decision rules, e.g. on enum or boolean values, are indexed; each
+  value is associated to the first child it validates, as when checking the
+  children in order. Returns None for the other nodes.
+  """
+  if len(set(property_name for property_name, _, _, _ in children)) != 1:
+    return None
+  index = {}
+  for _, operator, operand, child in children:
+    if operator == operators["IS"]:
+      values = [operand]
+    elif operator == operators.get("IN_MULTI") and isinstance(operand, list):
+      values = operand
+    else:
+      return None
+    for value in values:
+      # NaN isn't equal to itself, it would only be found by identity
+      if isinstance(value, float) and value != value:
+        return None
+      try:
+        index.setdefault(value, child)
+      except TypeError:
+        return None
+  return index
+
+def _is_bound(operand):
+  return (isinstance(operand, numbers.Real) and not isinstance(operand, bool) and
+          operand == operand)
+
+def bound_children(children, operators):
+  """Children of a node by the intervals between the bounds of their decision rules.
+
+  `children` lists the (property, operator, operand, child) of the node's
+  children in order. Only children splitting a single property with `>=`,
+  `<` and `[in[` decision rules, cyclic intervals included, are handled.
+  Values between two consecutive bounds validate the same decision rules;
+  returns the sorted bounds and, for the values lying before each bound and
+  after the last one, their first matching child or None. The child of a
+  value is found with `bisect_right(bounds, value)`. Returns None for the
+  other nodes.
+  """
+  if len(set(property_name for property_name, _, _, _ in children)) != 1:
+    return None
+  bounds = set()
+  for _, operator, operand, _ in children:
+    if operator in (operators["GTE"], operators["LT"]) and _is_bound(operand):
+      bounds.add(operand)
+    elif (operator == operators["IN_INTERVAL"] and isinstance(operand, list) and
+          len(operand) == 2 and all(_is_bound(bound) for bound in operand)):
+      bounds.update(operand)
+    else:
+      return None
+  bounds = sorted(bounds)
+  # Values after the bound at position `i` are in the intervals `i + 1` and above
+  positions = {bound: position + 1 for position, bound in enumerate(bounds)}
+  intervals_count = len(bounds) + 1
+  bounds_children = [None] * intervals_count
+  # The first matching child is kept, the children are laid from the last one
+  for _, operator, operand, child in reversed(children):
+    if operator == operators["GTE"]:
+      ranges = [(positions[operand], intervals_count)]
+    elif operator == operators["LT"]:
+      ranges = [(0, positions[operand])]
+    elif operand[0] < operand[1]:
+      ranges = [(positions[operand[0]], positions[operand[1]])]
+    else:
+      ranges = [(positions[operand[0]], intervals_count), (0, positions[operand[1]])]
+    for start, stop in ranges:
+      bounds_children[start:stop] = [child] * (stop - start)
+  return bounds, bounds_children
+
+#pylint: disable=R0903
+class DeferredError(object):
+  """Error found while compiling a tree, raised when a decision reaches it"""
+
+  __slots__ = "error_type", "args"
+
+  def __init__(self, error):
+    # Only the type and arguments are kept, not the traceback
+    self.error_type = type(error)
+    self.args = error.args
+
+  def throw(self):
+    raise self.error_type(*self.args)
+#pylint: enable=R0903
+
+def copy_result(result):
+  """A copy of a decision result whose distribution isn't shared with the given one"""
+  result = result.copy()
+  if isinstance(result.get("distribution"), list):
+    result["distribution"] = list(result["distribution"])
+  return result
+
+def lean_result(result):
+  """The predicted value and confidence of a decision result, as given without explanations"""
+  return {"predicted_value": result["predicted_value"], "confidence": result["confidence"]}
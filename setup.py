@@ -65,6 +65,12 @@ setup(
   extras_require = {
     "pandas_support":  [
       "pandas>=0.20"
+    ],
+    "numpy_support": [
+      "numpy>=1.13"
+    ],
+    "aio_support": [
+      "aiohttp>=3.0"
     ]
   },
 
@@ -0,0 +1,95 @@
+import asyncio
+import unittest
+import json
+import os
+
+import craftai
+
+from . import settings
+from .data import valid_data, invalid_data
+
+try:
+  from craftai.aio import Client as AioClient
+except ImportError:
+  # No aiohttp
+  AioClient = None
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+
+LARGE_VALID_OPERATIONS_SET = []
+with open(os.path.join(HERE, "./data/large_operation_list.json")) as large_operation_list_file:
+  LARGE_VALID_OPERATIONS_SET = json.load(large_operation_list_file)
+
+class TestAioClient(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    if AioClient is None:
+      raise unittest.SkipTest("The asyncio client requires aiohttp.")
+    cls.agent_id = valid_data.VALID_ID  + "_aio_" + settings.RUN_ID
+
+  def setUp(self):
+    self.loop = asyncio.new_event_loop()
+    self.client = AioClient(settings.CRAFT_CFG)
+    self.await_result(self.client.delete_agent(self.agent_id))
+    self.await_result(self.client.create_agent(valid_data.VALID_CONFIGURATION, self.agent_id))
+
+  def tearDown(self):
+    self.await_result(self.client.delete_agent(self.agent_id))
+    self.await_result(self.client.close())
+    self.loop.close()
+
+  def await_result(self, coroutine):
+    return self.loop.run_until_complete(coroutine)
+
+  def collect(self, async_iterator):
+    async def items():
+      return [item async for item in async_iterator]
+    return self.await_result(items())
+
+  def test_get_agent(self):
+    agent = self.await_result(self.client.get_agent(self.agent_id))
+    self.assertEqual(agent["id"], self.agent_id)
+    self.assertIn(self.agent_id, self.await_result(self.client.list_agents()))
+
+  def test_get_agent_with_unknown_id(self):
+    self.assertRaises(
+      craftai.errors.CraftAiNotFoundError,
+      self.await_result,
+      self.client.get_agent(valid_data.VALID_ID + "_unknown_" + settings.RUN_ID))
+
+  def test_get_agent_with_invalid_id(self):
+    for empty_id in invalid_data.UNDEFINED_KEY:
+      self.assertRaises(
+        craftai.errors.CraftAiBadRequestError,
+        self.await_result,
+        self.client.get_agent(invalid_data.UNDEFINED_KEY[empty_id]))
+
+  def test_operations(self):
+    self.await_result(self.client.add_operations(self.agent_id, LARGE_VALID_OPERATIONS_SET))
+    self.assertEqual(self.await_result(self.client.get_operations_list(self.agent_id)),
+                     LARGE_VALID_OPERATIONS_SET)
+    self.assertEqual(self.await_result(self.client.get_operations_list(self.agent_id, windows=3)),
+                     LARGE_VALID_OPERATIONS_SET)
+    self.assertEqual(self.collect(self.client.iter_operations(self.agent_id)),
+                     LARGE_VALID_OPERATIONS_SET)
+    pages = self.collect(self.client.iter_state_history(self.agent_id, pages=True))
+    self.assertEqual([state for page in pages for state in page],
+                     self.await_result(self.client.get_state_history(self.agent_id)))
+
+  def test_add_operations_bulk(self):
+    invalid_agent_id = valid_data.VALID_ID + "_unknown_" + settings.RUN_ID
+    bulk = self.await_result(self.client.add_operations_bulk({
+      self.agent_id: valid_data.VALID_OPERATIONS_SET,
+      invalid_agent_id: valid_data.VALID_OPERATIONS_SET
+    }))
+    self.assertEqual(list(bulk["results"].keys()), [self.agent_id])
+    self.assertEqual(list(bulk["errors"].keys()), [invalid_agent_id])
+
+  def test_get_decision_tree(self):
+    self.await_result(self.client.add_operations(self.agent_id, valid_data.VALID_OPERATIONS_SET))
+    tree = self.await_result(
+      self.client.get_decision_tree(self.agent_id, valid_data.VALID_TIMESTAMP))
+    self.assertIsInstance(tree, dict)
+    self.assertIsNotNone(tree.get("_version"))
+    self.assertIsNotNone(tree.get("configuration"))
+    self.assertIsNotNone(tree.get("trees"))
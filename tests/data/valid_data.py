@@ -115,3 +115,213 @@ VALID_OPERATIONS_SET = [
     }
   }
 ]
+
+VALID_DECISION_TREE_V2 = {
+  "_version": "2.0.0",
+  "configuration": {
+    "context": {
+      "presence": {
+        "type": "enum"
+      },
+      "lightIntensity": {
+        "type": "continuous"
+      },
+      "time": {
+        "type": "time_of_day"
+      },
+      "tz": {
+        "type": "timezone"
+      },
+      "lightbulbColor": {
+        "type": "enum"
+      }
+    },
+    "output": ["lightbulbColor"],
+    "time_quantum": 100,
+    "deactivate_missing_values": False
+  },
+  "trees": {
+    "lightbulbColor": {
+      "output_values": ["black", "green", "red"],
+      "children": [
+        {
+          "decision_rule": {
+            "property": "presence",
+            "operator": "in",
+            "operand": ["gisele", "none"]
+          },
+          "children": [
+            {
+              "decision_rule": {
+                "property": "time",
+                "operator": "[in[",
+                "operand": [20, 7]
+              },
+              "prediction": {
+                "value": "black",
+                "confidence": 0.9,
+                "nb_samples": 6,
+                "distribution": [0.9, 0.05, 0.05]
+              }
+            },
+            {
+              "decision_rule": {
+                "property": "time",
+                "operator": "[in[",
+                "operand": [7, 20]
+              },
+              "prediction": {
+                "value": "green",
+                "confidence": 0.6,
+                "nb_samples": 2,
+                "distribution": [0.2, 0.6, 0.2]
+              }
+            }
+          ]
+        },
+        {
+          "decision_rule": {
+            "property": "presence",
+            "operator": "is",
+            "operand": "robert"
+          },
+          "children": [
+            {
+              "decision_rule": {
+                "property": "lightIntensity",
+                "operator": "<",
+                "operand": 0.5
+              },
+              "prediction": {
+                "value": "red",
+                "confidence": 0.8,
+                "nb_samples": 4,
+                "distribution": [0.1, 0.1, 0.8]
+              }
+            },
+            {
+              "decision_rule": {
+                "property": "lightIntensity",
+                "operator": ">=",
+                "operand": 0.5
+              },
+              "prediction": {
+                "value": "green",
+                "confidence": 0.7,
+                "nb_samples": 4,
+                "distribution": [0.1, 0.7, 0.2]
+              }
+            }
+          ]
+        }
+      ]
+    }
+  }
+}
+
+VALID_DECISION_TREE_V2_CONTEXTS = [
+  {"presence": "gisele", "lightIntensity": 0.1, "time": 22.5, "tz": "+02:00"},
+  {"presence": "none", "lightIntensity": 0.9, "time": 3, "tz": "+02:00"},
+  {"presence": "none", "lightIntensity": 0.9, "time": 12.25, "tz": "-05:00"},
+  {"presence": "robert", "lightIntensity": 0.2, "time": 8, "tz": "+01:00"},
+  {"presence": "robert", "lightIntensity": 0.5, "time": 8, "tz": "+01:00"},
+  {"presence": "robert", "lightIntensity": None, "time": 8, "tz": "+01:00"},
+  {"presence": None, "lightIntensity": 0.7, "time": 8, "tz": "+01:00"},
+  {"presence": "paul", "lightIntensity": 0.7, "time": 8, "tz": "+01:00"}
+]
+
+VALID_DECISION_TREE_V1 = {
+  "_version": "1.1.0",
+  "configuration": {
+    "context": {
+      "presence": {
+        "type": "enum"
+      },
+      "lightIntensity": {
+        "type": "continuous"
+      },
+      "time": {
+        "type": "time_of_day"
+      },
+      "tz": {
+        "type": "timezone"
+      },
+      "lightbulbIntensity": {
+        "type": "continuous"
+      }
+    },
+    "output": ["lightbulbIntensity"],
+    "time_quantum": 100
+  },
+  "trees": {
+    "lightbulbIntensity": {
+      "children": [
+        {
+          "decision_rule": {
+            "property": "presence",
+            "operator": "is",
+            "operand": "gisele"
+          },
+          "children": [
+            {
+              "decision_rule": {
+                "property": "time",
+                "operator": "[in[",
+                "operand": [20, 7]
+              },
+              "predicted_value": 0.1,
+              "confidence": 0.9,
+              "standard_deviation": 0.05
+            },
+            {
+              "decision_rule": {
+                "property": "time",
+                "operator": "[in[",
+                "operand": [7, 20]
+              },
+              "predicted_value": 0.6,
+              "confidence": 0.6,
+              "standard_deviation": 0.2
+            }
+          ]
+        },
+        {
+          "decision_rule": {
+            "property": "presence",
+            "operator": "is",
+            "operand": "robert"
+          },
+          "children": [
+            {
+              "decision_rule": {
+                "property": "lightIntensity",
+                "operator": "<",
+                "operand": 0.5
+              },
+              "predicted_value": 0.8,
+              "confidence": 0.8,
+              "standard_deviation": 0.1
+            },
+            {
+              "decision_rule": {
+                "property": "lightIntensity",
+                "operator": ">=",
+                "operand": 0.5
+              },
+              "predicted_value": 0.3,
+              "confidence": 0.7
+            }
+          ]
+        }
+      ]
+    }
+  }
+}
+
+VALID_DECISION_TREE_V1_CONTEXTS = [
+  {"presence": "gisele", "lightIntensity": 0.1, "time": 22.5, "tz": "+02:00"},
+  {"presence": "gisele", "lightIntensity": 0.9, "time": 12.25, "tz": "-05:00"},
+  {"presence": "robert", "lightIntensity": 0.2, "time": 8, "tz": "+01:00"},
+  {"presence": "robert", "lightIntensity": 0.5, "time": 8, "tz": "+01:00"},
+  {"presence": "paul", "lightIntensity": 0.7, "time": 8, "tz": "+01:00"}
+]
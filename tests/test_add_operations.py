@@ -33,6 +33,31 @@ class TestAddOperationsSuccess(unittest.TestCase):
     resp_keys = resp.keys()
     self.assertTrue("message" in resp_keys)
 
+  def test_add_operations_bulk(self):
+    """add_operations_bulk should add the operations of each agent
+
+    It should give the result of each agent and the errors of the agents
+    which failed without stopping the others.
+    """
+    other_agent_id = valid_data.VALID_ID + "_bulk_" + settings.RUN_ID
+    invalid_agent_id = valid_data.VALID_ID + "_unknown_" + settings.RUN_ID
+    self.client.delete_agent(other_agent_id)
+    self.client.create_agent(valid_data.VALID_CONFIGURATION, other_agent_id)
+    try:
+      bulk = self.client.add_operations_bulk({
+        self.agent_id: valid_data.VALID_OPERATIONS_SET,
+        other_agent_id: valid_data.VALID_OPERATIONS_SET,
+        invalid_agent_id: valid_data.VALID_OPERATIONS_SET
+      })
+      self.assertEqual(sorted(bulk["results"].keys()), sorted([self.agent_id, other_agent_id]))
+      self.assertTrue("message" in bulk["results"][self.agent_id])
+      self.assertEqual(list(bulk["errors"].keys()), [invalid_agent_id])
+      self.assertIsInstance(bulk["errors"][invalid_agent_id], craftai.errors.CraftAiError)
+      self.assertEqual(self.client.get_operations_list(other_agent_id),
+                       self.client.get_operations_list(self.agent_id))
+    finally:
+      self.client.delete_agent(other_agent_id)
+
   def test_add_operations_with_many_operations(self):
     """add_operations should succeed when given lots of operations
 
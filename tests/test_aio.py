@@ -0,0 +1,6 @@
+import sys
+
+if sys.version_info >= (3, 6):
+  # Imported from a module not collected by the test runner, which would fail to parse it
+  # with older interpreters
+  from .aio_client import TestAioClient # pylint: disable=unused-import
@@ -0,0 +1,49 @@
+import os
+import shutil
+import tempfile
+import types
+
+from nose.tools import assert_equal, assert_is, assert_true
+import six
+
+from craftai import codegen, Interpreter
+
+from .data import valid_data
+
+def test_codegen_engine_decisions():
+  tree = valid_data.VALID_DECISION_TREE_V2
+  compiled_tree = Interpreter.compile(tree, "codegen")
+  for context in valid_data.VALID_DECISION_TREE_V2_CONTEXTS:
+    assert_equal(compiled_tree.decide(dict(context)),
+                 Interpreter.decide(tree, [dict(context)]))
+
+def test_codegen_load_is_cached():
+  tree = valid_data.VALID_DECISION_TREE_V2
+  module = codegen.load(tree)
+  assert_is(codegen.load(dict(tree)), module)
+  assert_equal(module.TREE_HASH, codegen.tree_hash(tree))
+  assert_true("def decide_0(context):" in module.SOURCE)
+
+def test_codegen_export():
+  tree = valid_data.VALID_DECISION_TREE_V2
+  directory = tempfile.mkdtemp()
+  try:
+    path = os.path.join(directory, "lightbulb_tree.py")
+    codegen.export(tree, path)
+    module = types.ModuleType("lightbulb_tree")
+    with open(path) as module_file:
+      six.exec_(compile(module_file.read(), path, "exec"), module.__dict__)
+    for context in valid_data.VALID_DECISION_TREE_V2_CONTEXTS:
+#pylint: disable=E1101
+      assert_equal(module.decide(dict(context)), Interpreter.decide(tree, [dict(context)]))
+#pylint: enable=E1101
+  finally:
+    shutil.rmtree(directory)
+
+def test_codegen_lean_decisions():
+  tree = valid_data.VALID_DECISION_TREE_V2
+  module = codegen.load(tree)
+  for context in valid_data.VALID_DECISION_TREE_V2_CONTEXTS:
+    decision = module.decide(dict(context), explain=False)
+    assert_equal(decision, Interpreter.decide(tree, [dict(context)], explain=False))
+    assert_equal(list(decision["output"]["lightbulbColor"]), ["predicted_value", "confidence"])
@@ -0,0 +1,125 @@
+import copy
+
+from nose.tools import assert_equal, assert_is, assert_is_none, assert_raises
+
+from craftai import Interpreter, errors as craft_err
+from craftai.compiled_tree import ENGINES
+from craftai.interpreter_v2 import InterpreterV2
+
+from .data import valid_data
+
+def test_compiled_tree_children_index():
+  compiled_tree = Interpreter.compile(valid_data.VALID_DECISION_TREE_V2)
+#pylint: disable=W0212
+  root = compiled_tree._output_trees[0][1].root
+#pylint: enable=W0212
+
+  assert_equal(sorted(root.index), ["gisele", "none", "robert"])
+  assert_is(root.index["gisele"][1], root.children[0][4])
+  assert_is(root.index["none"][1], root.children[0][4])
+  assert_is(root.index["robert"][1], root.children[1][4])
+  # Interval splits are looked up by bounds
+  assert_is_none(root.children[0][4].index)
+
+def test_compiled_tree_children_bounds():
+  compiled_tree = Interpreter.compile(valid_data.VALID_DECISION_TREE_V2)
+#pylint: disable=W0212
+  root = compiled_tree._output_trees[0][1].root
+#pylint: enable=W0212
+  assert_is_none(root.bounds)
+
+  # [20, 7[ is a cyclic interval, it matches the values before 7 and from 20
+  time_node = root.children[0][4]
+  assert_equal(time_node.bounds, [7, 20])
+  assert_equal([child for _, child in time_node.bounds_children],
+               [time_node.children[0][4], time_node.children[1][4], time_node.children[0][4]])
+
+  light_node = root.children[1][4]
+  assert_equal(light_node.bounds, [0.5])
+  assert_equal([child for _, child in light_node.bounds_children],
+               [light_node.children[0][4], light_node.children[1][4]])
+
+def test_compiled_tree_indexed_decisions():
+  tree = copy.deepcopy(valid_data.VALID_DECISION_TREE_V2)
+  tree["configuration"]["context"]["presence"]["is_optional"] = True
+  compiled_tree = Interpreter.compile(tree)
+  contexts = valid_data.VALID_DECISION_TREE_V2_CONTEXTS + [
+    # Unhashable values are checked against each child
+    {"presence": {}, "lightIntensity": 0.7, "time": 8, "tz": "+01:00"}
+  ]
+  for context in contexts:
+    assert_equal(compiled_tree.decide(dict(context)), Interpreter.decide(tree, [dict(context)]))
+
+def test_context_checker():
+  configuration = valid_data.VALID_DECISION_TREE_V2["configuration"]
+  check_context = InterpreterV2.context_checker(configuration)
+  check_context({"presence": "robert", "lightIntensity": 0.2, "time": 8, "tz": "+01:00"})
+
+  for context in [
+      {"presence": "robert", "lightIntensity": None, "time": 8, "tz": "+01:00"},
+      {"presence": 3, "lightIntensity": 0.2, "time": 25, "tz": "+01:00"},
+      {"presence": "robert", "lightIntensity": 0.2, "time": 8, "tz": None}
+  ]:
+    with assert_raises(craft_err.CraftAiDecisionError) as context_manager:
+      check_context(context)
+    with assert_raises(craft_err.CraftAiDecisionError) as expected_context_manager:
+#pylint: disable=W0212
+      InterpreterV2._check_context(configuration, context)
+#pylint: enable=W0212
+    assert_equal(context_manager.exception.message, expected_context_manager.exception.message)
+
+  # Missing values are valid when they are handled
+  InterpreterV2.context_checker(configuration, False)(
+    {"presence": "robert", "lightIntensity": None, "time": 8, "tz": "+01:00"})
+
+def test_compiled_tree_lazy_decisions():
+  tree = valid_data.VALID_DECISION_TREE_V2
+  for engine in ENGINES:
+    compiled_tree = Interpreter.compile(tree, engine)
+    for context in valid_data.VALID_DECISION_TREE_V2_CONTEXTS:
+      decision = compiled_tree.decide(dict(context), lazy=True)
+      expected = Interpreter.decide(tree, [dict(context)])
+      assert_equal(decision.to_dict(), expected)
+
+      output = decision.output["lightbulbColor"]
+      expected_output = expected["output"]["lightbulbColor"]
+      assert_equal(output.predicted_value, expected_output["predicted_value"])
+      assert_equal(output.nb_samples, expected_output["nb_samples"])
+      assert_equal(output.decision_rules, expected_output["decision_rules"])
+      assert_is(output.decision_rules, output.decision_rules)
+
+def test_compiled_tree_null_leaves():
+  tree = copy.deepcopy(valid_data.VALID_DECISION_TREE_V2)
+  # Leaf without predicted value, reached by robert in the dark
+  tree["trees"]["lightbulbColor"]["children"][1]["children"][0]["prediction"] = {"value": None}
+  contexts = [context for context in valid_data.VALID_DECISION_TREE_V2_CONTEXTS
+              if context["presence"] in ["gisele", "none"]]
+  contexts.append({"presence": "robert", "lightIntensity": 0.5, "time": 8, "tz": "+01:00"})
+  null_context = {"presence": "robert", "lightIntensity": 0.2, "time": 8, "tz": "+01:00"}
+  with assert_raises(craft_err.CraftAiNullDecisionError) as expected_context_manager:
+    Interpreter.decide(tree, [dict(null_context)])
+
+  for engine in ENGINES:
+    # The leaf is only checked by the decisions reaching it
+    compiled_tree = Interpreter.compile(tree, engine)
+    for context in contexts:
+      assert_equal(compiled_tree.decide(dict(context)), Interpreter.decide(tree, [dict(context)]))
+    for kwargs in [{}, {"explain": False}, {"lazy": True}]:
+      with assert_raises(craft_err.CraftAiNullDecisionError) as context_manager:
+        compiled_tree.decide(dict(null_context), **kwargs)
+      assert_equal(context_manager.exception.message, expected_context_manager.exception.message)
+
+def test_compiled_tree_fallback_distributions():
+  tree = copy.deepcopy(valid_data.VALID_DECISION_TREE_V2)
+  tree["configuration"]["deactivate_missing_values"] = False
+  context = {"presence": "robert", "lightIntensity": None, "time": 8, "tz": "+01:00"}
+  expected = Interpreter.decide(tree, [dict(context)])
+  for engine in ENGINES:
+    # The distributions used when no child matches are computed once, each decision has a copy
+    compiled_tree = Interpreter.compile(tree, engine)
+    for kwargs in [{}, {"lazy": True}]:
+      decision = compiled_tree.decide(dict(context), **kwargs)
+      if kwargs:
+        decision = decision.to_dict()
+      decision["output"]["lightbulbColor"]["distribution"].append(1)
+      assert_equal(compiled_tree.decide(dict(context)), expected)
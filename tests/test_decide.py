@@ -3,6 +3,8 @@ import os
 
 from nose.tools import assert_raises, assert_equal
 from craftai import Client, Interpreter, Time, errors as craft_err
+from craftai.compiled_tree import ENGINES
+from craftai.trees import context_plan
 
 from . import settings
 
@@ -42,7 +44,58 @@ def interpreter_tests_generator():
 
           yield test_fn, tree, expectation
 
-def check_expectation(tree, expectation):
+def compiled_interpreter_tests_generator():
+  for engine in ENGINES:
+    for _, tree, expectation in interpreter_tests_generator():
+#pylint: disable=W0108
+      test_fn = lambda t, e, engine=engine: check_expectation(t, e, compiled_decide(engine))
+#pylint: enable=W0108
+
+      test_fn.description = "compiled {} - {}".format(
+        engine, interpreter_tests_generator.compat_func_name)
+      compiled_interpreter_tests_generator.compat_func_name = test_fn.description
+
+      yield test_fn, tree, expectation
+
+def lean_interpreter_tests_generator():
+  for engine in [None] + ENGINES:
+    for _, tree, expectation in interpreter_tests_generator():
+      if not expectation.get("error"):
+        # Without explanations, only the predicted values and confidences are given
+        expected_output = expectation["output"]
+        expectation = dict(expectation, output={
+          "output": {
+            output: {
+              "predicted_value": output_decision["predicted_value"],
+              "confidence": output_decision["confidence"]
+            }
+            for output, output_decision in expected_output["output"].items()
+          },
+          "_version": expected_output["_version"]
+        })
+#pylint: disable=W0108
+      test_fn = lambda t, e, engine=engine: check_expectation(t, e, lean_decide(engine))
+#pylint: enable=W0108
+
+      test_fn.description = "lean {} - {}".format(
+        engine or "interpreter", interpreter_tests_generator.compat_func_name)
+      lean_interpreter_tests_generator.compat_func_name = test_fn.description
+
+      yield test_fn, tree, expectation
+
+def compiled_decide(engine):
+  def decide(tree, *args):
+    return Interpreter.compile(tree, engine).decide(*args)
+  return decide
+
+def lean_decide(engine):
+  def decide(tree, *args):
+    if engine is None:
+      return Interpreter.decide(tree, args, explain=False)
+    return Interpreter.compile(tree, engine).decide(*args, explain=False)
+  return decide
+
+def check_expectation(tree, expectation, decide=CLIENT.decide):
   exp_context = expectation["context"]
   timestamp = None
   exp_time = expectation.get("time")
@@ -53,7 +106,7 @@ def check_expectation(tree, expectation):
 
   if expectation.get("error"):
     with assert_raises(craft_err.CraftAiDecisionError) as context_manager:
-      CLIENT.decide(tree, exp_context, timestamp)
+      decide(tree, exp_context, timestamp)
 
     exception = context_manager.exception
     expected_message = ""
@@ -64,7 +117,7 @@ def check_expectation(tree, expectation):
     assert_equal(exception.message, expected_message)
   else:
     expected_decision = expectation["output"]
-    decision = CLIENT.decide(tree, exp_context, time)
+    decision = decide(tree, exp_context, time)
     assert_equal(decision, expected_decision)
 
 def test_rebuild_context():
@@ -109,3 +162,33 @@ def test_rebuild_context():
 
   for output in expected_context:
     assert_equal(rebuilt_context[output], expected_context[output])
+
+def test_context_plan():
+  configuration = {
+    "context": {
+      "car": {
+        "type": "enum"
+      },
+      "speed": {
+        "type": "continuous"
+      },
+      "day_of_week": {
+        "type": "day_of_week",
+        "is_generated": False
+      },
+      "month_of_year": {
+        "type": "month_of_year"
+      },
+      "time": {
+        "type": "time_of_day",
+        "is_generated": True
+      }
+    },
+    "output": ["speed"]
+  }
+
+  context_properties, generated_properties = context_plan(configuration)
+
+  assert_equal(sorted(context_properties), ["car", "day_of_week", "month_of_year", "time"])
+  assert_equal(sorted(generated_properties),
+               [("month_of_year", "month_of_year"), ("time", "time_of_day")])
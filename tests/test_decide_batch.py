@@ -0,0 +1,115 @@
+from nose.tools import assert_equal, assert_raises, assert_true
+import numpy as np
+
+from craftai import Interpreter, Time, errors as craft_err
+from craftai.batch import time_features
+
+from .data import valid_data
+
+def contexts_columns(contexts):
+  return {
+    key: [context.get(key) for context in contexts]
+    for key in contexts[0]
+  }
+
+def test_decide_batch():
+  tree = valid_data.VALID_DECISION_TREE_V2
+  contexts = valid_data.VALID_DECISION_TREE_V2_CONTEXTS
+  decisions = Interpreter.decide_batch(tree, contexts_columns(contexts))
+
+  assert_equal(decisions["_version"], "2.0.0")
+  output = decisions["output"]["lightbulbColor"]
+  for index, context in enumerate(contexts):
+    expected = Interpreter.decide(tree, [dict(context)])["output"]["lightbulbColor"]
+    assert_equal(output["predicted_value"][index], expected["predicted_value"])
+    assert_equal(output["nb_samples"][index], expected["nb_samples"])
+    assert_equal(output["distribution"][index].tolist(), expected["distribution"])
+    if expected["confidence"] is None:
+      assert_true(np.isnan(output["confidence"][index]))
+    else:
+      assert_equal(output["confidence"][index], expected["confidence"])
+    assert_equal(output["error"][index], None)
+
+def test_decide_batch_null_decisions():
+  tree = dict(valid_data.VALID_DECISION_TREE_V2)
+  tree["configuration"] = dict(tree["configuration"], deactivate_missing_values=True)
+  contexts = [
+    {"presence": "robert", "lightIntensity": 0.2, "time": 8, "tz": "+01:00"},
+    {"presence": "paul", "lightIntensity": 0.7, "time": 8, "tz": 1}
+  ]
+  output = Interpreter.decide_batch(tree, contexts_columns(contexts))["output"]["lightbulbColor"]
+
+  assert_equal(output["predicted_value"].tolist(), ["red", None])
+  assert_equal(output["error"][0], None)
+  with assert_raises(craft_err.CraftAiNullDecisionError) as context_manager:
+    Interpreter.decide(tree, [contexts[1]])
+  assert_equal(output["error"][1], context_manager.exception.message)
+
+def test_decide_batch_invalid_columns():
+  tree = dict(valid_data.VALID_DECISION_TREE_V2)
+  tree["configuration"] = dict(tree["configuration"], deactivate_missing_values=True)
+  columns = {
+    "presence": np.array(["robert", None], dtype=object),
+    "lightIntensity": np.array([0.2, 0.4]),
+    "time": np.array([8, 30]),
+    "tz": ["+01:00", "+01:00"]
+  }
+  with assert_raises(craft_err.CraftAiDecisionError) as context_manager:
+    Interpreter.decide_batch(tree, columns)
+  assert_equal(context_manager.exception.message,
+               "Unable to take decision, the given context is not valid: "
+               "expected property 'presence' is not defined, "
+               "'30' is not a valid value for property 'time' of type 'time_of_day'.")
+
+def test_decide_batch_invalid_columns_first_row():
+  tree = dict(valid_data.VALID_DECISION_TREE_V2)
+  tree["configuration"] = dict(tree["configuration"], deactivate_missing_values=True)
+  contexts = [
+    {"presence": "robert", "lightIntensity": 0.2, "time": 8, "tz": "+01:00"},
+    {"presence": "robert", "lightIntensity": 0.4, "time": 30, "tz": "+01:00"},
+    {"presence": None, "lightIntensity": 0.4, "time": 8, "tz": "+01:00"}
+  ]
+  # Only the first context that isn't valid is reported, as when deciding row by row
+  with assert_raises(craft_err.CraftAiDecisionError) as context_manager:
+    Interpreter.decide(tree, [contexts[1]])
+  expected_message = context_manager.exception.message
+  with assert_raises(craft_err.CraftAiDecisionError) as context_manager:
+    Interpreter.decide_batch(tree, contexts_columns(contexts))
+  assert_equal(context_manager.exception.message, expected_message)
+
+def test_decide_batch_v1_tree():
+  tree = valid_data.VALID_DECISION_TREE_V1
+  contexts = valid_data.VALID_DECISION_TREE_V1_CONTEXTS
+  decisions = Interpreter.decide_batch(tree, contexts_columns(contexts))
+
+  assert_equal(decisions["_version"], "1.1.0")
+  output = decisions["output"]["lightbulbIntensity"]
+  # V1 decisions have neither samples count nor distribution
+  assert_equal(sorted(output), ["confidence", "error", "predicted_value", "standard_deviation"])
+  for index, context in enumerate(contexts):
+    try:
+      expected = Interpreter.decide(tree, [dict(context)])["output"]["lightbulbIntensity"]
+    except craft_err.CraftAiNullDecisionError as e:
+      assert_equal(output["error"][index], e.message)
+      continue
+    assert_equal(output["predicted_value"][index], expected["predicted_value"])
+    assert_equal(output["confidence"][index], expected["confidence"])
+    if "standard_deviation" in expected:
+      assert_equal(output["standard_deviation"][index], expected["standard_deviation"])
+    else:
+      assert_true(np.isnan(output["standard_deviation"][index]))
+    assert_equal(output["error"][index], None)
+
+def test_time_features():
+  timestamps = np.array([1465496929, 0, -1, 230536800], dtype=np.int64)
+  for timezones in ["+10:00", "CST", 2, -120, ["+10:00", -5, "+0530", 840]]:
+    features = time_features(timestamps, timezones)
+    for index, timestamp in enumerate(timestamps.tolist()):
+      timezone = timezones[index] if isinstance(timezones, list) else timezones
+      time = Time(timestamp, timezone).to_dict()
+      for time_type in ["time_of_day", "day_of_week", "day_of_month", "month_of_year",
+                        "timezone"]:
+        assert_equal(features[time_type][index], time[time_type])
+
+  assert_raises(craft_err.CraftAiTimeError, time_features, timestamps, "+25:00")
+  assert_raises(craft_err.CraftAiTimeError, time_features, timestamps.astype(float), "+01:00")
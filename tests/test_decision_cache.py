@@ -0,0 +1,59 @@
+from nose.tools import assert_equal, assert_raises
+
+from craftai import DecisionCache, Interpreter, errors as craft_err
+
+from .data import valid_data
+
+def test_decision_cache_decisions():
+  tree = valid_data.VALID_DECISION_TREE_V2
+  cache = DecisionCache()
+  for _ in range(2):
+    for context in valid_data.VALID_DECISION_TREE_V2_CONTEXTS:
+      assert_equal(cache.decide(tree, [dict(context)]), Interpreter.decide(tree, [dict(context)]))
+  contexts_count = len(valid_data.VALID_DECISION_TREE_V2_CONTEXTS)
+  assert_equal(cache.info(), {
+    "hits": contexts_count,
+    "misses": contexts_count,
+    "size": contexts_count,
+    "max_size": 1024
+  })
+
+def test_decision_cache_results_are_copies():
+  tree = valid_data.VALID_DECISION_TREE_V2
+  context = valid_data.VALID_DECISION_TREE_V2_CONTEXTS[0]
+  cache = DecisionCache()
+  decision = cache.decide(tree, [dict(context)])
+  decision["output"]["lightbulbColor"]["decision_rules"][0]["operand"] = None
+  decision["output"]["lightbulbColor"]["predicted_value"] = None
+  assert_equal(cache.decide(tree, [dict(context)]), Interpreter.decide(tree, [dict(context)]))
+
+def test_decision_cache_lru_eviction():
+  tree = valid_data.VALID_DECISION_TREE_V2
+  contexts = valid_data.VALID_DECISION_TREE_V2_CONTEXTS
+  cache = DecisionCache(max_size=2)
+  cache.decide(tree, [dict(contexts[0])])
+  cache.decide(tree, [dict(contexts[1])])
+  cache.decide(tree, [dict(contexts[0])])
+  cache.decide(tree, [dict(contexts[2])])
+  assert_equal(len(cache), 2)
+  # contexts[1] was the least recently used
+  cache.decide(tree, [dict(contexts[0])])
+  cache.decide(tree, [dict(contexts[1])])
+  assert_equal((cache.hits, cache.misses), (2, 4))
+
+def test_decision_cache_quantization():
+  tree = valid_data.VALID_DECISION_TREE_V2
+  cache = DecisionCache(quantize=True)
+  for light_intensity in [0.1, 0.2, 0.3, 0.7, 0.9]:
+    context = {"presence": "robert", "lightIntensity": light_intensity, "time": 8, "tz": "+01:00"}
+    assert_equal(cache.decide(tree, [dict(context)]), Interpreter.decide(tree, [dict(context)]))
+  # Each side of the 0.5 threshold
+  assert_equal((cache.hits, cache.misses), (3, 2))
+
+def test_decision_cache_errors():
+  tree = valid_data.VALID_DECISION_TREE_V2
+  context = {"presence": "robert", "lightIntensity": "bright", "time": 8, "tz": "+01:00"}
+  cache = DecisionCache()
+  for _ in range(2):
+    assert_raises(craft_err.CraftAiDecisionError, cache.decide, tree, [dict(context)])
+  assert_equal((cache.hits, cache.misses), (1, 1))
@@ -0,0 +1,139 @@
+import copy
+import os
+import shutil
+import tempfile
+
+from nose.tools import assert_equal, assert_false, assert_is_instance, assert_raises
+import numpy as np
+
+from craftai import Interpreter, errors as craft_err
+from craftai.compiled_tree import CompiledTree
+from craftai.flat_tree import FlatTree, INVALID_OPERATOR_CODE, OPERATOR_CODES
+from craftai.interpreter_v2 import InterpreterV2
+
+from .data import valid_data
+
+def test_flat_tree_layout():
+  bare_tree = valid_data.VALID_DECISION_TREE_V2["trees"]["lightbulbColor"]
+  flat_tree = FlatTree(bare_tree, "enum")
+
+  assert_equal(flat_tree.nodes_count, 7)
+  assert_equal(flat_tree.properties, ["presence", "time", "lightIntensity"])
+  # Breadth first layout, the children of a node are contiguous
+  assert_equal(flat_tree.first_child.tolist(), [1, 3, 5, -1, -1, -1, -1])
+  assert_equal(flat_tree.children_count.tolist(), [2, 2, 2, 0, 0, 0, 0])
+  assert_equal(flat_tree.leaf_index.tolist(), [-1, -1, -1, 0, 1, 2, 3])
+  assert_equal(flat_tree.operator[1:3].tolist(), [OPERATOR_CODES["in"], OPERATOR_CODES["is"]])
+  assert_equal(flat_tree.operand_low[3:5].tolist(), [20., 7.])
+  assert_equal(flat_tree.operand_high[3:5].tolist(), [7., 20.])
+  assert_equal(flat_tree.leaf_distribution.shape, (4, 3))
+  assert_equal(flat_tree.leaf_nb_samples.dtype, np.int64)
+
+def _index_nodes(flat_tree):
+  # The nodes are indexed when they are first reached
+  for node in range(flat_tree.nodes_count):
+    if flat_tree.children_count[node]:
+#pylint: disable=W0212
+      flat_tree._index_children(node)
+#pylint: enable=W0212
+
+def test_flat_tree_children_index():
+  bare_tree = valid_data.VALID_DECISION_TREE_V2["trees"]["lightbulbColor"]
+  flat_tree = FlatTree(bare_tree, "enum")
+  _index_nodes(flat_tree)
+
+  # Only the root splits on enum values, the first matching child is indexed
+  assert_equal(flat_tree.children_index[0], {"gisele": 1, "none": 1, "robert": 2})
+  assert_equal(flat_tree.children_index[1:3], [None] * 2)
+
+def test_flat_tree_children_bounds():
+  bare_tree = valid_data.VALID_DECISION_TREE_V2["trees"]["lightbulbColor"]
+  flat_tree = FlatTree(bare_tree, "enum")
+  _index_nodes(flat_tree)
+
+  assert_equal(flat_tree.children_bounds[0], None)
+  # [20, 7[ is a cyclic interval, it matches the values before 7 and from 20
+  assert_equal(flat_tree.children_bounds[1], ([7, 20], [3, 4, 3]))
+  assert_equal(flat_tree.children_bounds[2], ([0.5], [5, 6]))
+  assert_equal(flat_tree.children_bounds[3:], [None] * 4)
+
+def test_flat_engine_decisions():
+  tree = valid_data.VALID_DECISION_TREE_V2
+  compiled_tree = Interpreter.compile(tree, "flat")
+  for context in valid_data.VALID_DECISION_TREE_V2_CONTEXTS:
+    assert_equal(compiled_tree.decide(dict(context)),
+                 Interpreter.decide(tree, [dict(context)]))
+
+def test_flat_engine_v1_trees():
+  tree = valid_data.VALID_DECISION_TREE_V1
+  compiled_tree = Interpreter.compile(tree, "flat")
+  for context in valid_data.VALID_DECISION_TREE_V1_CONTEXTS:
+    if context["presence"] == "paul":
+      assert_raises(craft_err.CraftAiNullDecisionError, compiled_tree.decide, dict(context))
+      continue
+    assert_equal(compiled_tree.decide(dict(context)),
+                 Interpreter.decide(tree, [dict(context)]))
+
+def test_flat_tree_v1_operators():
+  bare_tree = {
+    "children": [
+      {
+        "decision_rule": {"property": "presence", "operator": "in", "operand": ["robert"]},
+        "predicted_value": "red",
+        "confidence": 0.5
+      }
+    ]
+  }
+  flat_tree = FlatTree(bare_tree, "enum", major=1)
+  # `in` is only an operator of V2 trees
+  assert_equal(flat_tree.operator[1], INVALID_OPERATOR_CODE)
+  with assert_raises(craft_err.CraftAiDecisionError) as context_manager:
+    flat_tree.decide({"presence": "robert"})
+  assert_equal(context_manager.exception.message,
+               "Invalid decision tree format, in is not a valid decision operator.")
+
+def test_flat_tree_fallbacks():
+  bare_tree = valid_data.VALID_DECISION_TREE_V2["trees"]["lightbulbColor"]
+  flat_tree = FlatTree(bare_tree, "enum", False)
+
+  expected = InterpreterV2.compute_distribution(bare_tree, bare_tree["output_values"], "enum")
+  del expected["decision_rules"]
+  assert_equal(flat_tree.fallbacks[0], expected)
+  # Leaves have no fallback
+  assert_equal(flat_tree.fallbacks[3:], [None] * 4)
+
+def test_flat_engine_save_and_load():
+  tree = valid_data.VALID_DECISION_TREE_V2
+  directory = tempfile.mkdtemp()
+  try:
+    path = os.path.join(directory, "lightbulb_tree.bin")
+    Interpreter.compile(tree, "flat").save(path)
+    compiled_tree = CompiledTree.load(path)
+    # The arrays are views of the memory mapped file
+#pylint: disable=W0212
+    assert_false(compiled_tree._output_trees[0][1].feature.flags.owndata)
+#pylint: enable=W0212
+    for context in valid_data.VALID_DECISION_TREE_V2_CONTEXTS:
+      assert_equal(compiled_tree.decide(dict(context)),
+                   Interpreter.decide(tree, [dict(context)]))
+      assert_equal(compiled_tree.decide(dict(context), explain=False),
+                   Interpreter.decide(tree, [dict(context)], explain=False))
+  finally:
+    shutil.rmtree(directory)
+
+def test_flat_engine_integer_confidences():
+  tree = copy.deepcopy(valid_data.VALID_DECISION_TREE_V2)
+  tree["trees"]["lightbulbColor"]["children"][0]["children"][0]["prediction"]["confidence"] = 1
+  context = {"presence": "gisele", "lightIntensity": 0.1, "time": 22.5, "tz": "+02:00"}
+  directory = tempfile.mkdtemp()
+  try:
+    path = os.path.join(directory, "lightbulb_tree.bin")
+    Interpreter.compile(tree, "flat").save(path)
+    for compiled_tree in [Interpreter.compile(tree, "flat"), CompiledTree.load(path)]:
+      # Integer confidences aren't turned into floats
+      for explain in [True, False]:
+        decision = compiled_tree.decide(dict(context), explain=explain)
+        assert_is_instance(decision["output"]["lightbulbColor"]["confidence"], int)
+        assert_equal(decision, Interpreter.decide(tree, [dict(context)], explain=explain))
+  finally:
+    shutil.rmtree(directory)
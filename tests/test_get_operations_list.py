@@ -66,6 +66,29 @@ class TestGetOperationsListSuccess(unittest.TestCase):
     self.assertIsInstance(ops, list)
     self.assertEqual(ops, [])
 
+  def test_iter_operations(self):
+    lower_bound = 1462824549
+    ops = self.client.iter_operations(self.agent_id, lower_bound)
+    self.assertNotIsInstance(ops, list)
+    expected_ops = [op for op in LARGE_VALID_OPERATIONS_SET if op["timestamp"] >= lower_bound]
+    self.assertEqual(list(ops), expected_ops)
+
+  def test_iter_operations_pages(self):
+    pages = list(self.client.iter_operations(self.agent_id, pages=True))
+    self.assertTrue(all(isinstance(page, list) for page in pages))
+    self.assertEqual([op for page in pages for op in page], LARGE_VALID_OPERATIONS_SET)
+
+  def test_iter_operations_prefetch(self):
+    ops = self.client.iter_operations(self.agent_id, prefetch=2)
+    self.assertEqual(list(ops), LARGE_VALID_OPERATIONS_SET)
+
+  def test_get_operations_list_windows(self):
+    ops = self.client.get_operations_list(self.agent_id, windows=4)
+    self.assertEqual(ops, LARGE_VALID_OPERATIONS_SET)
+    lower_bound = 1462824549
+    ops = self.client.get_operations_list(self.agent_id, lower_bound, windows=3)
+    self.assertEqual(ops, self.client.get_operations_list(self.agent_id, lower_bound))
+
 class TestGetOperationsListFailure(unittest.TestCase):
   @classmethod
   def setUpClass(cls):
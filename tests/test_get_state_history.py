@@ -434,6 +434,25 @@ class TestGetStateHistorySuccess(unittest.TestCase):
       }
     ])
 
+  def test_iter_state_history(self):
+    states = self.client.iter_state_history(self.agent_id)
+    self.assertNotIsInstance(states, list)
+    self.assertEqual(list(states), self.client.get_state_history(self.agent_id))
+
+  def test_iter_state_history_pages(self):
+    pages = list(self.client.iter_state_history(self.agent_id, pages=True))
+    self.assertTrue(all(isinstance(page, list) for page in pages))
+    self.assertEqual([state for page in pages for state in page],
+                     self.client.get_state_history(self.agent_id))
+
+  def test_iter_state_history_prefetch(self):
+    states = self.client.iter_state_history(self.agent_id, prefetch=2)
+    self.assertEqual(list(states), self.client.get_state_history(self.agent_id))
+
+  def test_get_state_history_windows(self):
+    self.assertEqual(self.client.get_state_history(self.agent_id, windows=4),
+                     self.client.get_state_history(self.agent_id))
+
 class TestGetOperationsListFailure(unittest.TestCase):
   @classmethod
   def setUpClass(cls):
@@ -456,3 +475,11 @@ class TestGetOperationsListFailure(unittest.TestCase):
         craftai.errors.CraftAiBadRequestError,
         self.client.get_state_history,
         invalid_data.UNDEFINED_KEY[empty_id])
+
+  def test_iter_state_history_with_invalid_id(self):
+    for empty_id in invalid_data.UNDEFINED_KEY:
+      # The agent id is checked before iterating
+      self.assertRaises(
+        craftai.errors.CraftAiBadRequestError,
+        self.client.iter_state_history,
+        invalid_data.UNDEFINED_KEY[empty_id])
@@ -7,6 +7,7 @@ from nose.tools import assert_equal, assert_raises, with_setup
 import craftai.pandas
 
 from . import settings
+from .data import valid_data
 
 AGENT_ID = "test_pandas_" + settings.RUN_ID
 SIMPLE_AGENT_CONFIGURATION = {
@@ -336,6 +337,160 @@ def test_datetime_decide_from_contexts_df():
   assert_equal(len(df.dtypes), 3)
   assert_equal(df["b_predicted_value"].tolist(), ["Pierre", "Paul", "Jacques"])
 
+def test_decide_from_contexts_df_v2_tree():
+  tree = valid_data.VALID_DECISION_TREE_V2
+  contexts = valid_data.VALID_DECISION_TREE_V2_CONTEXTS
+  test_df = pd.DataFrame(
+    [[context["presence"], context["lightIntensity"]] for context in contexts],
+    columns=["presence", "lightIntensity"],
+    index=pd.date_range("20130101 00:00:00", periods=len(contexts), freq="H").tz_localize("UTC"))
+
+  df = CLIENT.decide_from_contexts_df(tree, test_df)
+  assert_equal(len(df), len(contexts))
+  assert_equal(df["lightbulbColor_confidence"].dtype, np.float64)
+  assert_equal(df["lightbulbColor_predicted_value"].cat.categories.tolist(),
+               ["black", "green", "red"])
+
+  for index, context in enumerate(contexts):
+    time = craftai.Time(test_df.index[index].value // 10 ** 9, "+00:00")
+    context = {key: context[key] for key in ["presence", "lightIntensity"]
+               if context[key] is not None}
+    context["tz"] = "+0000"
+    expected = CLIENT.decide(tree, context, time)["output"]["lightbulbColor"]
+    assert_equal(df["lightbulbColor_predicted_value"].iloc[index], expected["predicted_value"])
+    assert_equal(df["lightbulbColor_nb_samples"].iloc[index], expected["nb_samples"])
+    assert_equal(df["lightbulbColor_decision_rules"].iloc[index], expected["decision_rules"])
+
+def test_decide_from_contexts_df_v1_tree():
+  tree = valid_data.VALID_DECISION_TREE_V1
+  contexts = valid_data.VALID_DECISION_TREE_V1_CONTEXTS
+  test_df = pd.DataFrame(
+    [[context["presence"], context["lightIntensity"]] for context in contexts],
+    columns=["presence", "lightIntensity"],
+    index=pd.date_range("20130101 00:00:00", periods=len(contexts), freq="H").tz_localize("UTC"))
+
+  df = CLIENT.decide_from_contexts_df(tree, test_df)
+  assert_equal(df.columns.tolist(), [
+    "error", "lightbulbIntensity_confidence", "lightbulbIntensity_decision_rules",
+    "lightbulbIntensity_predicted_value", "lightbulbIntensity_standard_deviation"
+  ])
+
+  for index, context in enumerate(contexts):
+    time = craftai.Time(test_df.index[index].value // 10 ** 9, "+00:00")
+    context = {key: context[key] for key in ["presence", "lightIntensity"]}
+    context["tz"] = "+0000"
+    try:
+      expected = CLIENT.decide(tree, context, time)["output"]["lightbulbIntensity"]
+    except craftai.pandas.errors.CraftAiNullDecisionError as e:
+      assert_equal(df["error"].iloc[index], e.message)
+      continue
+    assert pd.isnull(df["error"].iloc[index])
+    assert_equal(df["lightbulbIntensity_predicted_value"].iloc[index],
+                 expected["predicted_value"])
+    assert_equal(df["lightbulbIntensity_decision_rules"].iloc[index],
+                 expected["decision_rules"])
+
+REGRESSION_TREE_V2 = {
+  "_version": "2.0.0",
+  "configuration": {
+    "context": {
+      "speed": {"type": "continuous"},
+      "duration": {"type": "continuous"}
+    },
+    "output": ["duration"],
+    "time_quantum": 100,
+    "learning_period": 1500000
+  },
+  "trees": {
+    "duration": {
+      "children": [
+        {
+          "decision_rule": {"property": "speed", "operator": "<", "operand": 1},
+          "prediction": {"value": 2.5, "confidence": 0.9, "nb_samples": 4,
+                         "distribution": {"standard_deviation": 0}}
+        },
+        {
+          "decision_rule": {"property": "speed", "operator": "[in[", "operand": [1, 2]},
+          "prediction": {"value": 3.5, "confidence": 0.6, "nb_samples": 3,
+                         "distribution": {"standard_deviation": 1.5}}
+        },
+        {
+          "decision_rule": {"property": "speed", "operator": ">=", "operand": 2},
+          "prediction": {"value": None, "confidence": 0, "nb_samples": 0,
+                         "distribution": {}}
+        }
+      ]
+    }
+  }
+}
+
+def decide_rows(tree, contexts_df):
+  # The decisions taken on each row with `Interpreter.decide`, as the rows' DataFrame
+  rows = []
+  for timestamp, row in contexts_df.iterrows():
+    context = {key: value for key, value in row.items() if not pd.isnull(value)}
+    time = craftai.Time(timestamp.value // 10 ** 9, "+00:00")
+    try:
+      decision = craftai.Interpreter.decide(tree, [context, time])
+    except craftai.pandas.errors.CraftAiNullDecisionError as e:
+      rows.append({"error": e.message})
+      continue
+    rows.append({
+      output + "_" + key: value
+      for output, output_decision in decision["output"].items()
+      for key, value in output_decision.items()
+    })
+  return rows
+
+def check_decide_rows(tree, contexts_df):
+  df = CLIENT.decide_from_contexts_df(tree, contexts_df)
+  rows = decide_rows(tree, contexts_df)
+  assert_equal(df.columns.tolist(), sorted(set(key for row in rows for key in row)))
+  for index, row in enumerate(rows):
+    for column in df.columns:
+      if column in row:
+        assert_equal(df[column].iloc[index], row[column])
+      else:
+        assert pd.isnull(df[column].iloc[index])
+  # The partitions' decisions are concatenated as if they were taken at once
+  pd.testing.assert_frame_equal(CLIENT.decide_from_contexts_df(tree, contexts_df, n_jobs=2), df)
+
+def test_decide_from_contexts_df_regression_tree():
+  index = pd.date_range("20130101 00:00:00", periods=4, freq="H").tz_localize("UTC")
+  check_decide_rows(REGRESSION_TREE_V2,
+                    pd.DataFrame({"speed": [0.5, 1.5, 3, 0.2]}, index=index))
+  # Without any decision, only the errors are given
+  check_decide_rows(REGRESSION_TREE_V2, pd.DataFrame({"speed": [3, 4]}, index=index[:2]))
+  # Distributions without standard deviation are given as the decisions give them
+  check_decide_rows(REGRESSION_TREE_V2, pd.DataFrame({"speed": [0.5, 3]}, index=index[:2]))
+
+def test_decide_from_contexts_df_n_jobs():
+  tree = valid_data.VALID_DECISION_TREE_V2
+  contexts = valid_data.VALID_DECISION_TREE_V2_CONTEXTS
+  test_df = pd.DataFrame(
+    [[context["presence"], context["lightIntensity"], context["tz"]] for context in contexts],
+    columns=["presence", "lightIntensity", "tz"],
+    index=pd.date_range("20130101 00:00:00", periods=len(contexts), freq="H").tz_localize("UTC"))
+
+  df = CLIENT.decide_from_contexts_df(tree, test_df)
+  pd.testing.assert_frame_equal(CLIENT.decide_from_contexts_df(tree, test_df, n_jobs=2), df)
+
+def test_decide_from_contexts_df_n_jobs_errors():
+  tree = valid_data.VALID_DECISION_TREE_V2
+  test_df = pd.DataFrame(
+    [["robert", 0.2, "+01:00"], ["robert", "dark", "+01:00"],
+     ["robert", 0.2, "+01:00"], [3, 0.2, "+01:00"]],
+    columns=["presence", "lightIntensity", "tz"],
+    index=pd.date_range("20130101 00:00:00", periods=4, freq="H").tz_localize("UTC"))
+
+  with assert_raises(craftai.pandas.errors.CraftAiDecisionError) as context_manager:
+    CLIENT.decide_from_contexts_df(tree, test_df)
+  # The error is the one of the first invalid row, whatever partition fails first
+  for n_jobs in [2, 4]:
+    with assert_raises(craftai.pandas.errors.CraftAiDecisionError) as jobs_context_manager:
+      CLIENT.decide_from_contexts_df(tree, test_df, n_jobs=n_jobs)
+    assert_equal(jobs_context_manager.exception.message, context_manager.exception.message)
+
 @with_setup(setup_simple_agent_with_data, teardown)
 def test_tree_visualization():
   tree1 = CLIENT.get_decision_tree(AGENT_ID,
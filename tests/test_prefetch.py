@@ -0,0 +1,66 @@
+import threading
+import time
+
+from nose.tools import assert_equal, assert_raises, assert_true
+
+from craftai.errors import CraftAiNetworkError
+from craftai.prefetch import iter_prefetched
+
+#pylint: disable=R0903
+class Pages(object):
+  def __init__(self, count, error=False):
+    self.count = count
+    self.error = error
+    self.retrieved = 0
+    self.done = threading.Event()
+
+  def __iter__(self):
+    try:
+      for page in range(self.count):
+        self.retrieved += 1
+        yield [page]
+      if self.error:
+        raise CraftAiNetworkError("""Unable to retrieve the next page.""")
+    finally:
+      self.done.set()
+#pylint: enable=R0903
+
+def wait_for(condition, timeout=5):
+  deadline = time.time() + timeout
+  while not condition() and time.time() < deadline:
+    time.sleep(0.01)
+  return condition()
+
+def test_iter_prefetched_order():
+  assert_equal(list(iter_prefetched(Pages(10), 3)), [[page] for page in range(10)])
+  assert_equal(list(iter_prefetched(Pages(10), 0)), [[page] for page in range(10)])
+
+def test_iter_prefetched_bounded_depth():
+  pages = Pages(100)
+  prefetched = iter_prefetched(pages, 2)
+  assert_equal(next(prefetched), [0])
+  # Two pages waiting to be consumed, the next one isn't retrieved until one of them is
+  assert_true(wait_for(lambda: pages.retrieved == 3))
+  time.sleep(0.2)
+  assert_equal(pages.retrieved, 3)
+  assert_equal(next(prefetched), [1])
+  assert_true(wait_for(lambda: pages.retrieved == 4))
+  time.sleep(0.2)
+  assert_equal(pages.retrieved, 4)
+  prefetched.close()
+  assert_true(pages.done.wait(5))
+
+def test_iter_prefetched_errors():
+  prefetched = iter_prefetched(Pages(2, error=True), 1)
+  assert_equal(next(prefetched), [0])
+  assert_equal(next(prefetched), [1])
+  assert_raises(CraftAiNetworkError, next, prefetched)
+
+def test_iter_prefetched_abandoned():
+  pages = Pages(1000)
+  for page in iter_prefetched(pages, 1):
+    if page == [2]:
+      break
+  # The background retrieval stops
+  assert_true(pages.done.wait(5))
+  assert_true(pages.retrieved < 10)
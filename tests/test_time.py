@@ -4,6 +4,7 @@ import pytz
 
 from craftai import Time
 from craftai.errors import CraftAiTimeError
+from craftai.timezones import timezone_offset_in_sec
 
 
 class TestTime(unittest.TestCase):
@@ -51,3 +52,15 @@ class TestTime(unittest.TestCase):
     #Invalid UTC offset
     self.assertRaises(CraftAiTimeError, Time, "2011-04-22 01:00:00+0900", -950)
     self.assertRaises(CraftAiTimeError, Time, "2011-04-22 01:00:00+0900", 950)
+
+  def test_from_epoch(self):
+    for timestamp in [1465496929, 0, -1, 230536800, 4102444799]:
+      for timezone in ["+10:00", "-05:30", "CST", "+00:00", 120, -2]:
+        self.assertEqual(
+          Time.from_epoch(timestamp, timezone_offset_in_sec(timezone)).to_dict(),
+          Time(timestamp, timezone).to_dict()
+        )
+      self.assertEqual(Time.from_epoch(timestamp).to_dict(), Time(timestamp).to_dict())
+    self.assertRaises(CraftAiTimeError, Time.from_epoch, 1465496929.5, 0)
+    self.assertRaises(CraftAiTimeError, Time.from_epoch, 1465496929, 30)
+    self.assertRaises(CraftAiTimeError, Time.from_epoch, 1465496929, 24 * 60 * 60)
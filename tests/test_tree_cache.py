@@ -0,0 +1,178 @@
+import threading
+import time
+
+from nose.tools import assert_equal, assert_is, assert_raises
+
+from craftai.errors import CraftAiNetworkError
+from craftai.tree_cache import TreeCache
+
+#pylint: disable=R0903
+class FakeClock(object):
+  def __init__(self):
+    self.now = 0
+
+  def __call__(self):
+    return self.now
+#pylint: enable=R0903
+
+def retriever(trees):
+  def retrieve():
+    trees.append({"_version": "2.0.0", "index": len(trees)})
+    return trees[-1]
+  return retrieve
+
+def test_tree_cache_ttl():
+  clock = FakeClock()
+  cache = TreeCache(ttl=10, clock=clock)
+  trees = []
+  tree = cache.get("agent", None, "2", retriever(trees))
+  clock.now = 9
+  assert_is(cache.get("agent", None, "2", retriever(trees)), tree)
+  clock.now = 10
+  assert_equal(cache.get("agent", None, "2", retriever(trees))["index"], 1)
+  assert_equal(cache.info(), {
+    "hits": 1,
+    "stale_hits": 0,
+    "misses": 2,
+    "evictions": 0,
+    "refresh_errors": 0,
+    "size": 1,
+    "max_size": 128
+  })
+
+def test_tree_cache_past_timestamps():
+  clock = FakeClock()
+  cache = TreeCache(ttl=10, clock=clock)
+  trees = []
+  tree = cache.get("agent", 1464600256, "2", retriever(trees))
+  clock.now = 1000
+  assert_is(cache.get("agent", 1464600256, "2", retriever(trees)), tree)
+  assert_equal(len(trees), 1)
+
+def test_tree_cache_lru_eviction():
+  cache = TreeCache(max_size=2)
+  trees = []
+  for timestamp in [None, 1, None, 2]:
+    cache.get("agent", timestamp, "2", retriever(trees))
+  assert_equal(len(cache), 2)
+  # The tree of the timestamp 1 was the least recently used
+  cache.get("agent", 1, "2", retriever(trees))
+  assert_equal(len(trees), 4)
+  assert_equal((cache.hits, cache.misses, cache.evictions), (1, 4, 2))
+
+def test_tree_cache_stale_while_revalidate():
+  clock = FakeClock()
+  cache = TreeCache(ttl=10, stale_while_revalidate=5, clock=clock)
+  trees = []
+  tree = cache.get("agent", None, "2", retriever(trees))
+  clock.now = 12
+
+  refreshed = threading.Event()
+  def retrieve():
+    tree = retriever(trees)()
+    refreshed.set()
+    return tree
+  assert_is(cache.get("agent", None, "2", retrieve), tree)
+  refreshed.wait(5)
+  for _ in range(100):
+#pylint: disable=W0212
+    if not cache._retrievals:
+#pylint: enable=W0212
+      break
+    time.sleep(0.01)
+  assert_equal(cache.get("agent", None, "2", retriever(trees))["index"], 1)
+  assert_equal((cache.hits, cache.stale_hits, cache.misses), (1, 1, 1))
+
+def test_tree_cache_invalidation():
+  cache = TreeCache()
+  trees = []
+  cache.get("agent", None, "2", retriever(trees))
+  cache.get("other_agent", None, "2", retriever(trees))
+  cache.invalidate("agent")
+  assert_equal(len(cache), 1)
+
+def test_tree_cache_errors():
+  cache = TreeCache()
+  def retrieve():
+    raise CraftAiNetworkError("unavailable")
+  assert_raises(CraftAiNetworkError, cache.get, "agent", None, "2", retrieve)
+  assert_equal(len(cache), 0)
+
+def test_tree_cache_invalidation_during_refresh():
+  clock = FakeClock()
+  cache = TreeCache(ttl=10, stale_while_revalidate=5, clock=clock)
+  trees = []
+  cache.get("agent", None, "2", retriever(trees))
+  clock.now = 12
+
+  started = threading.Event()
+  resume = threading.Event()
+  def retrieve():
+    started.set()
+    resume.wait(5)
+    return retriever(trees)()
+  cache.get("agent", None, "2", retrieve)
+  started.wait(5)
+  cache.invalidate("agent")
+  resume.set()
+  for _ in range(100):
+    if len(trees) == 2:
+      break
+    time.sleep(0.01)
+  time.sleep(0.05)
+  # The tree retrieved before the invalidation isn't cached
+  assert_equal(len(cache), 0)
+  assert_equal(cache.get("agent", None, "2", retriever(trees))["index"], 2)
+
+def test_tree_cache_concurrent_misses():
+  cache = TreeCache()
+  trees = []
+  resume = threading.Event()
+  def retrieve():
+    resume.wait(5)
+    return retriever(trees)()
+
+  results = []
+  def get():
+    results.append(cache.get("agent", None, "2", retrieve))
+  threads = [threading.Thread(target=get) for _ in range(5)]
+  for thread in threads:
+    thread.start()
+  for _ in range(100):
+    if cache.misses == 5:
+      break
+    time.sleep(0.01)
+  resume.set()
+  for thread in threads:
+    thread.join(5)
+  # A single retrieval shared by the misses
+  assert_equal(len(trees), 1)
+  assert_equal(len(results), 5)
+  for tree in results:
+    assert_is(tree, trees[0])
+
+def test_tree_cache_concurrent_misses_errors():
+  cache = TreeCache()
+  resume = threading.Event()
+  def retrieve():
+    resume.wait(5)
+    raise CraftAiNetworkError("unavailable")
+
+  errors = []
+  def get():
+    try:
+      cache.get("agent", None, "2", retrieve)
+    except CraftAiNetworkError as e:
+      errors.append(e)
+  threads = [threading.Thread(target=get) for _ in range(3)]
+  for thread in threads:
+    thread.start()
+  for _ in range(100):
+    if cache.misses == 3:
+      break
+    time.sleep(0.01)
+  resume.set()
+  for thread in threads:
+    thread.join(5)
+  assert_equal(len(errors), 3)
+  assert_equal(len(cache), 0)
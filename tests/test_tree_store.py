@@ -0,0 +1,170 @@
+from contextlib import contextmanager
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from nose.tools import assert_equal, assert_true
+
+from craftai import tree_store
+from craftai.tree_store import TreeStore
+
+from .data import valid_data
+
+@contextmanager
+def store_directory():
+  directory = tempfile.mkdtemp()
+  try:
+    yield directory
+  finally:
+    shutil.rmtree(directory)
+
+def retriever(retrievals, tree=None):
+  if tree is None:
+    tree = valid_data.VALID_DECISION_TREE_V2
+  def retrieve():
+    retrievals.append(tree)
+    return tree
+  return retrieve
+
+def objects_count(directory):
+  return sum(len(names) for _, _, names in os.walk(os.path.join(directory, "objects")))
+
+def age(directory):
+  """Make the stored files older than the grace period of the collections"""
+#pylint: disable=W0212
+  past = time.time() - 2 * tree_store._GRACE_PERIOD
+#pylint: enable=W0212
+  for root, _, names in os.walk(directory):
+    for name in names:
+      os.utime(os.path.join(root, name), (past, past))
+
+def test_tree_store_shares_the_stored_trees():
+  with store_directory() as directory:
+    retrievals = []
+    store = TreeStore(directory)
+    tree = store.get("agent", None, "2", retriever(retrievals))
+    other_store = TreeStore(directory)
+    assert_equal(other_store.get("agent", None, "2", retriever(retrievals)), tree)
+    assert_equal(len(retrievals), 1)
+
+    # The same tree is stored once
+    store.get("other_agent", None, "2", retriever(retrievals))
+    assert_equal(objects_count(directory), 1)
+
+def test_tree_store_single_retrieval():
+  with store_directory() as directory:
+    retrievals = []
+    def retrieve():
+      time.sleep(0.1)
+      return retriever(retrievals)()
+    threads = [
+      threading.Thread(target=TreeStore(directory).get, args=("agent", None, "2", retrieve))
+      for _ in range(4)
+    ]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    assert_equal(len(retrievals), 1)
+
+def test_tree_store_expiry():
+  with store_directory() as directory:
+    retrievals = []
+    store = TreeStore(directory, ttl=0)
+    store.get("agent", None, "2", retriever(retrievals))
+    store.get("agent", None, "2", retriever(retrievals))
+    # The trees of past timestamps don't expire
+    store.get("agent", 1464600256, "2", retriever(retrievals))
+    store.get("agent", 1464600256, "2", retriever(retrievals))
+    assert_equal(len(retrievals), 3)
+
+def test_tree_store_size_bound():
+  with store_directory() as directory:
+    retrievals = []
+    other_tree = dict(valid_data.VALID_DECISION_TREE_V2, _version="2.0.1")
+    store = TreeStore(directory, max_size=1)
+    store.get("agent", 1, "2", retriever(retrievals))
+    # Kept until the end of the grace period
+    assert_equal(objects_count(directory), 1)
+    age(directory)
+    store.collect()
+    assert_equal(objects_count(directory), 0)
+
+    store = TreeStore(directory)
+    store.get("agent", 1, "2", retriever(retrievals))
+    store.get("agent", 2, "1", retriever(retrievals, other_tree))
+    assert_equal(objects_count(directory), 2)
+#pylint: disable=W0212
+    store.max_size = os.path.getsize(store._object_path(
+      tree_store._read_entry(store._index_path("agent", 2, "1"))["hash"]))
+#pylint: enable=W0212
+    age(directory)
+    store.collect()
+    # The most recently stored tree is kept
+    assert_equal(objects_count(directory), 1)
+    assert_equal(store.get("agent", 2, "1", retriever(retrievals)), other_tree)
+    assert_equal(len(retrievals), 3)
+
+def test_tree_store_invalidation():
+  with store_directory() as directory:
+    retrievals = []
+    store = TreeStore(directory)
+    store.get("agent", 1, "2", retriever(retrievals))
+    store.invalidate("agent")
+    store.get("agent", 1, "2", retriever(retrievals))
+    assert_equal(len(retrievals), 2)
+    assert_true(objects_count(directory) <= 1)
+
+def test_tree_store_temporary_files():
+  with store_directory() as directory:
+    store = TreeStore(directory)
+    store.get("agent", 1, "2", retriever([]))
+#pylint: disable=W0212
+    tmp_paths = [
+      os.path.join(directory, "objects", ".tmp-abandoned"),
+      os.path.join(store._index_directory, "agent", ".tmp-abandoned")
+    ]
+#pylint: enable=W0212
+    for tmp_path in tmp_paths:
+      with open(tmp_path, "w") as tmp_file:
+        tmp_file.write("{")
+    store.collect()
+    assert_true(all(os.path.exists(tmp_path) for tmp_path in tmp_paths))
+    age(directory)
+    store.collect()
+    assert_true(not any(os.path.exists(tmp_path) for tmp_path in tmp_paths))
+    # The indexed tree is kept
+    assert_equal(objects_count(directory), 1)
+
+def test_tree_store_namespaces():
+  with store_directory() as directory:
+    retrievals = []
+    store = TreeStore(directory, namespace="owner/project")
+    store.get("agent", 1, "2", retriever(retrievals))
+    other_store = TreeStore(directory, max_size=1, namespace="owner/other_project")
+    other_store.get("agent", 1, "2", retriever(retrievals))
+    age(directory)
+    other_store.collect()
+    # The size bound of the other namespace doesn't remove the trees of this one
+    assert_equal(objects_count(directory), 1)
+    store.get("agent", 1, "2", retriever(retrievals))
+    other_store.get("agent", 1, "2", retriever(retrievals))
+    assert_equal(len(retrievals), 3)
+
+def test_tree_store_collect_interval():
+  with store_directory() as directory:
+    retrievals = []
+    store = TreeStore(directory, collect_interval=3600)
+    store.get("agent", 1, "2", retriever(retrievals))
+    tmp_path = os.path.join(directory, "objects", ".tmp-abandoned")
+    with open(tmp_path, "w") as tmp_file:
+      tmp_file.write("{")
+    age(directory)
+    # The collection following the first retrieval isn't repeated within the interval
+    store.get("agent", 2, "2", retriever(retrievals))
+    assert_true(os.path.exists(tmp_path))
+    store.collect_interval = 0
+    store.get("agent", 3, "2", retriever(retrievals))
+    assert_true(not os.path.exists(tmp_path))